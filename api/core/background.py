@@ -9,6 +9,7 @@ from pathlib import Path
 import structlog
 
 from api.core.config import settings
+from shared.storage.artifacts import artifact_root, discard_artifacts
 
 logger = structlog.get_logger()
 
@@ -35,9 +36,18 @@ async def cleanup_old_files():
                     except Exception as e:
                         logger.error("Failed to clean file", file=str(file_path), error=str(e))
         
+        # Artifacts of jobs that were never retried; a later retry just redoes those stages
+        artifact_path = artifact_root()
+        if artifact_path.exists():
+            for job_dir in artifact_path.iterdir():
+                if datetime.fromtimestamp(job_dir.stat().st_mtime) < cutoff_time:
+                    discard_artifacts(job_dir.name)
+                    cleaned_count += 1
+                    logger.info("Cleaned stage artifacts", job_id=job_dir.name)
+        
         if cleaned_count > 0:
             logger.info("Cleanup completed", files_cleaned=cleaned_count)
-            
+    
     except Exception as e:
         logger.error("Cleanup task failed", error=str(e))
 
@@ -21,7 +21,7 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE_MB: int = Field(default=500, description="Maximum upload size in MB")
     UPLOAD_TIMEOUT_SECONDS: int = Field(default=300, description="Upload timeout in seconds")
     ALLOWED_VIDEO_EXTENSIONS: List[str] = Field(
-        default=[".mp4", ".mov", ".avi", ".mkv"],
+        default=[".mp4", ".mov", ".avi", ".mkv", ".webm"],
         description="Allowed video file extensions"
     )
     
@@ -31,12 +31,25 @@ class Settings(BaseSettings):
     DB_PATH: str = Field(default="/data/db/vidprod.db", description="SQLite database path")
     CLEANUP_INTERVAL_HOURS: int = Field(default=1, description="Cleanup interval in hours")
     FILE_RETENTION_HOURS: int = Field(default=24, description="File retention period in hours")
+    SCRATCH_BUDGET_MB: int = Field(default=0, description="Scratch space jobs may reserve in MB (0 = 90% of free space at startup)")
+    SCRATCH_TMPFS_PATH: Optional[str] = Field(default=None, description="tmpfs directory for small intermediates (unset = disk only)")
+    SCRATCH_TMPFS_BUDGET_MB: int = Field(default=256, description="Space intermediates may take on tmpfs in MB")
     
     # Worker settings
     WORKER_ENABLED: bool = Field(default=True, description="Enable background worker")
-    WORKER_CONCURRENCY: int = Field(default=1, description="Number of concurrent workers")
+    WORKER_CONCURRENCY: int = Field(default=1, description="Maximum concurrent jobs; within it, jobs are packed by memory and CPU")
+    WORKER_MEMORY_BUDGET_MB: int = Field(default=0, description="Estimated peak memory running jobs may add up to (0 = 80% of physical memory)")
+    WORKER_CPU_CORES: int = Field(default=0, description="CPU cores shared out among running jobs (0 = all cores)")
+    WORKER_EXECUTION_MODE: str = Field(default="async", description="Run jobs on the worker's event loop (async) or in child processes (process)")
     QUEUE_POLL_INTERVAL_SECONDS: int = Field(default=30, description="Queue poll interval")
-    JOB_TIMEOUT_SECONDS: int = Field(default=600, description="Job processing timeout")
+    JOB_TIMEOUT_SECONDS: int = Field(default=600, description="Processing time limit per job")
+    JOB_DEADLINE_GRACE_SECONDS: int = Field(default=0, description="How long a job may keep running past its deadline before it is abandoned")
+    JOB_LEASE_SECONDS: int = Field(default=60, description="How long a claimed job stays with its worker without a heartbeat")
+    JOB_MAX_ATTEMPTS: int = Field(default=3, description="Claims of a job whose worker kept dying before it is failed")
+    JOB_AGING_SECONDS: int = Field(default=300, description="Wait after which a queued job gains the weight of one more priority step")
+    FAIR_SHARE_WINDOW_SECONDS: int = Field(default=900, description="How far back an owner's started jobs count against its share of the workers")
+    WORKER_WAKEUP_SOCKET: str = Field(default="/tmp/vidprod-worker.sock", description="Unix socket the API signals new jobs on (empty = polling only)")
+    WORKER_METRICS_PORT: int = Field(default=9091, description="Port of the worker's Prometheus endpoint (0 = disabled)")
     
     # Video processing settings
     VIDEO_SEGMENT_DURATION: int = Field(default=60, description="Video segment duration in seconds")
@@ -44,6 +57,18 @@ class Settings(BaseSettings):
     EYE_GAZE_INTENSITY: float = Field(default=0.7, description="Eye gaze correction intensity")
     OUTPUT_VIDEO_FORMAT: str = Field(default="mp4", description="Output video format")
     OUTPUT_VIDEO_CODEC: str = Field(default="h264", description="Output video codec")
+    SEGMENT_ENCODE_CONCURRENCY: int = Field(default=2, description="Maximum concurrent FFmpeg segment encodes per job")
+    FFMPEG_THREADS: int = Field(default=0, description="Threads per FFmpeg encode (0 = share CPU cores across the encode pool)")
+    FFMPEG_TIMEOUT_SECONDS: int = Field(default=1800, description="Wall-clock limit per FFmpeg invocation (0 = none)")
+    FFPROBE_TIMEOUT_SECONDS: int = Field(default=60, description="Wall-clock limit per FFprobe invocation")
+    FFMPEG_CPU_LIMIT_SECONDS: int = Field(default=0, description="CPU-time rlimit per FFmpeg invocation (0 = none)")
+    FFMPEG_STDERR_LINES: int = Field(default=200, description="FFmpeg stderr lines kept for error reporting")
+    CANCEL_POLL_INTERVAL_SECONDS: int = Field(default=2, description="How often a running job checks for cancellation")
+    QC_ENABLED: bool = Field(default=True, description="Compare sampled output frames against the source")
+    QC_SAMPLES_PER_SEGMENT: int = Field(default=3, description="Frames compared per output file")
+    QC_FRAME_WIDTH: int = Field(default=320, description="Width frames are scaled to for comparison")
+    QC_MIN_SSIM: float = Field(default=0.85, description="Mean SSIM below which a segment is flagged")
+    QC_MIN_PSNR: float = Field(default=28.0, description="PSNR (dB) below which a segment is flagged")
     
     # Platform settings
     PLATFORM_UPLOAD_ENABLED: bool = Field(default=True, description="Enable platform uploads")
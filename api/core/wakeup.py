@@ -0,0 +1,108 @@
+"""
+Job wakeup signal from the API to the worker
+
+The API sends a datagram to the worker's Unix socket whenever a job is
+queued, so the worker starts it at once instead of at its next poll.
+Delivery is best effort: with no worker listening the datagram is dropped
+and the worker's periodic poll still finds the job.
+"""
+import asyncio
+import os
+import socket
+from typing import Optional
+
+import structlog
+
+from api.core.config import settings
+
+logger = structlog.get_logger()
+
+WAKEUP_MESSAGE = b"job"
+
+# Set directly when the worker runs in the same process as the API
+_local_event: Optional[asyncio.Event] = None
+
+
+def notify_job_queued():
+    """Wake the worker to look at the queue; never raises"""
+    if _local_event is not None:
+        _local_event.set()
+    
+    if not settings.WORKER_WAKEUP_SOCKET:
+        return
+    
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            sock.sendto(WAKEUP_MESSAGE, settings.WORKER_WAKEUP_SOCKET)
+    except OSError:
+        # No worker listening, or its socket buffer is full and a wakeup is already pending
+        pass
+
+
+class WakeupListener:
+    """Worker side of the wakeup signal: an event set by incoming datagrams"""
+    
+    def __init__(self):
+        self.event = asyncio.Event()
+        self._sock: Optional[socket.socket] = None
+    
+    def start(self):
+        """Bind the wakeup socket and start watching it on the running loop"""
+        global _local_event
+        _local_event = self.event
+        
+        path = settings.WORKER_WAKEUP_SOCKET
+        if not path:
+            return
+        
+        # A socket file left by an earlier worker would make bind fail
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(path)
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._drain)
+        self._sock = sock
+        
+        logger.info("Listening for job wakeups", socket=path)
+    
+    def stop(self):
+        """Stop watching and remove the socket"""
+        global _local_event
+        if _local_event is self.event:
+            _local_event = None
+        
+        if self._sock is None:
+            return
+        
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(settings.WORKER_WAKEUP_SOCKET)
+        except FileNotFoundError:
+            pass
+    
+    async def wait(self, timeout: float) -> bool:
+        """Wait for a wakeup or until timeout seconds pass; True if woken"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # Cleared before the caller reads the queue, so a job queued meanwhile wakes the next wait
+            self.event.clear()
+    
+    def _drain(self):
+        """Consume every pending datagram; any number of them means one look at the queue"""
+        while True:
+            try:
+                self._sock.recv(len(WAKEUP_MESSAGE))
+            except (BlockingIOError, InterruptedError):
+                break
+        self.event.set()
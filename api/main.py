@@ -15,7 +15,7 @@ import structlog
 
 from api.core.config import settings
 from api.core.logging import setup_logging
-from api.routers import upload, health, jobs, download
+from api.routers import upload, health, jobs, download, thumbnails, hls, compilations
 from shared.database.connection import init_db
 
 # Setup structured logging
@@ -81,6 +81,9 @@ app.include_router(health.router, tags=["health"])
 app.include_router(upload.router, prefix="/api/v1", tags=["upload"])
 app.include_router(jobs.router, prefix="/api/v1", tags=["jobs"])
 app.include_router(download.router, prefix="/api/v1", tags=["download"])
+app.include_router(thumbnails.router, prefix="/api/v1", tags=["thumbnails"])
+app.include_router(hls.router, prefix="/api/v1", tags=["hls"])
+app.include_router(compilations.router, prefix="/api/v1", tags=["compilations"])
 
 # Mount Prometheus metrics endpoint
 metrics_app = make_asgi_app()
@@ -0,0 +1,73 @@
+"""
+Compilation endpoints: new jobs assembled from existing segments
+"""
+import os
+import uuid
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException
+import structlog
+
+from api.core.config import settings
+from api.services.job_service import JobService
+from shared.models.job import (
+    CompilationSpec, CreateCompilationRequest, JobResponse, ProcessingOptions
+)
+
+logger = structlog.get_logger()
+router = APIRouter()
+job_service = JobService()
+
+
+@router.post("/compilations", response_model=JobResponse)
+async def create_compilation(request: CreateCompilationRequest):
+    """
+    Queue a job whose input is the given segments joined in order
+    
+    - **segment_ids**: Segments of one or more jobs, in playback order
+    - The resulting video is split, rendered and uploaded like any upload
+    """
+    total_size = 0
+    for segment_id in request.segment_ids:
+        segment = await job_service.get_segment(segment_id)
+        if not segment:
+            raise HTTPException(status_code=404, detail=f"Segment not found: {segment_id}")
+        if not os.path.exists(segment.file_path):
+            raise HTTPException(status_code=410, detail=f"Segment file no longer available: {segment_id}")
+        total_size += segment.size or 0
+    
+    # The pieces already went through eye gaze correction in their own jobs
+    options = request.processing_options or ProcessingOptions(eye_gaze_correction=False)
+    options.compilation = CompilationSpec(segment_ids=request.segment_ids)
+    
+    job_id = str(uuid.uuid4())
+    video_filename = f"compilation_{job_id}.mp4"
+    
+    job = await job_service.create_job(
+        job_id=job_id,
+        video_path=str(Path(settings.TEMP_STORAGE_PATH) / video_filename),
+        video_filename=video_filename,
+        video_size=total_size,
+        webhook_url=request.webhook_url,
+        platforms=request.platforms,
+        metadata=request.metadata,
+        processing_options=options,
+        priority=request.priority,
+        owner=request.owner
+    )
+    
+    logger.info("Compilation queued", job_id=job_id, segments=len(request.segment_ids))
+    
+    return JobResponse(
+        id=job.id,
+        status=job.status,
+        video_filename=job.video_filename,
+        created_at=job.created_at,
+        progress=job.progress,
+        total_segments=job.total_segments,
+        segments=[],
+        webhook_url=job.webhook_url,
+        platforms=job.platforms,
+        priority=job.priority,
+        owner=job.owner
+    )
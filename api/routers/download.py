@@ -1,53 +1,72 @@
 """
 Video download endpoints
-"""
-import os
-from pathlib import Path
 
+Files are looked up in the job's manifest, written when its outputs were
+published, so requests never scan or stat the output directory.
+"""
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
 
-from api.core.config import settings
 from api.services.job_service import JobService
+from shared.models.job import Job
+from shared.storage.processed import job_output_dir, read_manifest
 
 router = APIRouter()
 job_service = JobService()
 
+# Manifest kinds offered as downloads; previews are served by their own endpoints
+DOWNLOAD_KINDS = {"segment", "rendition"}
+
+
+@router.get("/download/{job_id}/all")
+async def get_download_links(job_id: str):
+    """
+    Get all download links for a completed job
+    """
+    await _get_completed_job(job_id)
+    
+    manifest = read_manifest(job_id)
+    if manifest is None:
+        return {"files": []}
+    
+    files = [
+        {
+            "filename": entry.path,
+            "size": entry.size,
+            "segment_number": entry.segment_number,
+            "platforms": entry.platforms,
+            "download_url": f"/api/v1/download/{job_id}/{entry.path}"
+        }
+        for entry in manifest.files
+        if entry.kind in DOWNLOAD_KINDS
+    ]
+    
+    return {
+        "job_id": job_id,
+        "files": files,
+        "total_files": len(files)
+    }
+
 
 @router.get("/download/{job_id}/{filename}")
 async def download_processed_video(job_id: str, filename: str):
     """
     Download a processed video file
     """
-    # Get job details
-    job = await job_service.get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    if job.status != "completed":
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Job not completed. Current status: {job.status}"
-        )
-    
-    # Construct file path
-    file_path = Path(settings.PROCESSED_PATH) / job_id / filename
+    await _get_completed_job(job_id)
     
-    if not file_path.exists():
+    # Only files listed in the manifest are served, which also rules out path traversal
+    manifest = read_manifest(job_id)
+    entry = next(
+        (e for e in manifest.files if e.path == filename and e.kind in DOWNLOAD_KINDS),
+        None
+    ) if manifest else None
+    if entry is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Security check - ensure the file is within the allowed directory
-    try:
-        file_path = file_path.resolve()
-        allowed_path = Path(settings.PROCESSED_PATH).resolve()
-        if not str(file_path).startswith(str(allowed_path)):
-            raise HTTPException(status_code=403, detail="Access forbidden")
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid file path")
-    
     return FileResponse(
-        path=file_path,
-        media_type="video/mp4",
+        path=job_output_dir(job_id) / entry.path,
+        media_type=entry.content_type,
         filename=filename,
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"'
@@ -55,11 +74,8 @@ async def download_processed_video(job_id: str, filename: str):
     )
 
 
-@router.get("/download/{job_id}/all")
-async def get_download_links(job_id: str):
-    """
-    Get all download links for a completed job
-    """
+async def _get_completed_job(job_id: str) -> Job:
+    """Fetch a job, rejecting unknown and unfinished ones"""
     job = await job_service.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -70,21 +86,4 @@ async def get_download_links(job_id: str):
             detail=f"Job not completed. Current status: {job.status}"
         )
     
-    # Get all processed files
-    job_dir = Path(settings.PROCESSED_PATH) / job_id
-    if not job_dir.exists():
-        return {"files": []}
-    
-    files = []
-    for file_path in job_dir.glob("*.mp4"):
-        files.append({
-            "filename": file_path.name,
-            "size": file_path.stat().st_size,
-            "download_url": f"/api/v1/download/{job_id}/{file_path.name}"
-        })
-    
-    return {
-        "job_id": job_id,
-        "files": files,
-        "total_files": len(files)
-    }
\ No newline at end of file
+    return job
@@ -0,0 +1,96 @@
+"""
+HLS preview endpoints
+
+Serves the fMP4 HLS package of a segment. Fragments share one media file,
+so byte-range requests are answered with 206 partial content.
+"""
+import os
+import re
+from pathlib import Path
+
+import aiofiles
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from api.services.job_service import JobService
+
+router = APIRouter()
+job_service = JobService()
+
+# A retried job repackages its previews under the same segment IDs, so caches
+# keep them only briefly and then revalidate against the ETag
+HLS_CACHE_CONTROL = "public, max-age=60"
+
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+@router.get("/hls/{segment_id}/{filename}")
+async def get_hls_file(segment_id: str, filename: str, request: Request):
+    """
+    Get the playlist or media of a segment's HLS preview
+    
+    - **filename**: `index.m3u8` for the playlist; media files are referenced from it
+    """
+    media_type = HLS_MEDIA_TYPES.get(Path(filename).suffix)
+    if media_type is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    segment = await job_service.get_segment(segment_id)
+    if not segment or not segment.hls_path:
+        raise HTTPException(status_code=404, detail="HLS preview not found")
+    
+    hls_dir = Path(segment.hls_path).parent.resolve()
+    file_path = (hls_dir / filename).resolve()
+    if file_path.parent != hls_dir or not file_path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # A repackaged file is a new file, so its inode and mtime change even at the same size
+    stat = file_path.stat()
+    etag = f'"{segment_id}-{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {"Cache-Control": HLS_CACHE_CONTROL, "Accept-Ranges": "bytes", "ETag": etag}
+    
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    
+    # Multi-range and malformed requests get the whole file, as HTTP allows, and so
+    # does a range of an older version of the file
+    match = RANGE_PATTERN.match(request.headers.get("range", "").strip())
+    if_range = request.headers.get("if-range")
+    if not match or match.group(1) == match.group(2) == "" or if_range not in (None, etag):
+        return FileResponse(path=file_path, media_type=media_type, headers=headers)
+    
+    return await _range_response(file_path, match, media_type, headers)
+
+
+async def _range_response(file_path: Path, match: re.Match, media_type: str,
+                          headers: dict) -> Response:
+    """Answer a single-range request with the requested bytes of a file"""
+    size = os.path.getsize(file_path)
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+    
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    
+    async with aiofiles.open(file_path, "rb") as f:
+        await f.seek(start)
+        content = await f.read(end - start + 1)
+    
+    return Response(
+        content=content,
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+    )
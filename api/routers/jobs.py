@@ -8,6 +8,7 @@ from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
 
 from shared.models.job import JobResponse, JobListResponse, JobStatus
+from api.core.wakeup import notify_job_queued
 from api.services.job_service import JobService
 
 router = APIRouter()
@@ -24,6 +25,7 @@ async def get_job(job_id: str):
         raise HTTPException(status_code=404, detail="Job not found")
     
     segments = await job_service.get_job_segments(job_id)
+    stages = await job_service.get_job_stages(job_id)
     
     return JobResponse(
         id=job.id,
@@ -37,7 +39,14 @@ async def get_job(job_id: str):
         total_segments=job.total_segments,
         segments=segments,
         webhook_url=job.webhook_url,
-        platforms=job.platforms
+        platforms=job.platforms,
+        media_info=job.media_info,
+        deadline_at=job.deadline_at,
+        encode_policy=job.encode_policy,
+        quality_report=job.quality_report,
+        priority=job.priority,
+        owner=job.owner,
+        stages=stages
     )
 
 
@@ -79,7 +88,13 @@ async def list_jobs(
                 total_segments=job.total_segments,
                 segments=segments,
                 webhook_url=job.webhook_url,
-                platforms=job.platforms
+                platforms=job.platforms,
+                media_info=job.media_info,
+                deadline_at=job.deadline_at,
+                encode_policy=job.encode_policy,
+                quality_report=job.quality_report,
+                priority=job.priority,
+                owner=job.owner
             )
         )
     
@@ -106,11 +121,13 @@ async def cancel_job(job_id: str):
             detail=f"Cannot cancel job with status: {job.status}"
         )
     
-    await job_service.update_job_status(
-        job_id,
-        JobStatus.CANCELLED,
-        error="Cancelled by user"
-    )
+    # Conditional on the status, so a worker finishing the job meanwhile is not overwritten
+    if not await job_service.cancel_job(job_id, "Cancelled by user"):
+        job = await job_service.get_job(job_id)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot cancel job with status: {job.status}"
+        )
     
     return JSONResponse(
         content={"message": "Job cancelled successfully"},
@@ -135,6 +152,7 @@ async def retry_job(job_id: str):
     
     # Reset job status to pending
     await job_service.update_job_status(job_id, JobStatus.PENDING)
+    notify_job_queued()
     
     return JSONResponse(
         content={"message": "Job queued for retry"},
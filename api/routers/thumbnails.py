@@ -0,0 +1,46 @@
+"""
+Segment thumbnail endpoints
+"""
+import os
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from api.services.job_service import JobService
+
+router = APIRouter()
+job_service = JobService()
+
+# A retried job re-renders its thumbnails under the same segment IDs, so caches
+# keep them only briefly and then revalidate against the ETag
+THUMBNAIL_CACHE_CONTROL = "public, max-age=60"
+
+
+@router.get("/thumbnails/{segment_id}/{kind}")
+async def get_segment_thumbnail(segment_id: str, kind: str, request: Request):
+    """
+    Get the poster or storyboard sprite image for a segment
+    
+    - **kind**: `poster` for a single frame, `sprite` for the keyframe storyboard
+    """
+    if kind not in ("poster", "sprite"):
+        raise HTTPException(status_code=404, detail="Unknown thumbnail type")
+    
+    segment = await job_service.get_segment(segment_id)
+    if not segment:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    
+    image_path = segment.thumbnail_path if kind == "poster" else segment.sprite_path
+    if not image_path or not os.path.exists(image_path):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    
+    # A re-rendered image is a new file, so its inode and mtime change even at the same size
+    stat = Path(image_path).stat()
+    etag = f'"{segment_id}-{kind}-{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {"Cache-Control": THUMBNAIL_CACHE_CONTROL, "ETag": etag}
+    
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(path=image_path, media_type="image/jpeg", headers=headers)
\ No newline at end of file
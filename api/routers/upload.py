@@ -5,7 +5,7 @@ import os
 import uuid
 import aiofiles
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks
 from fastapi.responses import JSONResponse
@@ -14,10 +14,11 @@ import structlog
 from api.core.config import settings
 from shared.database.connection import get_db
 from shared.models.job import (
-    Job, JobStatus, CreateJobRequest, JobResponse, Platform,
+    Job, JobStatus, JobPriority, CreateJobRequest, JobResponse, Platform,
     ProcessingOptions, JobMetadata
 )
 from api.services.job_service import JobService
+from shared.media.probe import probe_media
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -34,6 +35,9 @@ async def upload_video(
     platforms: str = Form(None),  # Comma-separated list
     metadata: str = Form(None),  # JSON string
     processing_options: str = Form(None),  # JSON string
+    deadline_at: str = Form(None),  # ISO 8601 timestamp
+    priority: str = Form(None),
+    owner: str = Form(None),
 ):
     """
     Upload a video file for processing
@@ -43,6 +47,9 @@ async def upload_video(
     - **platforms**: Comma-separated list of platforms (tiktok,instagram,youtube)
     - **metadata**: JSON string with video metadata
     - **processing_options**: JSON string with processing options
+    - **deadline_at**: When the segments are needed; tighter deadlines get faster encodes
+    - **priority**: Queue priority (low, normal, high, urgent); defaults to normal
+    - **owner**: Tenant or user the job belongs to; owners share the workers fairly
     """
     # Validate file extension
     file_ext = Path(file.filename).suffix.lower()
@@ -90,6 +97,24 @@ async def upload_video(
         except (json.JSONDecodeError, ValueError) as e:
             raise HTTPException(status_code=400, detail=f"Invalid processing options: {e}")
     
+    job_deadline = None
+    if deadline_at:
+        try:
+            job_deadline = datetime.fromisoformat(deadline_at)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid deadline: {e}")
+        
+        # Stored like every other job timestamp: naive UTC
+        if job_deadline.tzinfo is not None:
+            job_deadline = job_deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    job_priority = JobPriority.NORMAL
+    if priority:
+        try:
+            job_priority = JobPriority(priority.strip().lower())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid priority: {e}")
+    
     # Generate unique job ID and file path
     job_id = str(uuid.uuid4())
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -113,6 +138,13 @@ async def upload_video(
             path=str(file_path)
         )
         
+        # Probe once at ingest; every later stage reads the stored record
+        media_info = None
+        try:
+            media_info = await probe_media(str(file_path))
+        except Exception as e:
+            logger.warning("Media probe failed", job_id=job_id, error=str(e))
+        
         # Create job in database
         job = await job_service.create_job(
             job_id=job_id,
@@ -122,7 +154,11 @@ async def upload_video(
             webhook_url=webhook_url,
             platforms=platform_list,
             metadata=job_metadata,
-            processing_options=proc_options
+            processing_options=proc_options,
+            media_info=media_info,
+            deadline_at=job_deadline,
+            priority=job_priority,
+            owner=owner
         )
         
         # Queue job for processing (will be picked up by worker)
@@ -137,9 +173,13 @@ async def upload_video(
             total_segments=job.total_segments,
             segments=[],
             webhook_url=job.webhook_url,
-            platforms=job.platforms
+            platforms=job.platforms,
+            media_info=job.media_info,
+            deadline_at=job.deadline_at,
+            priority=job.priority,
+            owner=job.owner
         )
-        
+    
     except Exception as e:
         # Clean up file on error
         if file_path.exists():
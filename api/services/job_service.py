@@ -3,15 +3,18 @@ Job service for managing video processing jobs
 """
 import json
 import uuid
-from datetime import datetime
-from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Collection, Dict, List, Optional, Set, Tuple
 
 import structlog
 
+from api.core.config import settings
+from api.core.wakeup import notify_job_queued
 from shared.database.connection import get_db
 from shared.models.job import (
-    Job, JobStatus, JobSegment, Platform,
-    ProcessingOptions, JobMetadata
+    Job, JobStatus, JobPriority, JobSegment, Platform, PRIORITY_WEIGHTS, UploadStatus,
+    ProcessingOptions, JobMetadata, MediaInfo, EncodePolicy, QualityReport,
+    JobStage, JobStageName, StageStatus, JOB_STAGES
 )
 
 logger = structlog.get_logger()
@@ -29,7 +32,11 @@ class JobService:
         webhook_url: Optional[str] = None,
         platforms: Optional[List[Platform]] = None,
         metadata: Optional[JobMetadata] = None,
-        processing_options: Optional[ProcessingOptions] = None
+        processing_options: Optional[ProcessingOptions] = None,
+        media_info: Optional[MediaInfo] = None,
+        deadline_at: Optional[datetime] = None,
+        priority: JobPriority = JobPriority.NORMAL,
+        owner: Optional[str] = None
     ) -> Job:
         """Create a new job in the database"""
         if processing_options is None:
@@ -40,8 +47,9 @@ class JobService:
                 """
                 INSERT INTO jobs (
                     id, status, video_path, video_filename, video_size,
-                    created_at, webhook_url, platforms, metadata, processing_options
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    created_at, webhook_url, platforms, metadata, processing_options,
+                    media_info, deadline_at, priority, owner
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     job_id,
@@ -53,7 +61,11 @@ class JobService:
                     webhook_url,
                     json.dumps([p.value for p in platforms]) if platforms else "[]",
                     json.dumps(metadata.dict()) if metadata else None,
-                    json.dumps(processing_options.dict())
+                    json.dumps(processing_options.dict()),
+                    json.dumps(media_info.dict()) if media_info else None,
+                    deadline_at.isoformat() if deadline_at else None,
+                    priority.value,
+                    owner
                 )
             )
             await db.commit()
@@ -67,10 +79,15 @@ class JobService:
             webhook_url=webhook_url,
             platforms=platforms or [],
             metadata=metadata,
-            processing_options=processing_options
+            processing_options=processing_options,
+            media_info=media_info,
+            deadline_at=deadline_at,
+            priority=priority,
+            owner=owner
         )
         
         logger.info("Job created", job_id=job_id)
+        notify_job_queued()
         return job
     
     async def get_job(self, job_id: str) -> Optional[Job]:
@@ -81,7 +98,9 @@ class JobService:
                 SELECT id, status, video_path, video_filename, video_size,
                        created_at, started_at, completed_at, error,
                        metadata, webhook_url, platforms, processing_options,
-                       progress, total_segments
+                       progress, total_segments, media_info,
+                       deadline_at, encode_policy, quality_report,
+                       priority, owner
                 FROM jobs WHERE id = ?
                 """,
                 (job_id,)
@@ -119,7 +138,13 @@ class JobService:
                 platforms=platforms,
                 processing_options=processing_options,
                 progress=row[13] or 0,
-                total_segments=row[14] or 0
+                total_segments=row[14] or 0,
+                media_info=MediaInfo(**json.loads(row[15])) if row[15] else None,
+                deadline_at=datetime.fromisoformat(row[16]) if row[16] else None,
+                encode_policy=EncodePolicy(**json.loads(row[17])) if row[17] else None,
+                quality_report=QualityReport(**json.loads(row[18])) if row[18] else None,
+                priority=JobPriority(row[19] or JobPriority.NORMAL.value),
+                owner=row[20]
             )
     
     async def get_job_segments(self, job_id: str) -> List[JobSegment]:
@@ -129,7 +154,8 @@ class JobService:
                 """
                 SELECT id, job_id, segment_number, file_path, duration,
                        size, platform, upload_status, upload_at, upload_error,
-                       upload_url, created_at
+                       upload_url, created_at, start_time, thumbnail_path,
+                       sprite_path, hls_path
                 FROM job_segments
                 WHERE job_id = ?
                 ORDER BY segment_number
@@ -138,24 +164,208 @@ class JobService:
             )
             rows = await cursor.fetchall()
             
-            segments = []
-            for row in rows:
-                segments.append(JobSegment(
-                    id=row[0],
-                    job_id=row[1],
-                    segment_number=row[2],
-                    file_path=row[3],
-                    duration=row[4],
-                    size=row[5],
-                    platform=Platform(row[6]) if row[6] else None,
-                    upload_status=row[7],
-                    upload_at=datetime.fromisoformat(row[8]) if row[8] else None,
-                    upload_error=row[9],
-                    upload_url=row[10],
-                    created_at=datetime.fromisoformat(row[11])
-                ))
+            return [self._segment_from_row(row) for row in rows]
+    
+    async def delete_job_segments(self, job_id: str):
+        """
+        Remove a job's segments and their platform uploads, except completed uploads
+        and the segments they posted, so a retry never posts a segment twice
+        """
+        async with get_db() as db:
+            await db.execute(
+                """
+                DELETE FROM platform_uploads
+                WHERE segment_id IN (SELECT id FROM job_segments WHERE job_id = ?)
+                  AND upload_status != ?
+                """,
+                (job_id, UploadStatus.COMPLETED.value)
+            )
+            await db.execute(
+                """
+                DELETE FROM job_segments
+                WHERE job_id = ?
+                  AND id NOT IN (SELECT segment_id FROM platform_uploads WHERE upload_status = ?)
+                """,
+                (job_id, UploadStatus.COMPLETED.value)
+            )
+            await db.commit()
+    
+    async def get_posted_segments(
+        self, job_id: str
+    ) -> Dict[Tuple[int, Optional[Platform]], Tuple[str, Set[Platform]]]:
+        """
+        Segments of a job already posted somewhere, keyed by segment number and
+        rendition platform, with their ID and the platforms they were posted to
+        """
+        async with get_db() as db:
+            cursor = await db.execute(
+                """
+                SELECT js.id, js.segment_number, js.platform, pu.platform
+                FROM job_segments js
+                JOIN platform_uploads pu ON pu.segment_id = js.id
+                WHERE js.job_id = ? AND pu.upload_status = ?
+                """,
+                (job_id, UploadStatus.COMPLETED.value)
+            )
+            rows = await cursor.fetchall()
+        
+        posted: Dict[Tuple[int, Optional[Platform]], Tuple[str, Set[Platform]]] = {}
+        for segment_id, segment_number, rendition, platform in rows:
+            key = (segment_number, Platform(rendition) if rendition else None)
+            posted.setdefault(key, (segment_id, set()))[1].add(Platform(platform))
+        return posted
+    
+    async def withdraw_uploads(self, job_id: str) -> int:
+        """Cancel a job's uploads that have not started; returns how many were withdrawn"""
+        async with get_db() as db:
+            withdrawn = await self._withdraw_uploads(db, job_id)
+            await db.commit()
+        
+        if withdrawn:
+            logger.info("Pending uploads withdrawn", job_id=job_id, uploads=withdrawn)
+        return withdrawn
+    
+    async def _withdraw_uploads(self, db, job_id: str) -> int:
+        """Mark a job's pending and scheduled uploads cancelled, without committing"""
+        cursor = await db.execute(
+            """
+            UPDATE platform_uploads SET upload_status = ?
+            WHERE upload_status IN (?, ?)
+              AND segment_id IN (SELECT id FROM job_segments WHERE job_id = ?)
+            """,
+            (
+                UploadStatus.CANCELLED.value,
+                UploadStatus.PENDING.value,
+                UploadStatus.SCHEDULED.value,
+                job_id
+            )
+        )
+        return cursor.rowcount
+    
+    async def count_active_uploads(self, job_id: str) -> int:
+        """Number of the job's platform uploads currently in progress"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                """
+                SELECT COUNT(*) FROM platform_uploads
+                WHERE upload_status = ?
+                  AND segment_id IN (SELECT id FROM job_segments WHERE job_id = ?)
+                """,
+                (UploadStatus.UPLOADING.value, job_id)
+            )
+            return (await cursor.fetchone())[0]
+    
+    async def update_segment_paths(self, segments: List[JobSegment]):
+        """Point segments at the new locations of their files"""
+        async with get_db() as db:
+            await db.executemany(
+                """
+                UPDATE job_segments
+                SET file_path = ?, thumbnail_path = ?, sprite_path = ?, hls_path = ?
+                WHERE id = ?
+                """,
+                [
+                    (s.file_path, s.thumbnail_path, s.sprite_path, s.hls_path, s.id)
+                    for s in segments
+                ]
+            )
+            await db.commit()
+    
+    async def get_segment(self, segment_id: str) -> Optional[JobSegment]:
+        """Get a single segment by ID"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                """
+                SELECT id, job_id, segment_number, file_path, duration,
+                       size, platform, upload_status, upload_at, upload_error,
+                       upload_url, created_at, start_time, thumbnail_path,
+                       sprite_path, hls_path
+                FROM job_segments
+                WHERE id = ?
+                """,
+                (segment_id,)
+            )
+            row = await cursor.fetchone()
             
-            return segments
+            return self._segment_from_row(row) if row else None
+    
+    def _segment_from_row(self, row) -> JobSegment:
+        """Build a segment model from a job_segments row"""
+        return JobSegment(
+            id=row[0],
+            job_id=row[1],
+            segment_number=row[2],
+            file_path=row[3],
+            duration=row[4],
+            size=row[5],
+            platform=Platform(row[6]) if row[6] else None,
+            upload_status=row[7],
+            upload_at=datetime.fromisoformat(row[8]) if row[8] else None,
+            upload_error=row[9],
+            upload_url=row[10],
+            created_at=datetime.fromisoformat(row[11]),
+            start_time=row[12],
+            thumbnail_path=row[13],
+            sprite_path=row[14],
+            hls_path=row[15]
+        )
+    
+    async def get_job_stages(self, job_id: str) -> List[JobStage]:
+        """Recorded stages of a job, in pipeline order"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                """
+                SELECT stage, status, artifact, started_at, completed_at, error
+                FROM job_stages
+                WHERE job_id = ?
+                """,
+                (job_id,)
+            )
+            rows = await cursor.fetchall()
+        
+        stages = [
+            JobStage(
+                stage=JobStageName(row[0]),
+                status=StageStatus(row[1]),
+                artifact=row[2],
+                started_at=datetime.fromisoformat(row[3]) if row[3] else None,
+                completed_at=datetime.fromisoformat(row[4]) if row[4] else None,
+                error=row[5]
+            )
+            for row in rows
+        ]
+        return sorted(stages, key=lambda stage: JOB_STAGES.index(stage.stage))
+    
+    async def start_stage(self, job_id: str, stage: JobStageName):
+        """Mark a stage running, clearing what an earlier attempt recorded for it"""
+        async with get_db() as db:
+            await db.execute(
+                """
+                INSERT INTO job_stages (job_id, stage, status, started_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (job_id, stage) DO UPDATE SET
+                    status = excluded.status, started_at = excluded.started_at,
+                    artifact = NULL, completed_at = NULL, error = NULL
+                """,
+                (job_id, stage.value, StageStatus.RUNNING.value, datetime.utcnow().isoformat())
+            )
+            await db.commit()
+    
+    async def finish_stage(self, job_id: str, stage: JobStageName, status: StageStatus,
+                           artifact: Optional[str] = None, error: Optional[str] = None):
+        """Record how a stage ended and the file it produced, if any"""
+        async with get_db() as db:
+            await db.execute(
+                """
+                INSERT INTO job_stages (job_id, stage, status, artifact, completed_at, error)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_id, stage) DO UPDATE SET
+                    status = excluded.status, artifact = excluded.artifact,
+                    completed_at = excluded.completed_at, error = excluded.error
+                """,
+                (job_id, stage.value, status.value, artifact, datetime.utcnow().isoformat(), error)
+            )
+            await db.commit()
     
     async def list_jobs(
         self,
@@ -186,7 +396,9 @@ class JobService:
                 SELECT id, status, video_path, video_filename, video_size,
                        created_at, started_at, completed_at, error,
                        metadata, webhook_url, platforms, processing_options,
-                       progress, total_segments
+                       progress, total_segments, media_info,
+                       deadline_at, encode_policy, quality_report,
+                       priority, owner
                 FROM jobs
                 {where_clause}
                 {order_clause}
@@ -227,7 +439,13 @@ class JobService:
                     platforms=platforms,
                     processing_options=processing_options,
                     progress=row[13] or 0,
-                    total_segments=row[14] or 0
+                    total_segments=row[14] or 0,
+                    media_info=MediaInfo(**json.loads(row[15])) if row[15] else None,
+                    deadline_at=datetime.fromisoformat(row[16]) if row[16] else None,
+                    encode_policy=EncodePolicy(**json.loads(row[17])) if row[17] else None,
+                    quality_report=QualityReport(**json.loads(row[18])) if row[18] else None,
+                    priority=JobPriority(row[19] or JobPriority.NORMAL.value),
+                    owner=row[20]
                 ))
             
             return jobs, total
@@ -239,8 +457,8 @@ class JobService:
         error: Optional[str] = None,
         progress: Optional[int] = None,
         total_segments: Optional[int] = None
-    ):
-        """Update job status"""
+    ) -> bool:
+        """Update job status; False if the job was cancelled, which no later update overrides"""
         async with get_db() as db:
             updates = ["status = ?"]
             params = [status.value]
@@ -253,6 +471,12 @@ class JobService:
                 updates.append("completed_at = ?")
                 params.append(datetime.utcnow().isoformat())
             
+            # Only a processing job is held by a worker; a requeued one starts its attempts afresh
+            if status != JobStatus.PROCESSING:
+                updates.append("lease_expires_at = NULL")
+            if status == JobStatus.PENDING:
+                updates.append("attempts = 0")
+            
             if error is not None:
                 updates.append("error = ?")
                 params.append(error)
@@ -265,19 +489,113 @@ class JobService:
                 updates.append("total_segments = ?")
                 params.append(total_segments)
             
-            params.append(job_id)
+            params.extend([job_id, JobStatus.CANCELLED.value])
             
-            await db.execute(
+            cursor = await db.execute(
                 f"""
                 UPDATE jobs
                 SET {', '.join(updates)}
-                WHERE id = ?
+                WHERE id = ? AND status != ?
                 """,
                 params
             )
             await db.commit()
         
+        if cursor.rowcount == 0:
+            logger.info("Job status not updated", job_id=job_id, status=status)
+            return False
+        
         logger.info("Job status updated", job_id=job_id, status=status)
+        return True
+    
+    async def cancel_job(self, job_id: str, error: str) -> bool:
+        """
+        Cancel a pending or processing job; False if it had already finished.
+        A worker running the job notices at its next status check and stops.
+        Uploads of the job that have not started are withdrawn along with it.
+        """
+        async with get_db() as db:
+            # One conditional statement, so concurrent cancels and completions cannot both win
+            cursor = await db.execute(
+                """
+                UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL
+                WHERE id = ? AND status IN (?, ?)
+                """,
+                (
+                    JobStatus.CANCELLED.value,
+                    error,
+                    job_id,
+                    JobStatus.PENDING.value,
+                    JobStatus.PROCESSING.value
+                )
+            )
+            cancelled = cursor.rowcount > 0
+            
+            # Only the cancel that won withdraws; uploads the worker queues after this
+            # are withdrawn by the worker itself when it stops
+            withdrawn = await self._withdraw_uploads(db, job_id) if cancelled else 0
+            await db.commit()
+        
+        if not cancelled:
+            return False
+        
+        logger.info("Job cancelled", job_id=job_id, uploads_withdrawn=withdrawn)
+        return True
+    
+    async def update_job_progress(self, job_id: str, progress: int):
+        """Record progress of a job that is still processing"""
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE jobs SET progress = ? WHERE id = ? AND status = ?",
+                (progress, job_id, JobStatus.PROCESSING.value)
+            )
+            await db.commit()
+    
+    async def get_job_status(self, job_id: str) -> Optional[JobStatus]:
+        """Get only the current status of a job"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT status FROM jobs WHERE id = ?",
+                (job_id,)
+            )
+            row = await cursor.fetchone()
+            return JobStatus(row[0]) if row else None
+    
+    async def update_media_info(self, job_id: str, media_info: MediaInfo):
+        """Store the probed media record for a job"""
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE jobs SET media_info = ? WHERE id = ?",
+                (json.dumps(media_info.dict()), job_id)
+            )
+            await db.commit()
+    
+    async def update_encode_policy(self, job_id: str, encode_policy: EncodePolicy):
+        """Record the encode policy chosen for a job"""
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE jobs SET encode_policy = ? WHERE id = ?",
+                (json.dumps(encode_policy.dict()), job_id)
+            )
+            await db.commit()
+    
+    async def update_quality_report(self, job_id: str, quality_report: QualityReport):
+        """Store the QC report of a job"""
+        async with get_db() as db:
+            await db.execute(
+                "UPDATE jobs SET quality_report = ? WHERE id = ?",
+                (json.dumps(quality_report.dict()), job_id)
+            )
+            await db.commit()
+    
+    async def count_jobs(self, status: JobStatus) -> int:
+        """Count jobs in a given status"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?",
+                (status.value,)
+            )
+            return (await cursor.fetchone())[0]
     
     async def _has_started(self, job_id: str) -> bool:
         """Check if job has already started"""
@@ -289,6 +607,158 @@ class JobService:
             row = await cursor.fetchone()
             return row and row[0] is not None
     
+    async def claim_next_job(self, worker_id: str, exclude: Collection[str] = ()) -> Optional[str]:
+        """
+        Atomically move the best-scoring pending job to processing under a lease
+        held by worker_id and return its ID, or None if there is nothing to claim.
+        
+        A job's score is its priority weight plus one point per JOB_AGING_SECONDS
+        it has waited, divided by one plus the number of jobs its owner has running
+        or started within FAIR_SHARE_WINDOW_SECONDS. Higher priorities go first,
+        owners share the workers in proportion to their weights, and a low priority
+        job is never starved for good.
+        """
+        now = datetime.utcnow()
+        excluded = f"AND id NOT IN ({', '.join('?' for _ in exclude)})" if exclude else ""
+        weight = " ".join(
+            f"WHEN '{priority.value}' THEN {PRIORITY_WEIGHTS[priority]}" for priority in JobPriority
+        )
+        window_start = now - timedelta(seconds=settings.FAIR_SHARE_WINDOW_SECONDS)
+        
+        async with get_db() as db:
+            cursor = await db.execute(
+                f"""
+                WITH owner_load AS (
+                    SELECT COALESCE(owner, '') AS owner, COUNT(*) AS jobs
+                    FROM jobs
+                    WHERE status = ? OR started_at >= ?
+                    GROUP BY COALESCE(owner, '')
+                )
+                UPDATE jobs
+                SET status = ?, worker_id = ?, lease_expires_at = ?,
+                    attempts = COALESCE(attempts, 0) + 1,
+                    started_at = COALESCE(started_at, ?)
+                WHERE id = (
+                    SELECT id FROM jobs
+                    LEFT JOIN owner_load ON owner_load.owner = COALESCE(jobs.owner, '')
+                    WHERE jobs.status = ? {excluded}
+                    ORDER BY (
+                        (CASE jobs.priority {weight} ELSE {PRIORITY_WEIGHTS[JobPriority.NORMAL]} END)
+                        + (julianday(?) - julianday(jobs.created_at)) * 86400.0 / ?
+                    ) / (1 + COALESCE(owner_load.jobs, 0)) DESC,
+                    jobs.created_at
+                    LIMIT 1
+                )
+                AND status = ?
+                RETURNING id
+                """,
+                (
+                    JobStatus.PROCESSING.value,
+                    window_start.isoformat(),
+                    JobStatus.PROCESSING.value,
+                    worker_id,
+                    self._lease_expiry(now),
+                    now.isoformat(),
+                    JobStatus.PENDING.value,
+                    *exclude,
+                    now.isoformat(),
+                    max(1, settings.JOB_AGING_SECONDS),
+                    JobStatus.PENDING.value
+                )
+            )
+            row = await cursor.fetchone()
+            await db.commit()
+        
+        return row[0] if row else None
+    
+    async def renew_lease(self, job_id: str, worker_id: str) -> bool:
+        """Extend a job's lease; False if the worker no longer holds it"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                """
+                UPDATE jobs SET lease_expires_at = ?
+                WHERE id = ? AND worker_id = ? AND status = ?
+                """,
+                (self._lease_expiry(datetime.utcnow()), job_id, worker_id, JobStatus.PROCESSING.value)
+            )
+            await db.commit()
+            return cursor.rowcount > 0
+    
+    async def holds_lease(self, job_id: str, worker_id: str) -> bool:
+        """Whether worker_id still holds the job: processing, not cancelled, not reclaimed"""
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT 1 FROM jobs WHERE id = ? AND worker_id = ? AND status = ?",
+                (job_id, worker_id, JobStatus.PROCESSING.value)
+            )
+            return await cursor.fetchone() is not None
+    
+    async def expire_lease(self, job_id: str, worker_id: str):
+        """Give up a job at once, leaving it for the reaper to requeue or fail"""
+        async with get_db() as db:
+            await db.execute(
+                """
+                UPDATE jobs SET lease_expires_at = ?
+                WHERE id = ? AND worker_id = ? AND status = ?
+                """,
+                (datetime.utcnow().isoformat(), job_id, worker_id, JobStatus.PROCESSING.value)
+            )
+            await db.commit()
+    
+    async def release_job(self, job_id: str):
+        """Return a claimed job to the queue without counting the attempt"""
+        async with get_db() as db:
+            await db.execute(
+                """
+                UPDATE jobs
+                SET status = ?, worker_id = NULL, lease_expires_at = NULL,
+                    attempts = MAX(COALESCE(attempts, 0) - 1, 0)
+                WHERE id = ? AND status = ?
+                """,
+                (JobStatus.PENDING.value, job_id, JobStatus.PROCESSING.value)
+            )
+            await db.commit()
+    
+    async def reap_expired_leases(self, max_attempts: int) -> Tuple[List[str], List[str]]:
+        """
+        Requeue processing jobs whose worker stopped renewing its lease, failing
+        those already claimed max_attempts times. Returns (requeued, failed) IDs.
+        """
+        now = datetime.utcnow().isoformat()
+        # Jobs claimed before leases existed have none and are treated as expired
+        expired = "status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        
+        async with get_db() as db:
+            cursor = await db.execute(
+                f"""
+                UPDATE jobs
+                SET status = ?, worker_id = NULL, lease_expires_at = NULL
+                WHERE {expired} AND COALESCE(attempts, 0) < ?
+                RETURNING id
+                """,
+                (JobStatus.PENDING.value, JobStatus.PROCESSING.value, now, max_attempts)
+            )
+            requeued = [row[0] for row in await cursor.fetchall()]
+            
+            cursor = await db.execute(
+                f"""
+                UPDATE jobs
+                SET status = ?, lease_expires_at = NULL, completed_at = ?,
+                    error = 'Worker stopped responding on every attempt'
+                WHERE {expired}
+                RETURNING id
+                """,
+                (JobStatus.FAILED.value, now, JobStatus.PROCESSING.value, now)
+            )
+            failed = [row[0] for row in await cursor.fetchall()]
+            await db.commit()
+        
+        return requeued, failed
+    
+    def _lease_expiry(self, now: datetime) -> str:
+        """Lease expiry for a claim or heartbeat made at now"""
+        return (now + timedelta(seconds=settings.JOB_LEASE_SECONDS)).isoformat()
+    
     async def get_pending_jobs(self, limit: int = 10) -> List[Job]:
         """Get pending jobs for processing"""
         jobs, _ = await self.list_jobs(
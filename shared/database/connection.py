@@ -5,7 +5,7 @@ import aiosqlite
 import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 import structlog
 
@@ -63,7 +63,16 @@ async def create_tables():
                 platforms JSON,
                 processing_options JSON,
                 progress INTEGER DEFAULT 0,
-                total_segments INTEGER DEFAULT 0
+                total_segments INTEGER DEFAULT 0,
+                media_info JSON,
+                deadline_at TIMESTAMP,
+                encode_policy JSON,
+                quality_report JSON,
+                worker_id TEXT,
+                lease_expires_at TIMESTAMP,
+                attempts INTEGER DEFAULT 0,
+                priority TEXT DEFAULT 'normal',
+                owner TEXT
             )
         """)
         
@@ -74,6 +83,7 @@ async def create_tables():
                 job_id TEXT NOT NULL,
                 segment_number INTEGER NOT NULL,
                 file_path TEXT NOT NULL,
+                start_time REAL,
                 duration REAL,
                 size INTEGER,
                 platform TEXT,
@@ -81,12 +91,30 @@ async def create_tables():
                 upload_at TIMESTAMP,
                 upload_error TEXT,
                 upload_url TEXT,
+                thumbnail_path TEXT,
+                sprite_path TEXT,
+                hls_path TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE,
                 UNIQUE(job_id, segment_number, platform)
             )
         """)
         
+        # Per-stage state of each job, so a retried job resumes after its last completed stage
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS job_stages (
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                artifact TEXT,
+                started_at TIMESTAMP,
+                completed_at TIMESTAMP,
+                error TEXT,
+                PRIMARY KEY (job_id, stage),
+                FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE
+            )
+        """)
+        
         # Platform uploads table
         await db.execute("""
             CREATE TABLE IF NOT EXISTS platform_uploads (
@@ -121,12 +149,45 @@ async def create_tables():
             )
         """)
         
+        # Add columns introduced after the initial schema to existing databases
+        await _ensure_columns(db, "jobs", {
+            "media_info": "JSON",
+            "deadline_at": "TIMESTAMP",
+            "encode_policy": "JSON",
+            "quality_report": "JSON",
+            "worker_id": "TEXT",
+            "lease_expires_at": "TIMESTAMP",
+            "attempts": "INTEGER DEFAULT 0",
+            "priority": "TEXT DEFAULT 'normal'",
+            "owner": "TEXT",
+        })
+        await _ensure_columns(db, "job_segments", {
+            "start_time": "REAL",
+            "thumbnail_path": "TEXT",
+            "sprite_path": "TEXT",
+            "hls_path": "TEXT",
+        })
+        
         # Create indexes for better query performance
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_jobs_status 
             ON jobs(status, created_at)
         """)
         
+        # Covers every column the claim query reads from pending jobs, so scoring them needs
+        # no table lookups; the computed score itself is always sorted in a temp b-tree
+        await db.execute("DROP INDEX IF EXISTS idx_jobs_queue")
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim
+            ON jobs(status, priority, owner, created_at, id)
+        """)
+        
+        # Recent starts per owner, for fair sharing between owners
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_started
+            ON jobs(started_at, owner)
+        """)
+        
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_job_segments_job_id 
             ON job_segments(job_id)
@@ -141,6 +202,17 @@ async def create_tables():
         logger.info("Database tables created")
 
 
+async def _ensure_columns(db: aiosqlite.Connection, table: str, columns: Dict[str, str]):
+    """Add any missing columns to a table created by an older schema"""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in await cursor.fetchall()}
+    
+    for name, definition in columns.items():
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info("Database column added", table=table, column=name)
+
+
 @asynccontextmanager
 async def get_db():
     """Get database connection context manager"""
@@ -0,0 +1 @@
+# Media probing helpers
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Supervised FFmpeg/FFprobe execution
+
+Every invocation gets a wall-clock timeout, an optional CPU-time rlimit,
+cancellation that kills the whole process group, progress parsed from
+`-progress` output and a bounded stderr buffer. On Linux it is also killed
+when the process that started it exits, however that happens.
+"""
+import asyncio
+import ctypes
+import functools
+import os
+import resource
+import signal
+import sys
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+
+import structlog
+
+from api.core.config import settings
+
+logger = structlog.get_logger()
+
+ProgressCallback = Callable[[float], Awaitable[None]]
+
+# Keys FFmpeg writes for each -progress report
+PROGRESS_KEYS = {
+    "frame", "fps", "stream_0_0_q", "bitrate", "total_size", "out_time_us",
+    "out_time_ms", "out_time", "dup_frames", "drop_frames", "speed", "progress"
+}
+
+# prctl option that sends a process a signal when the thread that started it exits
+PR_SET_PDEATHSIG = 1
+
+_libc = ctypes.CDLL(None, use_errno=True) if sys.platform.startswith("linux") else None
+
+
+class FFmpegError(RuntimeError):
+    """FFmpeg/FFprobe exited unsuccessfully or ran out of time"""
+    
+    def __init__(self, message: str, returncode: Optional[int] = None, stderr: str = ""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegCancelled(Exception):
+    """The invocation was killed because its job was cancelled"""
+
+
+class FFmpegSupervisor:
+    """Run FFmpeg/FFprobe processes under time, CPU and cancellation control"""
+    
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        cpu_seconds: Optional[int] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+        stderr_lines: Optional[int] = None
+    ):
+        self.timeout = timeout if timeout is not None else settings.FFMPEG_TIMEOUT_SECONDS
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else settings.FFMPEG_CPU_LIMIT_SECONDS
+        self.cancel_event = cancel_event
+        self.stderr_lines = stderr_lines or settings.FFMPEG_STDERR_LINES
+    
+    async def run(
+        self,
+        cmd: List[str],
+        progress: Optional[ProgressCallback] = None,
+        duration: Optional[float] = None
+    ) -> bytes:
+        """
+        Run a command and return its stdout. For FFmpeg commands, `progress` is
+        called with the fraction of `duration` encoded so far.
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise FFmpegCancelled(f"{cmd[0]} not started, job cancelled")
+        
+        if cmd[0] == "ffmpeg":
+            extra = ["-hide_banner", "-nostats"]
+            if progress is not None:
+                extra.extend(["-progress", "pipe:2"])
+            cmd = [cmd[0], *extra, *cmd[1:]]
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,  # Own process group so children die with it
+            preexec_fn=functools.partial(self._prepare_child, os.getpid())
+        )
+        
+        stderr_tail: deque = deque(maxlen=self.stderr_lines)
+        stdout_task = asyncio.create_task(process.stdout.read())
+        stderr_task = asyncio.create_task(
+            self._read_stderr(process.stderr, stderr_tail, progress, duration)
+        )
+        waiters = [asyncio.create_task(process.wait())]
+        if self.cancel_event is not None:
+            waiters.append(asyncio.create_task(self.cancel_event.wait()))
+        
+        try:
+            done, _ = await asyncio.wait(
+                waiters,
+                timeout=self.timeout or None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if waiters[0] not in done:
+                self._kill(process)
+                await process.wait()
+                await asyncio.gather(stdout_task, stderr_task, return_exceptions=True)
+                
+                if done:
+                    logger.info("FFmpeg killed on cancellation", command=cmd[0], pid=process.pid)
+                    raise FFmpegCancelled(f"{cmd[0]} cancelled")
+                
+                logger.error("FFmpeg timed out", command=cmd[0], timeout=self.timeout)
+                raise FFmpegError(
+                    f"{cmd[0]} timed out after {self.timeout}s",
+                    stderr="\n".join(stderr_tail)
+                )
+            
+            stdout, _ = await asyncio.gather(stdout_task, stderr_task)
+        
+        except asyncio.CancelledError:
+            # The awaiting task was cancelled (e.g. a job timeout); never leave orphans
+            self._kill(process)
+            await process.wait()
+            stdout_task.cancel()
+            stderr_task.cancel()
+            await asyncio.gather(stdout_task, stderr_task, return_exceptions=True)
+            raise
+        
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        
+        if process.returncode != 0:
+            stderr = "\n".join(stderr_tail)
+            logger.error("FFmpeg command failed",
+                       command=cmd[0],
+                       returncode=process.returncode,
+                       error=stderr[-2000:])
+            raise FFmpegError(
+                f"{cmd[0]} exited with code {process.returncode}",
+                returncode=process.returncode,
+                stderr=stderr
+            )
+        
+        return stdout
+    
+    async def _read_stderr(
+        self,
+        stream: asyncio.StreamReader,
+        tail: deque,
+        progress: Optional[ProgressCallback],
+        duration: Optional[float]
+    ):
+        """Split stderr into progress key=value updates and a bounded log tail"""
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            
+            text = line.decode(errors="replace").rstrip()
+            key, sep, value = text.partition("=")
+            
+            if progress is not None and sep and key in PROGRESS_KEYS:
+                if key == "out_time_us" and duration and value.isdigit():
+                    await progress(min(1.0, int(value) / 1_000_000 / duration))
+                elif key == "progress" and value == "end":
+                    await progress(1.0)
+                continue
+            
+            tail.append(text)
+    
+    def _prepare_child(self, parent: int):
+        """Tie the child to the process starting it and apply the CPU-time rlimit, before exec"""
+        _die_with_parent(parent)
+        if self.cpu_seconds:
+            self._limit_cpu()
+    
+    def _limit_cpu(self):
+        """Apply the CPU-time rlimit in the child before exec"""
+        resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 5))
+    
+    def _kill(self, process: asyncio.subprocess.Process):
+        """Kill the process group of a running command"""
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _die_with_parent(parent: int):
+    """
+    Have the kernel kill the calling child when `parent` exits. Commands run in
+    their own session, so a job process that crashes or is terminated with its
+    pool would otherwise leave them running, writing into discarded scratch.
+    """
+    if _libc is None:
+        return
+    
+    _libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+    if os.getppid() != parent:
+        os._exit(1)  # The parent exited before the signal was armed
@@ -0,0 +1,669 @@
+"""
+In-process MP4/MOV and Matroska/WebM header parsing
+
+Reads only the container headers (moov for MP4, EBML/Info/Tracks/Cues for WebM)
+so the common upload formats can be probed without forking ffprobe.
+Anything these parsers do not understand returns None and the caller falls
+back to ffprobe.
+"""
+import hashlib
+import io
+import math
+import os
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import structlog
+
+from shared.models.job import MediaInfo
+
+logger = structlog.get_logger()
+
+# Refuse to load absurdly large header boxes into memory
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+
+# Relative frame rate difference beyond which a stream counts as variable frame rate
+FRAME_RATE_TOLERANCE = 0.01
+
+MP4_FORMAT_NAME = "mov,mp4,m4a,3gp,3g2,mj2"
+MATROSKA_FORMAT_NAME = "matroska,webm"
+
+MP4_VIDEO_CODECS = {
+    b"avc1": "h264",
+    b"avc3": "h264",
+    b"hvc1": "hevc",
+    b"hev1": "hevc",
+    b"vp09": "vp9",
+    b"av01": "av1",
+    b"mp4v": "mpeg4",
+}
+
+MP4_AUDIO_CODECS = {
+    b"mp4a": "aac",
+    b"Opus": "opus",
+    b"ac-3": "ac3",
+    b"ec-3": "eac3",
+    b".mp3": "mp3",
+}
+
+# Sample entry children holding the decoder configuration FFmpeg treats as extradata
+MP4_CODEC_CONFIG_BOXES = (b"avcC", b"hvcC", b"av1C")
+
+H264_PROFILES = {
+    66: "Baseline",
+    77: "Main",
+    88: "Extended",
+    100: "High",
+    110: "High 10",
+    122: "High 4:2:2",
+    244: "High 4:4:4 Predictive",
+}
+
+MATROSKA_CODECS = {
+    "V_VP8": "vp8",
+    "V_VP9": "vp9",
+    "V_AV1": "av1",
+    "V_MPEG4/ISO/AVC": "h264",
+    "V_MPEGH/ISO/HEVC": "hevc",
+    "A_OPUS": "opus",
+    "A_VORBIS": "vorbis",
+    "A_AAC": "aac",
+    "A_MPEG/L3": "mp3",
+}
+
+# Matroska element IDs (marker bits included)
+EBML_HEADER = 0x1A45DFA3
+EBML_DOCTYPE = 0x4282
+MKV_SEGMENT = 0x18538067
+MKV_SEEK_HEAD = 0x114D9B74
+MKV_SEEK = 0x4DBB
+MKV_SEEK_ID = 0x53AB
+MKV_SEEK_POSITION = 0x53AC
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_NUMBER = 0xD7
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_CODEC_PRIVATE = 0x63A2
+MKV_DEFAULT_DURATION = 0x23E383
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_AUDIO = 0xE1
+MKV_SAMPLING_FREQUENCY = 0xB5
+MKV_CHANNELS = 0x9F
+MKV_CUES = 0x1C53BB6B
+MKV_CUE_POINT = 0xBB
+MKV_CUE_TIME = 0xB3
+MKV_CUE_TRACK_POSITIONS = 0xB7
+MKV_CUE_TRACK = 0xF7
+MKV_CLUSTER = 0x1F43B675
+
+
+def parse_media_header(path: str) -> Optional[MediaInfo]:
+    """Probe an MP4/MOV or WebM/Matroska file from its headers, or None if unsupported"""
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            
+            if magic[:4] == struct.pack(">I", EBML_HEADER):
+                media_info = _parse_matroska(f)
+            elif magic[4:8] in (b"ftyp", b"moov", b"free", b"wide", b"skip", b"mdat"):
+                media_info = _parse_mp4(f)
+            else:
+                return None
+        
+        if media_info is None or media_info.duration <= 0:
+            return None
+        
+        media_info.size = os.path.getsize(path)
+        media_info.bit_rate = int(media_info.size * 8 / media_info.duration)
+        return media_info
+    
+    except Exception as e:
+        logger.debug("Header parse failed", path=path, error=str(e))
+        return None
+
+
+# MP4 / MOV
+
+def _iter_boxes(data: bytes, offset: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_start, payload_end) for each box in a buffer"""
+    end = len(data) if end is None else end
+    
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        
+        if size < header or offset + size > end:
+            return
+        
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find_box(data: bytes, path: List[bytes], offset: int = 0, end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """Find the first box at a nested path such as [b"mdia", b"minf"]"""
+    for box_type, start, stop in _iter_boxes(data, offset, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return start, stop
+            return _find_box(data, path[1:], start, stop)
+    return None
+
+
+def _read_moov(f: BinaryIO) -> Optional[bytes]:
+    """Walk the top-level boxes, skipping media data, and return the moov payload"""
+    file_size = os.fstat(f.fileno()).st_size
+    offset = 0
+    
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        
+        size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        
+        if size < header_size:
+            return None
+        
+        if box_type == b"moov":
+            if size > MAX_HEADER_BYTES:
+                return None
+            f.seek(offset + header_size)
+            return f.read(size - header_size)
+        
+        offset += size
+    
+    return None
+
+
+def _parse_mp4(f: BinaryIO) -> Optional[MediaInfo]:
+    """Read duration, tracks and keyframes from the moov box"""
+    moov = _read_moov(f)
+    if moov is None:
+        return None
+    
+    # Fragmented files keep their samples in moof boxes; leave those to ffprobe
+    if _find_box(moov, [b"mvex"]) is not None:
+        return None
+    
+    mvhd = _find_box(moov, [b"mvhd"])
+    if mvhd is None:
+        return None
+    
+    start, _ = mvhd
+    version = moov[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", moov, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", moov, start + 12)
+    
+    if not timescale:
+        return None
+    
+    media_info = MediaInfo(format_name=MP4_FORMAT_NAME, duration=duration / timescale)
+    
+    for box_type, trak_start, trak_end in _iter_boxes(moov):
+        if box_type != b"trak":
+            continue
+        
+        hdlr = _find_box(moov, [b"mdia", b"hdlr"], trak_start, trak_end)
+        if hdlr is None:
+            continue
+        handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+        
+        if handler == b"vide" and media_info.video_codec is None:
+            if not _parse_mp4_video_track(moov, trak_start, trak_end, media_info):
+                return None
+        elif handler == b"soun" and media_info.audio_codec is None:
+            _parse_mp4_audio_track(moov, trak_start, trak_end, media_info)
+    
+    return media_info
+
+
+def _parse_mp4_video_track(moov: bytes, start: int, end: int, media_info: MediaInfo) -> bool:
+    """Fill video fields from a video trak; False if the sample tables are unusable"""
+    stbl = _find_box(moov, [b"mdia", b"minf", b"stbl"], start, end)
+    mdhd = _find_box(moov, [b"mdia", b"mdhd"], start, end)
+    if stbl is None or mdhd is None:
+        return False
+    
+    mdhd_start = mdhd[0]
+    if moov[mdhd_start] == 1:
+        timescale = struct.unpack_from(">I", moov, mdhd_start + 20)[0]
+    else:
+        timescale = struct.unpack_from(">I", moov, mdhd_start + 12)[0]
+    if not timescale:
+        return False
+    
+    # Sample description: codec, coded size and (for H.264) the profile
+    stsd = _find_box(moov, [b"stsd"], *stbl)
+    if stsd is None:
+        return False
+    entry_start = stsd[0] + 8
+    entry_size, fourcc = struct.unpack_from(">I4s", moov, entry_start)
+    media_info.video_codec = MP4_VIDEO_CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+    media_info.width, media_info.height = struct.unpack_from(">HH", moov, entry_start + 32)
+    
+    for config_box in MP4_CODEC_CONFIG_BOXES:
+        config = _find_box(moov, [config_box], entry_start + 86, entry_start + entry_size)
+        if config is not None:
+            media_info.video_extradata_hash = _extradata_hash(moov[config[0]:config[1]])
+            break
+    
+    avcc = _find_box(moov, [b"avcC"], entry_start + 86, entry_start + entry_size)
+    if avcc is not None:
+        profile_idc, constraints = moov[avcc[0] + 1], moov[avcc[0] + 2]
+        profile = H264_PROFILES.get(profile_idc)
+        if profile == "Baseline" and constraints & 0x40:
+            profile = "Constrained Baseline"
+        media_info.video_profile = profile
+    
+    media_info.rotation = _mp4_rotation(moov, start, end)
+    
+    # Decode timestamps from stts; presentation offsets from ctts and the edit list
+    stts = _find_box(moov, [b"stts"], *stbl)
+    if stts is None:
+        return False
+    deltas = _read_run_table(moov, stts[0], signed=False)
+    if not deltas:
+        return False
+    
+    sample_count = sum(count for count, _ in deltas)
+    total_delta = sum(count * delta for count, delta in deltas)
+    if total_delta:
+        media_info.fps = sample_count * timescale / total_delta
+    # A differing delta on the final sample alone is normal muxer rounding
+    runs = deltas[:-1] if len(deltas) > 1 and deltas[-1][0] == 1 else deltas
+    media_info.variable_frame_rate = _deltas_vary(runs)
+    
+    ctts = _find_box(moov, [b"ctts"], *stbl)
+    offsets = _read_run_table(moov, ctts[0], signed=moov[ctts[0]] == 1) if ctts else []
+    media_offset = _mp4_edit_offset(moov, start, end)
+    
+    stss = _find_box(moov, [b"stss"], *stbl)
+    if stss is None:
+        sync_samples = None  # Every sample is a sync sample
+    else:
+        count = struct.unpack_from(">I", moov, stss[0] + 4)[0]
+        sync_samples = set(struct.unpack_from(f">{count}I", moov, stss[0] + 8))
+    
+    media_info.keyframes = sorted(
+        (dts + offset - media_offset) / timescale
+        for sample, dts, offset in _iter_sample_times(deltas, offsets)
+        if sync_samples is None or sample in sync_samples
+    )
+    return True
+
+
+def _parse_mp4_audio_track(moov: bytes, start: int, end: int, media_info: MediaInfo):
+    """Fill audio fields from a sound trak"""
+    stsd = _find_box(moov, [b"mdia", b"minf", b"stbl", b"stsd"], start, end)
+    if stsd is None:
+        return
+    
+    entry_start = stsd[0] + 8
+    entry_size, fourcc = struct.unpack_from(">I4s", moov, entry_start)
+    codec = MP4_AUDIO_CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+    
+    if fourcc == b"mp4a":
+        esds = _find_box(moov, [b"esds"], entry_start + 36, entry_start + entry_size)
+        if esds is not None and _esds_object_type(moov[esds[0] + 4:esds[1]]) in (0x69, 0x6B):
+            codec = "mp3"
+    
+    media_info.audio_codec = codec
+    media_info.audio_channels = struct.unpack_from(">H", moov, entry_start + 24)[0]
+    media_info.audio_sample_rate = struct.unpack_from(">I", moov, entry_start + 32)[0] >> 16
+
+
+def _read_run_table(data: bytes, start: int, signed: bool) -> List[Tuple[int, int]]:
+    """Read an stts/ctts style table of (sample_count, value) runs"""
+    count = struct.unpack_from(">I", data, start + 4)[0]
+    fmt = ">Ii" if signed else ">II"
+    return [struct.unpack_from(fmt, data, start + 8 + i * 8) for i in range(count)]
+
+
+def _iter_sample_times(deltas: List[Tuple[int, int]],
+                       offsets: List[Tuple[int, int]]) -> Iterator[Tuple[int, int, int]]:
+    """Yield (1-based sample number, decode time, composition offset) for every sample"""
+    offset_runs = iter(offsets)
+    offset_left, offset = 0, 0
+    sample, dts = 1, 0
+    
+    for count, delta in deltas:
+        for _ in range(count):
+            if offsets:
+                while offset_left == 0:
+                    offset_left, offset = next(offset_runs, (math.inf, 0))
+                offset_left -= 1
+            yield sample, dts, offset
+            sample += 1
+            dts += delta
+
+
+def _deltas_vary(runs: List[Tuple[int, int]]) -> bool:
+    """
+    Whether sample durations vary by more than jitter: the mean must be off the
+    dominant duration by over the tolerance ffprobe's frame rates get, or by over
+    a tick, since coarse timescales round 30fps to alternating 33/34ms
+    """
+    counts: Dict[int, int] = {}
+    for count, delta in runs:
+        counts[delta] = counts.get(delta, 0) + count
+    
+    samples = sum(counts.values())
+    dominant = max(counts, key=counts.get)
+    if not samples or not dominant:
+        return False
+    
+    mean = sum(count * delta for count, delta in runs) / samples
+    return abs(mean - dominant) > max(dominant * FRAME_RATE_TOLERANCE, 1)
+
+
+def _mp4_edit_offset(moov: bytes, start: int, end: int) -> int:
+    """Media time the first non-empty edit starts at, in track timescale units"""
+    elst = _find_box(moov, [b"edts", b"elst"], start, end)
+    if elst is None:
+        return 0
+    
+    elst_start = elst[0]
+    version = moov[elst_start]
+    count = struct.unpack_from(">I", moov, elst_start + 4)[0]
+    entry_size, fmt = (20, ">Qq") if version == 1 else (12, ">Ii")
+    
+    for i in range(count):
+        _, media_time = struct.unpack_from(fmt, moov, elst_start + 8 + i * entry_size)
+        if media_time >= 0:
+            return media_time
+    return 0
+
+
+def _mp4_rotation(moov: bytes, start: int, end: int) -> int:
+    """Clockwise rotation in degrees from the track header matrix"""
+    tkhd = _find_box(moov, [b"tkhd"], start, end)
+    if tkhd is None:
+        return 0
+    
+    matrix_start = tkhd[0] + (52 if moov[tkhd[0]] == 1 else 40)
+    a, b = struct.unpack_from(">ii", moov, matrix_start)
+    return int(round(math.degrees(math.atan2(b, a)))) % 360
+
+
+def _extradata_hash(config: bytes) -> str:
+    """Digest of a decoder configuration, in the form FFprobe reports extradata_hash"""
+    return f"SHA256:{hashlib.sha256(config).hexdigest()}"
+
+
+def _esds_object_type(esds: bytes) -> Optional[int]:
+    """objectTypeIndication from the DecoderConfigDescriptor in an esds payload"""
+    def read_descriptor(offset: int) -> Tuple[int, int, int]:
+        tag = esds[offset]
+        offset += 1
+        size = 0
+        for _ in range(4):
+            byte = esds[offset]
+            offset += 1
+            size = (size << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                break
+        return tag, offset, size
+    
+    tag, offset, _ = read_descriptor(0)
+    if tag != 0x03:  # ES_Descriptor
+        return None
+    flags = esds[offset + 2]
+    offset += 3
+    if flags & 0x80:
+        offset += 2
+    if flags & 0x40:
+        offset += 1 + esds[offset]
+    if flags & 0x20:
+        offset += 2
+    
+    tag, offset, _ = read_descriptor(offset)
+    return esds[offset] if tag == 0x04 else None
+
+
+# Matroska / WebM
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> Optional[Tuple[int, int]]:
+    """Read an EBML variable-length integer; returns (value, length) or None at EOF"""
+    first = f.read(1)
+    if not first:
+        return None
+    
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML variable-length integer")
+    
+    value = byte if keep_marker else byte & (mask - 1)
+    rest = f.read(length - 1)
+    if len(rest) != length - 1:
+        return None
+    for b in rest:
+        value = (value << 8) | b
+    
+    return value, length
+
+
+def _read_element_header(f: BinaryIO) -> Optional[Tuple[int, Optional[int]]]:
+    """Read an element ID and data size; size None means unknown length"""
+    element_id = _read_vint(f, keep_marker=True)
+    if element_id is None:
+        return None
+    size = _read_vint(f, keep_marker=False)
+    if size is None:
+        return None
+    
+    value, length = size
+    unknown = value == (1 << (7 * length)) - 1
+    return element_id[0], None if unknown else value
+
+
+def _iter_elements(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    """Yield (id, payload) for each child element in a master element's payload"""
+    f = io.BytesIO(data)
+    while True:
+        header = _read_element_header(f)
+        if header is None or header[1] is None:
+            return
+        element_id, size = header
+        payload = f.read(size)
+        if len(payload) != size:
+            return
+        yield element_id, payload
+
+
+def _uint(data: bytes) -> int:
+    """Decode an EBML unsigned integer"""
+    return int.from_bytes(data, "big") if data else 0
+
+
+def _float(data: bytes) -> float:
+    """Decode an EBML float (4 or 8 bytes)"""
+    if len(data) == 4:
+        return struct.unpack(">f", data)[0]
+    if len(data) == 8:
+        return struct.unpack(">d", data)[0]
+    return 0.0
+
+
+def _read_payload(f: BinaryIO, size: Optional[int]) -> Optional[bytes]:
+    """Read a master element payload that is small enough to hold in memory"""
+    if size is None:
+        return None
+    if size > MAX_HEADER_BYTES:
+        f.seek(size, os.SEEK_CUR)
+        return None
+    return f.read(size)
+
+
+def _parse_matroska(f: BinaryIO) -> Optional[MediaInfo]:
+    """Read duration, tracks and cue keyframes from a Matroska/WebM file"""
+    header = _read_element_header(f)
+    if header is None or header[0] != EBML_HEADER:
+        return None
+    ebml = _read_payload(f, header[1])
+    if ebml is None:
+        return None
+    
+    doc_type = next((p.decode("ascii", "ignore") for i, p in _iter_elements(ebml) if i == EBML_DOCTYPE), "")
+    if doc_type not in ("webm", "matroska"):
+        return None
+    
+    header = _read_element_header(f)
+    if header is None or header[0] != MKV_SEGMENT:
+        return None
+    segment_start = f.tell()
+    segment_end = None if header[1] is None else segment_start + header[1]
+    
+    info = tracks = cues = None
+    cues_position = None
+    
+    # Level-1 elements up to the first cluster; media data is never read
+    while segment_end is None or f.tell() < segment_end:
+        element = _read_element_header(f)
+        if element is None:
+            break
+        element_id, size = element
+        
+        if element_id == MKV_CLUSTER or size is None:
+            break
+        
+        if element_id == MKV_INFO:
+            info = _read_payload(f, size)
+        elif element_id == MKV_TRACKS:
+            tracks = _read_payload(f, size)
+        elif element_id == MKV_CUES:
+            cues = _read_payload(f, size)
+        elif element_id == MKV_SEEK_HEAD:
+            seek_head = _read_payload(f, size)
+            cues_position = _matroska_seek_position(seek_head or b"", MKV_CUES)
+        else:
+            f.seek(size, os.SEEK_CUR)
+    
+    if info is None or tracks is None:
+        return None
+    
+    timecode_scale = 1_000_000
+    duration = 0.0
+    for element_id, payload in _iter_elements(info):
+        if element_id == MKV_TIMECODE_SCALE:
+            timecode_scale = _uint(payload)
+        elif element_id == MKV_DURATION:
+            duration = _float(payload)
+    
+    media_info = MediaInfo(
+        format_name=MATROSKA_FORMAT_NAME,
+        duration=duration * timecode_scale / 1e9
+    )
+    video_track = _parse_matroska_tracks(tracks, media_info)
+    
+    # Cues usually trail the clusters; the seek head says where
+    if cues is None and cues_position is not None:
+        f.seek(segment_start + cues_position)
+        element = _read_element_header(f)
+        if element is not None and element[0] == MKV_CUES:
+            cues = _read_payload(f, element[1])
+    
+    if cues is not None and video_track is not None:
+        media_info.keyframes = _matroska_cue_times(cues, video_track, timecode_scale)
+    
+    return media_info
+
+
+def _matroska_seek_position(seek_head: bytes, target_id: int) -> Optional[int]:
+    """Segment-relative position of a level-1 element from the SeekHead"""
+    for element_id, seek in _iter_elements(seek_head):
+        if element_id != MKV_SEEK:
+            continue
+        fields = dict(_iter_elements(seek))
+        if _uint(fields.get(MKV_SEEK_ID, b"")) == target_id and MKV_SEEK_POSITION in fields:
+            return _uint(fields[MKV_SEEK_POSITION])
+    return None
+
+
+def _parse_matroska_tracks(tracks: bytes, media_info: MediaInfo) -> Optional[int]:
+    """Fill stream fields from the Tracks element; returns the video track number"""
+    video_track = None
+    
+    for element_id, entry in _iter_elements(tracks):
+        if element_id != MKV_TRACK_ENTRY:
+            continue
+        
+        fields: Dict[int, bytes] = dict(_iter_elements(entry))
+        track_type = _uint(fields.get(MKV_TRACK_TYPE, b""))
+        codec_id = fields.get(MKV_CODEC_ID, b"").decode("ascii", "ignore").rstrip("\x00")
+        codec = next(
+            (name for prefix, name in MATROSKA_CODECS.items() if codec_id.startswith(prefix)),
+            codec_id.lower() or None
+        )
+        
+        if track_type == 1 and video_track is None:
+            video_track = _uint(fields.get(MKV_TRACK_NUMBER, b""))
+            video = dict(_iter_elements(fields.get(MKV_VIDEO, b"")))
+            media_info.video_codec = codec
+            media_info.width = _uint(video.get(MKV_PIXEL_WIDTH, b"")) or None
+            media_info.height = _uint(video.get(MKV_PIXEL_HEIGHT, b"")) or None
+            if MKV_CODEC_PRIVATE in fields:
+                media_info.video_extradata_hash = _extradata_hash(fields[MKV_CODEC_PRIVATE])
+            
+            default_duration = _uint(fields.get(MKV_DEFAULT_DURATION, b""))
+            if default_duration:
+                media_info.fps = 1e9 / default_duration
+            else:
+                # Browser recordings carry no nominal frame rate
+                media_info.variable_frame_rate = True
+        
+        elif track_type == 2 and media_info.audio_codec is None:
+            audio = dict(_iter_elements(fields.get(MKV_AUDIO, b"")))
+            media_info.audio_codec = codec
+            media_info.audio_sample_rate = int(_float(audio.get(MKV_SAMPLING_FREQUENCY, b""))) or None
+            media_info.audio_channels = _uint(audio.get(MKV_CHANNELS, b"")) or 1
+    
+    return video_track
+
+
+def _matroska_cue_times(cues: bytes, video_track: int, timecode_scale: int) -> List[float]:
+    """Keyframe timestamps of the video track from the Cues index"""
+    keyframes = []
+    
+    for element_id, cue_point in _iter_elements(cues):
+        if element_id != MKV_CUE_POINT:
+            continue
+        
+        cue_time = None
+        on_video_track = False
+        for field_id, payload in _iter_elements(cue_point):
+            if field_id == MKV_CUE_TIME:
+                cue_time = _uint(payload)
+            elif field_id == MKV_CUE_TRACK_POSITIONS:
+                positions = dict(_iter_elements(payload))
+                on_video_track |= _uint(positions.get(MKV_CUE_TRACK, b"")) == video_track
+        
+        if cue_time is not None and on_video_track:
+            keyframes.append(cue_time * timecode_scale / 1e9)
+    
+    return sorted(keyframes)
@@ -0,0 +1,169 @@
+"""
+Media probing producing the MediaInfo record stored on jobs
+
+MP4/MOV and WebM/Matroska headers are parsed in-process; FFprobe is only
+forked for files the header parser cannot handle.
+"""
+import asyncio
+import json
+from fractions import Fraction
+from typing import List, Optional
+
+import structlog
+
+from api.core.config import settings
+from shared.media.ffmpeg import FFmpegSupervisor
+from shared.media.headers import FRAME_RATE_TOLERANCE, parse_media_header
+from shared.models.job import MediaInfo
+
+logger = structlog.get_logger()
+
+
+async def probe_media(path: str) -> MediaInfo:
+    """Probe container, streams and keyframe index of a media file"""
+    loop = asyncio.get_event_loop()
+    
+    media_info = await loop.run_in_executor(None, parse_media_header, path)
+    if media_info is not None:
+        return media_info
+    
+    try:
+        probe, keyframes = await asyncio.gather(
+            _run_ffprobe([
+                "-show_format",
+                "-show_streams",
+                "-show_data_hash", "SHA256",
+                "-of", "json",
+                path
+            ]),
+            _probe_keyframes(path)
+        )
+        media_info = _parse_probe(json.loads(probe))
+        media_info.keyframes = keyframes
+        return media_info
+    
+    except Exception as e:
+        logger.warning("FFprobe failed, falling back to OpenCV", path=path, error=str(e))
+        return await loop.run_in_executor(None, _probe_with_opencv, path)
+
+
+async def _run_ffprobe(args: List[str]) -> bytes:
+    """Run FFprobe under the probe time limit and return its stdout"""
+    supervisor = FFmpegSupervisor(timeout=settings.FFPROBE_TIMEOUT_SECONDS)
+    return await supervisor.run(["ffprobe", "-v", "error", *args])
+
+
+async def _probe_keyframes(path: str) -> List[float]:
+    """Keyframe timestamps of the first video stream from the packet index (demux only)"""
+    stdout = await _run_ffprobe([
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        path
+    ])
+    
+    keyframes = []
+    for line in stdout.decode().splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    
+    return sorted(keyframes)
+
+
+def _parse_probe(probe: dict) -> MediaInfo:
+    """Build a MediaInfo record from FFprobe JSON output"""
+    fmt = probe.get("format", {})
+    streams = probe.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    
+    media_info = MediaInfo(
+        format_name=fmt.get("format_name"),
+        duration=_to_float(fmt.get("duration")) or 0.0,
+        size=_to_int(fmt.get("size")),
+        bit_rate=_to_int(fmt.get("bit_rate"))
+    )
+    
+    if video:
+        real_fps = _parse_rate(video.get("r_frame_rate"))
+        avg_fps = _parse_rate(video.get("avg_frame_rate"))
+        
+        media_info.video_codec = video.get("codec_name")
+        media_info.video_profile = video.get("profile")
+        media_info.pix_fmt = video.get("pix_fmt")
+        media_info.video_extradata_hash = video.get("extradata_hash")
+        media_info.width = video.get("width")
+        media_info.height = video.get("height")
+        media_info.fps = avg_fps or real_fps
+        media_info.variable_frame_rate = bool(
+            real_fps and avg_fps and abs(real_fps - avg_fps) / real_fps > FRAME_RATE_TOLERANCE
+        )
+        media_info.rotation = _parse_rotation(video)
+        
+        if not media_info.duration:
+            media_info.duration = _to_float(video.get("duration")) or 0.0
+    
+    if audio:
+        media_info.audio_codec = audio.get("codec_name")
+        media_info.audio_sample_rate = _to_int(audio.get("sample_rate"))
+        media_info.audio_channels = audio.get("channels")
+    
+    return media_info
+
+
+def _probe_with_opencv(path: str) -> MediaInfo:
+    """Minimal probe for when FFprobe is unavailable or cannot read the file"""
+    import cv2
+    
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    
+    return MediaInfo(
+        duration=frame_count / fps if fps > 0 and frame_count > 0 else 0.0,
+        width=width or None,
+        height=height or None,
+        fps=fps or None
+    )
+
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Parse an FFprobe rational frame rate such as 30000/1001"""
+    try:
+        value = float(Fraction(rate))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return value if value > 0 else None
+
+
+def _parse_rotation(stream: dict) -> int:
+    """Clockwise rotation in degrees from the display matrix side data or the legacy rotate tag"""
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            # Display matrix rotation is reported counter-clockwise
+            return -int(side_data["rotation"]) % 360
+    
+    rotate = stream.get("tags", {}).get("rotate")
+    return int(rotate) % 360 if rotate else 0
+
+
+def _to_float(value) -> Optional[float]:
+    """Parse an optional FFprobe number"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    """Parse an optional FFprobe integer"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -3,7 +3,7 @@ Job data models for video processing queue
 """
 from datetime import datetime
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pydantic import BaseModel, Field, ConfigDict
 
 
@@ -16,6 +16,23 @@ class JobStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class JobPriority(str, Enum):
+    """Job priority lanes"""
+    LOW = "low"
+    NORMAL = "normal"
+    HIGH = "high"
+    URGENT = "urgent"
+
+
+# Relative share of worker slots each lane gets when jobs compete for them
+PRIORITY_WEIGHTS: Dict[JobPriority, int] = {
+    JobPriority.LOW: 1,
+    JobPriority.NORMAL: 2,
+    JobPriority.HIGH: 4,
+    JobPriority.URGENT: 8,
+}
+
+
 class UploadStatus(str, Enum):
     """Upload status enumeration"""
     PENDING = "pending"
@@ -23,6 +40,7 @@ class UploadStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     SCHEDULED = "scheduled"
+    CANCELLED = "cancelled"  # Withdrawn before it started, with the job that made it
 
 
 class Platform(str, Enum):
@@ -32,15 +50,75 @@ class Platform(str, Enum):
     YOUTUBE = "youtube"
 
 
+# Longest video each platform accepts as short-form content, in seconds
+PLATFORM_MAX_DURATION: Dict[Platform, float] = {
+    Platform.TIKTOK: 60,
+    Platform.INSTAGRAM: 60,
+    Platform.YOUTUBE: 60,
+}
+
+
+class EncodeProfile(BaseModel):
+    """Output encode settings for a platform rendition"""
+    model_config = ConfigDict(frozen=True)
+    
+    name: str
+    max_long_side: int = Field(gt=0)  # Longest frame edge in pixels
+    video_bitrate_kbps: int = Field(gt=0)
+    audio_bitrate_kbps: int = Field(gt=0)
+
+
+# Per-platform renditions; platforms with equal settings share one encode
+SHORT_FORM_PROFILE = EncodeProfile(
+    name="short_1080p", max_long_side=1920, video_bitrate_kbps=5000, audio_bitrate_kbps=128
+)
+PLATFORM_ENCODE_PROFILES: Dict[Platform, EncodeProfile] = {
+    Platform.TIKTOK: SHORT_FORM_PROFILE,
+    Platform.INSTAGRAM: SHORT_FORM_PROFILE,
+    Platform.YOUTUBE: EncodeProfile(
+        name="youtube_1080p", max_long_side=1920, video_bitrate_kbps=8000, audio_bitrate_kbps=192
+    ),
+}
+
+
+class EncodePolicy(BaseModel):
+    """x264 speed/quality settings chosen for a job and the inputs that chose them"""
+    preset: str
+    crf: int
+    backlog: int = 0                                  # Pending jobs when processing started
+    deadline_seconds: Optional[float] = None          # Time left until the job's deadline
+    estimated_encode_seconds: Optional[float] = None  # Predicted encode time at this preset
+    
+    def x264_args(self) -> List[str]:
+        """FFmpeg arguments applying this policy to a libx264 output"""
+        return ["-preset", self.preset, "-crf", str(self.crf)]
+
+
+class SplitMode(str, Enum):
+    """How segments are cut from the source video"""
+    AUTO = "auto"            # Smart-cut when the input allows it, otherwise encode
+    ENCODE = "encode"        # Re-encode every segment
+    SMART_CUT = "smart_cut"  # Copy whole GOPs, re-encode only partial GOPs at cut points
+
+
+class CompilationSpec(BaseModel):
+    """Existing segments, in playback order, joined into a compilation job's input video"""
+    segment_ids: List[str] = Field(min_length=1)
+
+
 class ProcessingOptions(BaseModel):
     """Video processing options"""
     eye_gaze_correction: bool = True
     eye_gaze_intensity: float = Field(default=0.7, ge=0.0, le=1.0)
     segment_duration: int = Field(default=60, gt=0)
+    split_mode: SplitMode = SplitMode.AUTO
+    boundary_tolerance: float = Field(default=0.0, ge=0.0)  # Seconds a cut may move to reach a keyframe
     output_format: str = "mp4"
     output_codec: str = "h264"
     maintain_quality: bool = True
     generate_thumbnails: bool = True
+    hls_preview: bool = False  # Package each segment as fMP4 HLS for in-browser preview
+    compilation: Optional[CompilationSpec] = None  # Set on jobs created from existing segments
 
 
 class JobMetadata(BaseModel):
@@ -53,6 +131,55 @@ class JobMetadata(BaseModel):
     visibility: str = "public"
 
 
+class MediaInfo(BaseModel):
+    """Media properties probed once at ingest and reused by every stage"""
+    format_name: Optional[str] = None
+    duration: float = 0.0
+    size: Optional[int] = None
+    bit_rate: Optional[int] = None
+    video_codec: Optional[str] = None
+    video_profile: Optional[str] = None
+    pix_fmt: Optional[str] = None
+    video_extradata_hash: Optional[str] = None  # Digest of the decoder configuration (SPS/PPS for H.264)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    variable_frame_rate: bool = False
+    rotation: int = 0
+    audio_codec: Optional[str] = None
+    audio_sample_rate: Optional[int] = None
+    audio_channels: Optional[int] = None
+    keyframes: List[float] = Field(default_factory=list)
+    
+    @property
+    def display_size(self) -> Optional[Tuple[int, int]]:
+        """Frame size after applying the rotation metadata"""
+        if not self.width or not self.height:
+            return None
+        if self.rotation % 180 == 90:
+            return self.height, self.width
+        return self.width, self.height
+
+
+class SegmentQuality(BaseModel):
+    """Sampled-frame comparison of one output file against the source"""
+    segment_number: int
+    platform: Optional[Platform] = None  # Set for platform renditions
+    samples: int = 0
+    ssim: Optional[float] = None      # Mean luma SSIM over the samples
+    psnr: Optional[float] = None      # Lowest luma PSNR of the samples, in dB
+    flagged: bool = False
+
+
+class QualityReport(BaseModel):
+    """QC outcome of a job; flagged segments fell below the SSIM or PSNR threshold"""
+    passed: bool = True
+    min_ssim: Optional[float] = None
+    min_psnr: Optional[float] = None
+    flagged_segments: List[int] = Field(default_factory=list)
+    segments: List[SegmentQuality] = Field(default_factory=list)
+
+
 class Job(BaseModel):
     """Job model for video processing"""
     model_config = ConfigDict(from_attributes=True)
@@ -72,6 +199,12 @@ class Job(BaseModel):
     processing_options: ProcessingOptions = Field(default_factory=ProcessingOptions)
     progress: int = Field(default=0, ge=0, le=100)
     total_segments: int = 0
+    media_info: Optional[MediaInfo] = None
+    deadline_at: Optional[datetime] = None
+    encode_policy: Optional[EncodePolicy] = None
+    quality_report: Optional[QualityReport] = None
+    priority: JobPriority = JobPriority.NORMAL
+    owner: Optional[str] = None  # Account the job is queued for; jobs are shared fairly across owners
 
 
 class JobSegment(BaseModel):
@@ -82,6 +215,7 @@ class JobSegment(BaseModel):
     job_id: str
     segment_number: int
     file_path: str
+    start_time: Optional[float] = None
     duration: Optional[float] = None
     size: Optional[int] = None
     platform: Optional[Platform] = None
@@ -89,9 +223,70 @@ class JobSegment(BaseModel):
     upload_at: Optional[datetime] = None
     upload_error: Optional[str] = None
     upload_url: Optional[str] = None
+    thumbnail_path: Optional[str] = None
+    sprite_path: Optional[str] = None
+    hls_path: Optional[str] = None  # HLS playlist of the segment's preview
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class JobStageName(str, Enum):
+    """Pipeline stages of a job"""
+    COMPILE = "compile"        # Join a compilation's source segments into its input
+    PROBE = "probe"
+    NORMALIZE = "normalize"
+    EYE_GAZE = "eye_gaze"
+    SPLIT = "split"            # Also renders, previews and schedules uploads per finished segment
+    QUALITY = "quality"
+    PUBLISH = "publish"
+
+
+class StageStatus(str, Enum):
+    """State of a job stage"""
+    RUNNING = "running"
+    COMPLETED = "completed"
+    SKIPPED = "skipped"  # Not applicable to the job, e.g. gaze correction turned off
+    FAILED = "failed"
+
+
+# Order the stages run in, each one after the last; a stage is a checkpoint a retry can resume from
+JOB_STAGES: Tuple[JobStageName, ...] = (
+    JobStageName.COMPILE,
+    JobStageName.PROBE,
+    JobStageName.NORMALIZE,
+    JobStageName.EYE_GAZE,
+    JobStageName.SPLIT,
+    JobStageName.QUALITY,
+    JobStageName.PUBLISH,
+)
+
+
+class JobStage(BaseModel):
+    """Persisted state of one stage of a job"""
+    stage: JobStageName
+    status: StageStatus
+    artifact: Optional[str] = None  # File the stage produced, kept for later attempts
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class ManifestEntry(BaseModel):
+    """One published output file, addressed relative to the job's output directory"""
+    path: str
+    kind: str  # segment, rendition, poster, sprite or hls
+    segment_number: int
+    platforms: List[Platform] = Field(default_factory=list)  # Set for platform renditions
+    size: int
+    content_type: str
+
+
+class JobManifest(BaseModel):
+    """Listing of a job's published outputs, written next to them"""
+    job_id: str
+    published_at: datetime = Field(default_factory=datetime.utcnow)
+    files: List[ManifestEntry] = Field(default_factory=list)
+
+
 class PlatformUpload(BaseModel):
     """Platform upload tracking model"""
     model_config = ConfigDict(from_attributes=True)
@@ -133,6 +328,19 @@ class CreateJobRequest(BaseModel):
     metadata: Optional[JobMetadata] = None
     processing_options: Optional[ProcessingOptions] = None
     schedule_upload_at: Optional[datetime] = None
+    priority: JobPriority = JobPriority.NORMAL
+    owner: Optional[str] = None
+
+
+class CreateCompilationRequest(BaseModel):
+    """Request model for building a new job from existing segments"""
+    segment_ids: List[str] = Field(min_length=1)
+    webhook_url: Optional[str] = None
+    platforms: List[Platform] = Field(default_factory=list)
+    metadata: Optional[JobMetadata] = None
+    processing_options: Optional[ProcessingOptions] = None
+    priority: JobPriority = JobPriority.NORMAL
+    owner: Optional[str] = None
 
 
 class JobResponse(BaseModel):
@@ -149,6 +357,13 @@ class JobResponse(BaseModel):
     segments: List[JobSegment] = Field(default_factory=list)
     webhook_url: Optional[str] = None
     platforms: List[Platform] = Field(default_factory=list)
+    media_info: Optional[MediaInfo] = None
+    deadline_at: Optional[datetime] = None
+    encode_policy: Optional[EncodePolicy] = None
+    quality_report: Optional[QualityReport] = None
+    priority: JobPriority = JobPriority.NORMAL
+    owner: Optional[str] = None
+    stages: List[JobStage] = Field(default_factory=list)
 
 
 class JobListResponse(BaseModel):
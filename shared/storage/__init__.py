@@ -0,0 +1 @@
+# Processed output store
@@ -0,0 +1,41 @@
+"""
+Stage artifacts kept between a job's attempts
+
+Scratch is emptied whenever a job attempt ends. The full-length files a
+stage needed a whole pass over the video to make (the normalized and the
+gaze-corrected video) are moved out of scratch when their stage completes,
+so a retried or restarted job picks up from them instead of redoing the
+pass. They are removed once the job publishes, or by the cleanup task
+after FILE_RETENTION_HOURS.
+"""
+import shutil
+from pathlib import Path
+
+import structlog
+
+from api.core.config import settings
+
+logger = structlog.get_logger()
+
+
+def artifact_root() -> Path:
+    """Directory holding every job's kept artifacts"""
+    return Path(settings.TEMP_STORAGE_PATH) / "artifacts"
+
+
+def keep_artifact(job_id: str, path: Path) -> Path:
+    """Move a finished stage output out of scratch and return its new location"""
+    job_dir = artifact_root() / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    
+    # A rename on the scratch disk; a copy when the file was placed on tmpfs
+    target = job_dir / path.name
+    shutil.move(str(path), str(target))
+    
+    logger.info("Stage artifact kept", job_id=job_id, path=str(target))
+    return target
+
+
+def discard_artifacts(job_id: str):
+    """Remove a job's kept artifacts once nothing will resume from them"""
+    shutil.rmtree(artifact_root() / job_id, ignore_errors=True)
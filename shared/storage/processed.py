@@ -0,0 +1,181 @@
+"""
+Processed output store
+
+A job's finished files are hardlinked from worker scratch into a staging
+directory under PROCESSED_PATH, listed in a manifest and published with one
+directory swap. Readers see the previous outputs or the complete new set,
+never a partial one, and look files up in the manifest instead of scanning.
+"""
+import ctypes
+import errno
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import structlog
+
+from api.core.config import settings
+from shared.models.job import JobManifest, JobSegment, ManifestEntry
+
+logger = structlog.get_logger()
+
+MANIFEST_FILENAME = "manifest.json"
+
+# renameat2 flag that atomically exchanges two existing paths
+RENAME_EXCHANGE = 2
+AT_FDCWD = -100
+
+_libc = ctypes.CDLL(None, use_errno=True) if sys.platform.startswith("linux") else None
+_renameat2 = getattr(_libc, "renameat2", None)
+
+CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".jpg": "image/jpeg",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+}
+
+
+def job_output_dir(job_id: str) -> Path:
+    """Published output directory of a job"""
+    return Path(settings.PROCESSED_PATH) / job_id
+
+
+def read_manifest(job_id: str) -> Optional[JobManifest]:
+    """Manifest of a job's published outputs, if it has any"""
+    try:
+        with open(job_output_dir(job_id) / MANIFEST_FILENAME) as f:
+            return JobManifest(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def promote_outputs(job_id: str, scratch_dir: Path, segments: List[JobSegment]) -> JobManifest:
+    """
+    Publish the segments' files, previews and HLS packages into the processed
+    store and point the segments at their published paths. Files are linked,
+    not copied, so scratch_dir can be removed once the new paths are saved.
+    """
+    root = Path(settings.PROCESSED_PATH)
+    root.mkdir(parents=True, exist_ok=True)
+    output_dir = job_output_dir(job_id)
+    staging = root / f".{job_id}.incoming"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    
+    entries: Dict[str, ManifestEntry] = {}
+    copied = 0
+    
+    def publish(path: str, kind: str, segment: JobSegment) -> str:
+        nonlocal copied
+        source = Path(path)
+        relative = _relative_path(source, scratch_dir)
+        
+        entry = entries.get(relative)
+        if entry is None:
+            target = staging / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if not _link(source, target):
+                copied += 1
+            entry = entries[relative] = ManifestEntry(
+                path=relative,
+                kind=kind,
+                segment_number=segment.segment_number,
+                size=target.stat().st_size,
+                content_type=CONTENT_TYPES.get(source.suffix, "application/octet-stream")
+            )
+        
+        if segment.platform and segment.platform not in entry.platforms:
+            entry.platforms.append(segment.platform)
+        return str(output_dir / relative)
+    
+    try:
+        for segment in segments:
+            segment.file_path = publish(
+                segment.file_path, "rendition" if segment.platform else "segment", segment
+            )
+            if segment.thumbnail_path:
+                segment.thumbnail_path = publish(segment.thumbnail_path, "poster", segment)
+            if segment.sprite_path:
+                segment.sprite_path = publish(segment.sprite_path, "sprite", segment)
+            if segment.hls_path:
+                playlist = Path(segment.hls_path)
+                for media in sorted(playlist.parent.iterdir()):
+                    if media != playlist:
+                        publish(str(media), "hls", segment)
+                segment.hls_path = publish(segment.hls_path, "hls", segment)
+        
+        manifest = JobManifest(job_id=job_id, files=list(entries.values()))
+        (staging / MANIFEST_FILENAME).write_text(manifest.json())
+        _swap_in(staging, output_dir)
+    
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    
+    if copied:
+        logger.warning("Processed storage is on another filesystem; outputs were copied",
+                     job_id=job_id,
+                     files=copied)
+    
+    logger.info("Outputs published", job_id=job_id, files=len(entries), path=str(output_dir))
+    return manifest
+
+
+def _relative_path(source: Path, scratch_dir: Path) -> str:
+    """Path of a scratch file inside the published directory"""
+    try:
+        return source.relative_to(scratch_dir).as_posix()
+    except ValueError:
+        return source.name
+
+
+def _link(source: Path, target: Path) -> bool:
+    """Hardlink source to target, copying only across filesystems; False if copied"""
+    try:
+        os.link(source, target)
+        return True
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    
+    shutil.copy2(source, target)
+    return False
+
+
+def _swap_in(staging: Path, output_dir: Path):
+    """Replace output_dir with the staging directory without output_dir ever going missing"""
+    # A retried job replaces the outputs of its earlier attempt in one exchange
+    if _exchange(staging, output_dir):
+        shutil.rmtree(staging, ignore_errors=True)  # Now holds the earlier outputs
+        return
+    
+    # Without an exchange the old outputs move aside first, each step a single rename
+    previous = output_dir.with_name(f".{output_dir.name}.previous")
+    shutil.rmtree(previous, ignore_errors=True)
+    
+    if output_dir.exists():
+        os.rename(output_dir, previous)
+    os.rename(staging, output_dir)
+    
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def _exchange(first: Path, second: Path) -> bool:
+    """
+    Atomically swap two existing paths with renameat2(RENAME_EXCHANGE). False when
+    the second does not exist yet or the platform or filesystem cannot exchange.
+    """
+    if _renameat2 is None:
+        return False
+    
+    if _renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE) == 0:
+        return True
+    
+    error = ctypes.get_errno()
+    if error in (errno.ENOENT, errno.EINVAL, errno.ENOSYS, errno.EPERM):
+        return False
+    raise OSError(error, os.strerror(error), str(second))
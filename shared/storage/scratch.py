@@ -0,0 +1,240 @@
+"""
+Scratch space for job intermediates
+
+Every job reserves its expected scratch footprint before writing anything,
+and a job that does not fit in the budget is refused until others finish.
+Intermediates live in a per-job directory that is removed when the job
+releases its reservation, whatever way the job ends. Files small enough for
+the optional tmpfs budget are placed there instead of on disk.
+
+Job processes of a process-mode worker each run their own manager and
+report their reservations to the parent through shared memory, since only
+the parent's metrics are served.
+"""
+import multiprocessing
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+from api.core.config import settings
+
+logger = structlog.get_logger()
+
+MB = 1024 * 1024
+
+# Share of the scratch volume's free space used when SCRATCH_BUDGET_MB is 0
+DEFAULT_BUDGET_FRACTION = 0.9
+
+SCRATCH_BUDGET = Gauge("vidprod_scratch_budget_bytes", "Scratch space jobs may reserve", ["volume"])
+SCRATCH_RESERVED = Gauge("vidprod_scratch_reserved_bytes", "Scratch space reserved by running jobs", ["volume"])
+SCRATCH_USED = Gauge("vidprod_scratch_used_bytes", "Scratch space currently occupied by job files", ["volume"])
+SCRATCH_JOBS = Gauge("vidprod_scratch_jobs", "Jobs holding a scratch reservation")
+SCRATCH_REFUSED = Counter("vidprod_scratch_refused_total", "Jobs refused for lack of scratch space")
+
+
+class ScratchBudgetExceeded(Exception):
+    """Raised when a job's scratch estimate does not fit in the remaining budget"""
+    
+    def __init__(self, job_id: str, requested: int, available: int):
+        super().__init__(
+            f"Job {job_id} needs {requested // MB} MB of scratch, {available // MB} MB available"
+        )
+        self.job_id = job_id
+        self.requested = requested
+        self.available = available
+
+
+class ScratchUsage:
+    """Reservations of the managers in a pool's job processes, one slot per process"""
+    
+    FIELDS = 3  # Disk reserved, tmpfs reserved, jobs
+    DISK, TMPFS, JOBS = range(FIELDS)
+    
+    def __init__(self, processes: int, context=multiprocessing):
+        self._values = context.Array("q", processes * self.FIELDS)
+        self._next_slot = context.Value("i", 0)
+        self._slot: Optional[int] = None
+    
+    def attach(self):
+        """Take a slot for the calling process; done once by each job process"""
+        with self._next_slot.get_lock():
+            self._slot = self._next_slot.value
+            self._next_slot.value += 1
+    
+    def record(self, manager: "ScratchManager"):
+        """Publish the calling process's reservations"""
+        start = self._slot * self.FIELDS
+        with self._values.get_lock():
+            self._values[start:start + self.FIELDS] = [
+                manager.reserved, manager.tmpfs_reserved, len(manager._jobs)
+            ]
+    
+    def total(self, field: int) -> int:
+        """Sum of one field across the job processes"""
+        with self._values.get_lock():
+            return sum(self._values[field::self.FIELDS])
+
+
+class JobScratch:
+    """A job's scratch reservation and its directories"""
+    
+    def __init__(self, manager: "ScratchManager", job_id: str, reserved: int):
+        self.manager = manager
+        self.job_id = job_id
+        self.reserved = reserved
+        self.tmpfs_reserved = 0
+        self.disk_dir = manager.disk_root / job_id
+        self.tmpfs_dir = manager.tmpfs_root / job_id if manager.tmpfs_root else None
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+    
+    def path(self, filename: str, size_hint: int) -> Path:
+        """Location for an intermediate file, on tmpfs if it fits there"""
+        if self.tmpfs_dir is not None and self.manager._reserve_tmpfs(size_hint):
+            self.tmpfs_reserved += size_hint
+            self.tmpfs_dir.mkdir(parents=True, exist_ok=True)
+            return self.tmpfs_dir / filename
+        
+        return self.disk_dir / filename
+    
+    def release(self):
+        """Delete the job's intermediates and return its reservation"""
+        self.manager._release(self)
+
+
+class ScratchManager:
+    """Per-process accounting of scratch space across concurrent jobs"""
+    
+    def __init__(self, share: int = 1, usage: Optional[ScratchUsage] = None):
+        self.disk_root = Path(settings.TEMP_STORAGE_PATH) / "scratch"
+        self.disk_root.mkdir(parents=True, exist_ok=True)
+        self.tmpfs_root = Path(settings.SCRATCH_TMPFS_PATH) if settings.SCRATCH_TMPFS_PATH else None
+        if self.tmpfs_root:
+            self.tmpfs_root.mkdir(parents=True, exist_ok=True)
+        
+        # Processes that each run their own manager split the budgets evenly
+        self.budget = (settings.SCRATCH_BUDGET_MB * MB or int(
+            shutil.disk_usage(self.disk_root).free * DEFAULT_BUDGET_FRACTION
+        )) // share
+        self.tmpfs_budget = settings.SCRATCH_TMPFS_BUDGET_MB * MB // share if self.tmpfs_root else 0
+        self.reserved = 0
+        self.tmpfs_reserved = 0
+        self._jobs: Dict[str, JobScratch] = {}
+        
+        # A job process's manager reports to its parent; the parent's counts in its job processes
+        self.usage = usage
+        if usage is not None:
+            usage.attach()
+        self.children: Optional[ScratchUsage] = None
+        
+        SCRATCH_BUDGET.labels(volume="disk").set(self.budget)
+        SCRATCH_BUDGET.labels(volume="tmpfs").set(self.tmpfs_budget)
+        SCRATCH_RESERVED.labels(volume="disk").set_function(
+            lambda: self.reserved + self._children_total(ScratchUsage.DISK)
+        )
+        SCRATCH_RESERVED.labels(volume="tmpfs").set_function(
+            lambda: self.tmpfs_reserved + self._children_total(ScratchUsage.TMPFS)
+        )
+        SCRATCH_USED.labels(volume="disk").set_function(lambda: _tree_size(self.disk_root))
+        SCRATCH_USED.labels(volume="tmpfs").set_function(lambda: _tree_size(self.tmpfs_root))
+        SCRATCH_JOBS.set_function(lambda: len(self._jobs) + self._children_total(ScratchUsage.JOBS))
+    
+    def reserve(self, job_id: str, estimate: int) -> JobScratch:
+        """Reserve scratch for a job, raising ScratchBudgetExceeded if it does not fit"""
+        if job_id in self._jobs:
+            self._release(self._jobs[job_id])
+        
+        # Free space is checked as well: other processes may share the volume
+        free = shutil.disk_usage(self.disk_root).free - self._unwritten()
+        available = min(self.budget - self.reserved, free)
+        if estimate > available:
+            SCRATCH_REFUSED.inc()
+            raise ScratchBudgetExceeded(job_id, estimate, max(0, available))
+        
+        self.reserved += estimate
+        scratch = self._jobs[job_id] = JobScratch(self, job_id, estimate)
+        self._report()
+        
+        logger.info("Scratch reserved",
+                   job_id=job_id,
+                   reserved_mb=estimate // MB,
+                   total_reserved_mb=self.reserved // MB,
+                   budget_mb=self.budget // MB)
+        return scratch
+    
+    def fits(self, estimate: int) -> bool:
+        """Whether a job of this estimate could ever be admitted"""
+        return estimate <= self.budget
+    
+    def discard(self, job_id: str):
+        """Remove the directories of a job whose process died holding them"""
+        for root in (self.disk_root, self.tmpfs_root):
+            if root is not None:
+                shutil.rmtree(root / job_id, ignore_errors=True)
+    
+    def sweep(self):
+        """Remove directories left behind by jobs of an earlier process"""
+        for root in (self.disk_root, self.tmpfs_root):
+            if root is None:
+                continue
+            for path in root.iterdir():
+                if path.name not in self._jobs:
+                    shutil.rmtree(path, ignore_errors=True)
+    
+    def _reserve_tmpfs(self, size: int) -> bool:
+        """Take size bytes of the tmpfs budget if they are available"""
+        if self.tmpfs_reserved + size > self.tmpfs_budget:
+            return False
+        
+        self.tmpfs_reserved += size
+        self._report()
+        return True
+    
+    def _release(self, scratch: JobScratch):
+        """Drop a job's directories and reservation; safe to call more than once"""
+        if self._jobs.get(scratch.job_id) is not scratch:
+            return
+        
+        del self._jobs[scratch.job_id]
+        self.reserved -= scratch.reserved
+        self.tmpfs_reserved -= scratch.tmpfs_reserved
+        self._report()
+        
+        shutil.rmtree(scratch.disk_dir, ignore_errors=True)
+        if scratch.tmpfs_dir is not None:
+            shutil.rmtree(scratch.tmpfs_dir, ignore_errors=True)
+        
+        logger.info("Scratch released", job_id=scratch.job_id, reserved_mb=scratch.reserved // MB)
+    
+    def _report(self):
+        """Pass the current reservations on to the parent process, if this is a job process"""
+        if self.usage is not None:
+            self.usage.record(self)
+    
+    def _children_total(self, field: int) -> int:
+        """Reservations held by this worker's job processes"""
+        return self.children.total(field) if self.children is not None else 0
+    
+    def _unwritten(self) -> int:
+        """Reserved disk space running jobs have not filled yet"""
+        return sum(
+            max(0, s.reserved - _tree_size(s.disk_dir)) for s in self._jobs.values()
+        )
+
+
+def _tree_size(root: Optional[Path]) -> int:
+    """Total size of the files under root"""
+    if root is None or not root.exists():
+        return 0
+    
+    total = 0
+    for path in root.rglob("*"):
+        try:
+            if path.is_file():
+                total += path.stat().st_size
+        except FileNotFoundError:
+            # Removed by a finishing job while we walked the tree
+            continue
+    return total
@@ -7,7 +7,6 @@ import json
 import shutil
 import asyncio
 import uuid
-import subprocess
 import tempfile
 from pathlib import Path
 from datetime import datetime
@@ -23,6 +22,8 @@ import uvicorn
 import sys
 sys.path.append(str(Path(__file__).parent))
 from worker.processors.eye_gaze import EyeGazeCorrector
+from shared.media.probe import probe_media
+from shared.media.ffmpeg import FFmpegError, FFmpegSupervisor
 
 # Create FastAPI app
 app = FastAPI(title="VidProd Simple Backend")
@@ -45,6 +46,9 @@ PROCESSED_DIR.mkdir(exist_ok=True)
 # In-memory job storage (for simplicity)
 jobs = {}
 
+# Time-limited FFmpeg runner shared by all jobs
+ffmpeg = FFmpegSupervisor()
+
 
 @app.get("/health")
 async def health():
@@ -89,23 +93,16 @@ async def upload_video(
             "status": "processing",
             "message": "Video uploaded successfully"
         })
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 async def get_video_duration(video_path: Path) -> float:
-    """Get video duration using FFprobe"""
+    """Get video duration from the container header, falling back to FFprobe"""
     try:
-        cmd = [
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            str(video_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            return float(result.stdout.strip())
+        media_info = await probe_media(str(video_path))
+        return media_info.duration
     except Exception:
         pass
     return 0.0
@@ -136,8 +133,12 @@ async def split_video(input_path: Path, output_dir: Path, segment_duration: int
             "-y", str(segment_path)
         ]
         
-        result = subprocess.run(cmd, capture_output=True)
-        if result.returncode == 0 and segment_path.exists():
+        try:
+            await ffmpeg.run(cmd)
+        except FFmpegError:
+            continue
+        
+        if segment_path.exists():
             segments.append({
                 "filename": segment_filename,
                 "path": str(segment_path),
@@ -247,7 +248,7 @@ async def process_video(job_id: str):
             "processing_time": (datetime.now() - datetime.fromisoformat(job["created_at"])).total_seconds(),
             "gaze_corrected": True
         }
-        
+    
     except Exception as e:
         job["status"] = "failed"
         job["error"] = str(e)
@@ -0,0 +1,33 @@
+"""
+Shared setup for the Python unit tests
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Import the api, shared and worker packages from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from api.core.config import settings
+from shared.database.connection import close_db
+
+
+@pytest.fixture
+def run_db(tmp_path: Path, monkeypatch):
+    """
+    Run a coroutine to completion against a fresh database of its own. Each call
+    gets its own event loop, and the shared connection is closed before it ends.
+    """
+    monkeypatch.setattr(settings, "DB_PATH", str(tmp_path / "vidprod.db"))
+    
+    def run(coro):
+        async def with_db():
+            try:
+                return await coro
+            finally:
+                await close_db()
+        return asyncio.run(with_db())
+    
+    return run
@@ -0,0 +1,25 @@
+#!/bin/sh
+# Regenerate the header parser fixtures; every file is two seconds of 64x64 video
+set -e
+cd "$(dirname "$0")"
+
+video="testsrc2=size=64x64:rate=30"
+x264="-c:v libx264 -preset veryfast -crf 45 -pix_fmt yuv420p -g 30 -keyint_min 30 -sc_threshold 0"
+
+# B-frames: composition offsets (ctts) and an edit list (elst) that hides the reorder delay
+ffmpeg -v error -f lavfi -i "$video" -f lavfi -i "sine=frequency=440:sample_rate=48000" -t 2 \
+    $x264 -bf 2 -c:a aac -b:a 16k -ac 1 -y bframes.mp4
+
+# 30fps in a millisecond timescale: durations alternate between 33 and 34
+ffmpeg -v error -f lavfi -i "$video" -t 2 $x264 -bf 0 -video_track_timescale 1000 -y jitter.mp4
+
+# One second at 30fps, then one at 10fps
+ffmpeg -v error -f lavfi -i "$video" -t 2 \
+    -vf "select='lt(n,30)+not(mod(n,3))',setpts='if(lt(N,30),N/30,1+(N-30)/10)/TB'" \
+    $x264 -bf 0 -fps_mode passthrough -video_track_timescale 15360 -y vfr.mp4
+
+# Cues after the clusters, found through the SeekHead
+ffmpeg -v error -f lavfi -i "$video" -t 2 $x264 -bf 2 -y cues_at_end.mkv
+
+# Cues written ahead of the clusters into reserved space
+ffmpeg -v error -f lavfi -i "$video" -t 2 $x264 -bf 2 -reserve_index_space 1024 -y cues_in_front.mkv
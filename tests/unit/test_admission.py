@@ -0,0 +1,172 @@
+"""
+Admission control: job cost estimates, packing jobs under the worker's
+memory and core budgets, and holding deferred jobs back from claims
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+
+from api.core.config import settings
+from api.services.job_service import JobService
+from shared.database.connection import get_db
+from shared.models.job import Job, JobStatus, MediaInfo, ProcessingOptions
+from worker import main
+from worker.admission import (
+    GAZE_MODEL_MEMORY, JOB_BASE_MEMORY, MB, AdmissionController, JobCost, estimate_job_cost
+)
+from worker.main import HeldBack, process_job
+
+GB = 1024 * MB
+
+
+@pytest.fixture(autouse=True)
+def worker_settings(monkeypatch):
+    monkeypatch.setattr(settings, "WORKER_MEMORY_BUDGET_MB", 4096)
+    monkeypatch.setattr(settings, "WORKER_CPU_CORES", 8)
+    monkeypatch.setattr(settings, "WORKER_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "SEGMENT_ENCODE_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "JOB_TIMEOUT_SECONDS", 600)
+    monkeypatch.setattr(settings, "EYE_GAZE_ENABLED", True)
+
+
+def job(width: int = 1920, height: int = 1080, duration: float = 60.0, gaze: bool = False,
+        probed: bool = True, deadline_at: Optional[datetime] = None) -> Job:
+    return Job(
+        id="job", video_path="/uploads/job.mp4", video_filename="job.mp4",
+        processing_options=ProcessingOptions(eye_gaze_correction=gaze),
+        media_info=MediaInfo(duration=duration, width=width, height=height, fps=30.0) if probed else None,
+        deadline_at=deadline_at
+    )
+
+
+def test_memory_grows_with_frame_size():
+    hd = estimate_job_cost(job(1280, 720), 0, 8)
+    uhd = estimate_job_cost(job(3840, 2160), 0, 8)
+    
+    # 100 yuv420p frames for each of the two concurrent encodes
+    assert hd.memory == JOB_BASE_MEMORY + 1280 * 720 * 3 // 2 * 100 * 2
+    assert uhd.memory > hd.memory
+
+
+def test_gaze_correction_adds_its_models_and_working_set():
+    plain = estimate_job_cost(job(), 0, 8)
+    gaze = estimate_job_cost(job(gaze=True), 0, 8)
+    
+    assert gaze.memory >= plain.memory + GAZE_MODEL_MEMORY
+    assert gaze.core_seconds > plain.core_seconds
+
+
+def test_cores_finish_the_job_within_half_its_time_limit():
+    # 60s of 1080p at the slow preset is 600 core seconds; half of 600s needs 2 cores
+    assert estimate_job_cost(job(), 0, 8).cores == 2
+    assert estimate_job_cost(job(duration=600), 0, 8).cores == 8  # Capped at the worker's cores
+
+
+def test_backlog_makes_jobs_cheaper():
+    assert estimate_job_cost(job(), 100, 8).core_seconds < estimate_job_cost(job(), 0, 8).core_seconds
+
+
+def test_job_past_its_deadline_gets_one_core():
+    late = job(duration=600, deadline_at=datetime.utcnow() - timedelta(minutes=1))
+    assert estimate_job_cost(late, 0, 8).cores == 1
+
+
+def test_unprobed_job_asks_for_every_core():
+    cost = estimate_job_cost(job(probed=False), 0, 8)
+    
+    assert cost.core_seconds is None
+    assert cost.cores == 8
+
+
+def test_jobs_are_packed_under_the_memory_budget():
+    admission = AdmissionController()
+    
+    assert admission.admit("first", JobCost(memory=3 * GB, core_seconds=60, cores=2)) == 2
+    assert admission.admit("second", JobCost(memory=2 * GB, core_seconds=60, cores=2)) is None
+    assert admission.admit("third", JobCost(memory=1 * GB, core_seconds=60, cores=2)) == 2
+    
+    admission.release("first")
+    assert admission.admit("second", JobCost(memory=2 * GB, core_seconds=60, cores=2)) == 2
+    assert (admission.memory_reserved, admission.cores_allocated) == (3 * GB, 4)
+
+
+def test_cores_are_granted_from_what_is_left():
+    admission = AdmissionController()
+    
+    assert admission.admit("first", JobCost(memory=MB, core_seconds=600, cores=6)) == 6
+    assert admission.admit("second", JobCost(memory=MB, core_seconds=600, cores=6)) == 2
+    assert admission.admit("third", JobCost(memory=MB, core_seconds=60, cores=1)) is None
+
+
+def test_job_over_the_budgets_runs_alone():
+    admission = AdmissionController()
+    
+    assert admission.admit("huge", JobCost(memory=16 * GB, core_seconds=None, cores=8)) == 8
+    assert admission.admit("small", JobCost(memory=MB, core_seconds=1, cores=1)) is None
+
+
+def test_releasing_a_job_that_was_never_admitted_is_harmless():
+    admission = AdmissionController()
+    admission.release("never-admitted")
+    
+    assert (admission.memory_reserved, admission.cores_allocated) == (0, 0)
+
+
+async def queue(job_service: JobService, job_id: str):
+    await job_service.create_job(job_id, f"/uploads/{job_id}.mp4", f"{job_id}.mp4", 1)
+
+
+async def job_state(job_id: str):
+    async with get_db() as db:
+        cursor = await db.execute("SELECT status, worker_id, attempts FROM jobs WHERE id = ?", (job_id,))
+        return await cursor.fetchone()
+
+
+def test_job_that_does_not_fit_goes_back_to_the_queue(run_db):
+    admission = AdmissionController()
+    admission.admit("running", JobCost(memory=4 * GB, core_seconds=None, cores=8))
+    
+    async def scenario():
+        job_service = JobService()
+        await queue(job_service, "job")
+        assert await job_service.claim_next_job(main.WORKER_ID) == "job"
+        return await process_job("job", scratch_manager=None, admission=admission), await job_state("job")
+    
+    started, state = run_db(scenario())
+    assert started is False
+    assert state == (JobStatus.PENDING.value, None, 0)
+    assert "job" not in admission._grants
+
+
+def test_held_back_job_is_skipped_until_another_job_finishes(run_db):
+    async def scenario():
+        job_service = JobService()
+        await queue(job_service, "deferred")
+        await queue(job_service, "next")
+        held_back = HeldBack()
+        
+        # Deferred and released, so the oldest job would be claimed again at once
+        assert await job_service.claim_next_job("worker") == "deferred"
+        await job_service.release_job("deferred")
+        held_back.job_finished("deferred", deferred=True)
+        
+        claims = [await job_service.claim_next_job("worker", exclude=held_back.job_ids)]
+        claims.append(await job_service.claim_next_job("worker", exclude=held_back.job_ids))
+        
+        # "next" finishing frees its resources
+        held_back.job_finished("next", deferred=False)
+        claims.append(await job_service.claim_next_job("worker", exclude=held_back.job_ids))
+        return claims
+    
+    assert run_db(scenario()) == ["next", None, "deferred"]
+
+
+def test_clearing_lets_held_back_jobs_be_claimed():
+    held_back = HeldBack()
+    held_back.job_finished("first", deferred=True)
+    held_back.job_finished("second", deferred=True)
+    assert held_back.job_ids == {"first", "second"}
+    
+    held_back.clear()
+    assert held_back.job_ids == set()
@@ -0,0 +1,112 @@
+"""
+Compilations of H.264 pieces whose parameter sets differ keep a single set:
+such pieces are re-encoded instead of stream-copied under one avcC, where
+FFmpeg would otherwise splice the other SPS/PPS into the samples in-band
+"""
+import asyncio
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Set
+
+import pytest
+
+if not shutil.which("ffmpeg"):
+    pytest.skip("ffmpeg is required", allow_module_level=True)
+
+from shared.media.ffmpeg import FFmpegSupervisor
+from shared.media.headers import parse_media_header
+from shared.models.job import JobSegment
+from worker.processors.compilation import CompilationBuilder
+
+FRAME_RATE = 25
+PIECE_SECONDS = 2
+
+
+def encode_piece(path: Path, x264_params: str) -> Path:
+    """A short H.264/AAC piece; the x264 params decide its SPS/PPS"""
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate={FRAME_RATE}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(PIECE_SECONDS),
+        "-c:v", "libx264", "-preset", "medium", "-x264-params", x264_params,
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-ac", "2",
+        "-y", str(path)
+    ], check=True)
+    return path
+
+
+def build(pieces: List[Path], output: Path):
+    segments = [
+        JobSegment(id=f"segment-{n}", job_id="job", segment_number=n, file_path=str(p))
+        for n, p in enumerate(pieces, start=1)
+    ]
+    builder = CompilationBuilder(FFmpegSupervisor(timeout=120, cpu_seconds=0))
+    asyncio.run(builder.build(segments, str(output), ["-preset", "ultrafast", "-crf", "23"], 1))
+
+
+def decoded_frames(path: Path) -> int:
+    """Frames decoded from the video stream, failing on any decode error"""
+    result = subprocess.run([
+        "ffmpeg", "-v", "error", "-xerror", "-i", str(path),
+        "-map", "0:v:0", "-f", "framemd5", "-"
+    ], check=True, capture_output=True, text=True)
+    assert result.stderr == ""
+    return sum(1 for line in result.stdout.splitlines() if not line.startswith("#"))
+
+
+def parameter_sets(path: Path) -> Set[str]:
+    """Distinct SPS and PPS contents in the avcC and the samples of a file's video stream"""
+    result = subprocess.run([
+        "ffmpeg", "-v", "trace", "-i", str(path),
+        "-map", "0:v:0", "-c", "copy", "-bsf:v", "trace_headers", "-f", "null", "-"
+    ], check=True, capture_output=True, text=True)
+    
+    found, current = set(), None
+    for line in result.stderr.splitlines():
+        if not line.startswith("[trace_headers"):
+            continue
+        text = line.split("] ", 1)[1]
+        if current is not None and text.split(maxsplit=1)[0].isdigit():
+            current.append(text.split(maxsplit=1)[1])  # Drop the bit position
+            continue
+        if current is not None:
+            found.add("\n".join(current))
+        current = [text] if text in ("Sequence Parameter Set", "Picture Parameter Set") else None
+    return found
+
+
+def test_differing_parameter_sets_change_the_signature(tmp_path: Path):
+    cabac = parse_media_header(str(encode_piece(tmp_path / "cabac.mp4", "cabac=1")))
+    cavlc = parse_media_header(str(encode_piece(tmp_path / "cavlc.mp4", "cabac=0")))
+    
+    assert cabac.video_extradata_hash and cavlc.video_extradata_hash
+    assert cabac.video_extradata_hash != cavlc.video_extradata_hash
+    assert (cabac.video_codec, cabac.video_profile, cabac.width, cabac.fps) == \
+        (cavlc.video_codec, cavlc.video_profile, cavlc.width, cavlc.fps)
+
+
+def test_matching_pieces_are_stream_copied(tmp_path: Path):
+    pieces = [encode_piece(tmp_path / f"piece_{n}.mp4", "cabac=1") for n in range(3)]
+    output = tmp_path / "compilation.mp4"
+    build(pieces, output)
+    
+    assert decoded_frames(output) == 3 * PIECE_SECONDS * FRAME_RATE
+    assert len(parameter_sets(output)) == 2
+    assert parse_media_header(str(output)).video_extradata_hash == \
+        parse_media_header(str(pieces[0])).video_extradata_hash
+
+
+def test_pieces_with_other_parameter_sets_share_one_set(tmp_path: Path):
+    pieces = [
+        encode_piece(tmp_path / "piece_0.mp4", "cabac=1"),
+        encode_piece(tmp_path / "piece_1.mp4", "cabac=0"),
+        encode_piece(tmp_path / "piece_2.mp4", "cabac=1"),
+    ]
+    output = tmp_path / "compilation.mp4"
+    build(pieces, output)
+    
+    assert decoded_frames(output) == 3 * PIECE_SECONDS * FRAME_RATE
+    assert len(parameter_sets(output)) == 2
@@ -0,0 +1,77 @@
+"""
+Ladder step selection from the queue backlog and the job's deadline
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.core.config import settings
+from shared.models.job import MediaInfo
+from worker.processors.encode_policy import PRESET_LADDER, encode_core_seconds, select_encode_policy
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+MEDIA_INFO = MediaInfo(duration=60.0, width=1920, height=1080)
+
+
+@pytest.fixture(autouse=True)
+def workers(monkeypatch):
+    monkeypatch.setattr(settings, "WORKER_CONCURRENCY", 2)
+
+
+def policy(backlog: int, deadline_in: float = None, cores: int = 4):
+    deadline_at = NOW + timedelta(seconds=deadline_in) if deadline_in is not None else None
+    return select_encode_policy(backlog, MEDIA_INFO, 1, deadline_at, now=NOW, cores=cores)
+
+
+def test_idle_worker_uses_a_slower_preset_at_the_default_crf():
+    idle = policy(0)
+    
+    assert (idle.preset, idle.crf) == ("slow", 23)
+    assert idle.estimated_encode_seconds == pytest.approx(60 / 0.10 / 4)
+
+
+def test_no_step_lowers_crf_below_the_default():
+    assert all(crf >= 23 for _, crf, _ in PRESET_LADDER)
+
+
+@pytest.mark.parametrize("backlog, preset", [
+    (3, "slow"),         # 1.5 per worker
+    (4, "medium"),       # 2 per worker
+    (10, "fast"),
+    (20, "faster"),
+    (50, "veryfast"),
+    (100, "superfast"),
+    (200, "ultrafast"),
+    (10_000, "ultrafast"),
+])
+def test_backlog_per_worker_sets_the_step(backlog: int, preset: str):
+    assert policy(backlog).preset == preset
+
+
+def test_reachable_deadline_keeps_the_backlog_step():
+    # slow needs 150s on 4 cores; half of 400s leaves room for it
+    chosen = policy(0, deadline_in=400)
+    
+    assert chosen.preset == "slow"
+    assert chosen.deadline_seconds == 400
+
+
+def test_close_deadline_moves_to_the_first_step_that_fits():
+    # 100s of headroom: slow needs 150s, medium 75s
+    assert policy(0, deadline_in=200).preset == "medium"
+    
+    # More cores make the slower preset fit again
+    assert policy(0, deadline_in=200, cores=8).preset == "slow"
+
+
+def test_deadline_never_moves_back_past_the_backlog_step():
+    assert policy(20, deadline_in=3600).preset == "faster"
+
+
+def test_unreachable_deadline_ends_at_the_fastest_step():
+    chosen = policy(0, deadline_in=1)
+    
+    assert chosen.preset == "ultrafast"
+    assert chosen.estimated_encode_seconds == pytest.approx(
+        encode_core_seconds(MEDIA_INFO, 1, len(PRESET_LADDER) - 1) / 4
+    )
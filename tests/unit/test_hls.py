@@ -0,0 +1,75 @@
+"""
+HLS preview responses revalidate, so a retried job's repackaged previews
+replace the cached ones under the same segment ID
+"""
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routers import hls
+from shared.models.job import JobSegment
+
+MEDIA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def package(tmp_path: Path, monkeypatch) -> Path:
+    hls_dir = tmp_path / "hls" / "segment_001"
+    hls_dir.mkdir(parents=True)
+    (hls_dir / "index.m3u8").write_text("#EXTM3U\n")
+    (hls_dir / "index.m4s").write_bytes(MEDIA)
+    
+    async def get_segment(segment_id: str):
+        return JobSegment(id=segment_id, job_id="job", segment_number=1,
+                          file_path=str(tmp_path / "segment_001.mp4"),
+                          hls_path=str(hls_dir / "index.m3u8"))
+    
+    monkeypatch.setattr(hls.job_service, "get_segment", get_segment)
+    return hls_dir
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(hls.router)
+    return TestClient(app)
+
+
+def test_previews_are_not_cached_as_immutable(client: TestClient, package: Path):
+    response = client.get("/hls/segment/index.m3u8")
+    
+    assert response.status_code == 200
+    assert "immutable" not in response.headers["cache-control"]
+    assert response.headers["etag"]
+
+
+def test_unchanged_preview_revalidates(client: TestClient, package: Path):
+    etag = client.get("/hls/segment/index.m4s").headers["etag"]
+    
+    response = client.get("/hls/segment/index.m4s", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_range_of_current_version_is_partial(client: TestClient, package: Path):
+    etag = client.get("/hls/segment/index.m4s").headers["etag"]
+    
+    response = client.get("/hls/segment/index.m4s", headers={"Range": "bytes=16-31", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == MEDIA[16:32]
+    assert response.headers["etag"] == etag
+
+
+def test_range_of_repackaged_preview_returns_the_new_file(client: TestClient, package: Path):
+    etag = client.get("/hls/segment/index.m4s").headers["etag"]
+    
+    # A retry repackages the preview; a player resuming its old byte ranges must start over
+    repackaged = package / "repackaged.m4s"
+    repackaged.write_bytes(MEDIA[::-1])
+    repackaged.replace(package / "index.m4s")
+    
+    response = client.get("/hls/segment/index.m4s", headers={"Range": "bytes=16-31", "If-Range": etag})
+    assert response.status_code == 200
+    assert response.content == MEDIA[::-1]
+    assert response.headers["etag"] != etag
@@ -0,0 +1,153 @@
+"""
+Job leases: heartbeats, the reaper requeueing or failing jobs whose worker
+stopped, and giving a job up early
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+
+from api.core.config import settings
+from api.services.job_service import JobService
+from shared.database.connection import get_db
+from shared.models.job import JobStatus
+
+MAX_ATTEMPTS = 3
+
+
+@pytest.fixture(autouse=True)
+def lease_settings(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 60)
+
+
+async def claim(job_service: JobService, job_id: str = "job", worker_id: str = "worker") -> str:
+    """Queue a job and claim it for worker_id"""
+    await job_service.create_job(job_id, f"/uploads/{job_id}.mp4", f"{job_id}.mp4", 1)
+    assert await job_service.claim_next_job(worker_id) == job_id
+    return job_id
+
+
+async def lapse(job_id: str, seconds_ago: float = 1, attempts: Optional[int] = None):
+    """Let the job's lease run out, as if its worker stopped renewing it"""
+    expired_at = (datetime.utcnow() - timedelta(seconds=seconds_ago)).isoformat()
+    async with get_db() as db:
+        await db.execute(
+            "UPDATE jobs SET lease_expires_at = ?, attempts = COALESCE(?, attempts) WHERE id = ?",
+            (expired_at, attempts, job_id)
+        )
+        await db.commit()
+
+
+async def job_row(job_id: str):
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT status, worker_id, attempts, lease_expires_at, error FROM jobs WHERE id = ?",
+            (job_id,)
+        )
+        return await cursor.fetchone()
+
+
+def test_heartbeat_extends_the_holders_lease(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        await lapse(job_id, seconds_ago=-5)
+        
+        renewed = await job_service.renew_lease(job_id, "worker")
+        stolen = await job_service.renew_lease(job_id, "other")
+        return renewed, stolen, (await job_row(job_id))[3]
+    
+    renewed, stolen, lease_expires_at = run_db(scenario())
+    assert renewed and not stolen
+    assert datetime.fromisoformat(lease_expires_at) > datetime.utcnow() + timedelta(seconds=50)
+
+
+def test_heartbeat_of_cancelled_job_reports_the_lease_lost(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        await job_service.cancel_job(job_id, "Cancelled by user")
+        return await job_service.renew_lease(job_id, "worker"), await job_service.holds_lease(job_id, "worker")
+    
+    assert run_db(scenario()) == (False, False)
+
+
+def test_reaper_leaves_live_leases_alone(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        return await job_service.reap_expired_leases(MAX_ATTEMPTS), await job_row(job_id)
+    
+    reaped, (status, worker_id, *_) = run_db(scenario())
+    assert reaped == ([], [])
+    assert (status, worker_id) == (JobStatus.PROCESSING.value, "worker")
+
+
+def test_expired_lease_is_requeued_and_claimed_again(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service, worker_id="stalled")
+        await lapse(job_id)
+        
+        reaped = await job_service.reap_expired_leases(MAX_ATTEMPTS)
+        requeued = await job_row(job_id)
+        reclaimed = await job_service.claim_next_job("healthy")
+        return reaped, requeued, reclaimed, await job_row(job_id), await job_service.holds_lease(job_id, "stalled")
+    
+    reaped, requeued, reclaimed, row, stalled_holds = run_db(scenario())
+    assert reaped == (["job"], [])
+    assert requeued[:2] == (JobStatus.PENDING.value, None)
+    assert reclaimed == "job"
+    assert row[:3] == (JobStatus.PROCESSING.value, "healthy", 2)
+    assert not stalled_holds
+
+
+def test_job_that_used_its_attempts_fails(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        await lapse(job_id, attempts=MAX_ATTEMPTS)
+        return await job_service.reap_expired_leases(MAX_ATTEMPTS), await job_row(job_id)
+    
+    reaped, (status, _, attempts, lease_expires_at, error) = run_db(scenario())
+    assert reaped == ([], ["job"])
+    assert (status, attempts, lease_expires_at) == (JobStatus.FAILED.value, MAX_ATTEMPTS, None)
+    assert error == "Worker stopped responding on every attempt"
+
+
+def test_job_claimed_without_a_lease_is_reaped(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        async with get_db() as db:
+            await db.execute("UPDATE jobs SET lease_expires_at = NULL WHERE id = ?", (job_id,))
+            await db.commit()
+        return await job_service.reap_expired_leases(MAX_ATTEMPTS)
+    
+    assert run_db(scenario()) == (["job"], [])
+
+
+def test_expired_lease_is_reaped_at_once(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        
+        # Only the holder can give the job up
+        await job_service.expire_lease(job_id, "other")
+        untouched = await job_service.reap_expired_leases(MAX_ATTEMPTS)
+        
+        await job_service.expire_lease(job_id, "worker")
+        return untouched, await job_service.reap_expired_leases(MAX_ATTEMPTS)
+    
+    assert run_db(scenario()) == (([], []), (["job"], []))
+
+
+def test_released_job_does_not_use_an_attempt(run_db):
+    async def scenario():
+        job_service = JobService()
+        job_id = await claim(job_service)
+        await job_service.release_job(job_id)
+        return await job_row(job_id)
+    
+    status, worker_id, attempts, lease_expires_at, _ = run_db(scenario())
+    assert (status, worker_id, attempts, lease_expires_at) == (JobStatus.PENDING.value, None, 0, None)
@@ -0,0 +1,157 @@
+"""
+A job process that dies takes its commands with it, and the pool fails
+over every job it was running; the parent exports its children's scratch use
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+from prometheus_client import REGISTRY
+
+from api.core.config import settings
+from shared.storage.scratch import MB, ScratchManager
+from worker import execution
+from worker.execution import JobOutcome, JobPool, JobPoolBroken, OUTCOME_COMPLETED, OUTCOME_DEFERRED
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux process semantics")
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def is_running(pid: int) -> bool:
+    """Whether a process exists and is not a zombie waiting to be reaped"""
+    try:
+        state = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0]
+    except FileNotFoundError:
+        return False
+    return state != "Z"
+
+
+def wait_until(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_command_dies_with_the_process_that_started_it(tmp_path: Path):
+    pid_file = tmp_path / "command.pid"
+    script = (
+        "import asyncio\n"
+        "from shared.media.ffmpeg import FFmpegSupervisor\n"
+        f"cmd = ['sh', '-c', 'echo $$ > {pid_file}; exec sleep 60']\n"
+        "asyncio.run(FFmpegSupervisor(timeout=0, cpu_seconds=0).run(cmd))\n"
+    )
+    job_process = subprocess.Popen([sys.executable, "-c", script], cwd=REPO_ROOT)
+    
+    try:
+        assert wait_until(lambda: pid_file.exists() and pid_file.read_text().strip())
+        command_pid = int(pid_file.read_text())
+        assert is_running(command_pid)
+        
+        # The command has its own session, so only the death signal can reach it
+        job_process.kill()
+        job_process.wait()
+        
+        assert wait_until(lambda: not is_running(command_pid))
+    finally:
+        job_process.kill()
+
+
+def fake_job(job_id: str, worker_id: str, cores):
+    """Stands in for _run_in_child: the job named 'crash' kills its process"""
+    if job_id == "crash":
+        time.sleep(0.5)
+        os.kill(os.getpid(), signal.SIGKILL)
+    time.sleep(30)
+    return JobOutcome(OUTCOME_COMPLETED, segments=[])
+
+
+def test_broken_pool_fails_over_every_running_job(tmp_path: Path, monkeypatch):
+    # Children are spawned and read their settings from the environment
+    monkeypatch.setenv("EYE_GAZE_ENABLED", "false")
+    monkeypatch.setenv("TEMP_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(execution, "_run_in_child", fake_job)
+    
+    async def scenario():
+        pool = JobPool(2)
+        try:
+            return await asyncio.gather(
+                pool.run("crash", "worker"),
+                pool.run("bystander", "worker"),
+                return_exceptions=True
+            )
+        finally:
+            pool.shutdown()
+    
+    started = time.monotonic()
+    results = asyncio.run(scenario())
+    
+    broken = [r for r in results if isinstance(r, JobPoolBroken)]
+    assert len(broken) == 1
+    assert sorted(broken[0].job_ids) == ["bystander", "crash"]
+    assert all(isinstance(r, (JobPoolBroken, BrokenProcessPool)) for r in results)
+    
+    # The bystander's child was terminated rather than left to finish its job
+    assert time.monotonic() - started < 20
+
+
+def scratch_job(job_id: str, worker_id: str, cores):
+    """Stands in for _run_in_child: holds a scratch reservation until told to finish"""
+    finish = Path(settings.TEMP_STORAGE_PATH) / f"{job_id}.finish"
+    scratch = execution._child_scratch.reserve(job_id, 3 * MB)
+    scratch.path("intermediate.ts", 1 * MB)
+    while not finish.exists():
+        time.sleep(0.05)
+    scratch.release()
+    return JobOutcome(OUTCOME_DEFERRED, scratch_refused=True)
+
+
+def scratch_metric(name: str, volume: str = None) -> float:
+    return REGISTRY.get_sample_value(name, {"volume": volume} if volume else {})
+
+
+def test_parent_exports_scratch_reserved_in_job_processes(tmp_path: Path, monkeypatch):
+    tmpfs = tmp_path / "tmpfs"
+    for name, value in [("TEMP_STORAGE_PATH", str(tmp_path)), ("SCRATCH_BUDGET_MB", 100),
+                        ("SCRATCH_TMPFS_PATH", str(tmpfs)), ("SCRATCH_TMPFS_BUDGET_MB", 10)]:
+        monkeypatch.setenv(name, str(value))
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setenv("EYE_GAZE_ENABLED", "false")
+    monkeypatch.setattr(execution, "_run_in_child", scratch_job)
+    
+    scratch_manager = ScratchManager()
+    refused = scratch_metric("vidprod_scratch_refused_total") or 0
+    
+    async def scenario():
+        pool = JobPool(2, scratch_manager)
+        try:
+            jobs = [asyncio.create_task(pool.run(job_id, "worker")) for job_id in ("first", "second")]
+            held = await asyncio.get_running_loop().run_in_executor(None, wait_until, lambda: (
+                scratch_metric("vidprod_scratch_jobs") == 2
+            ))
+            reserved = (scratch_metric("vidprod_scratch_reserved_bytes", "disk"),
+                        scratch_metric("vidprod_scratch_reserved_bytes", "tmpfs"))
+            
+            for job_id in ("first", "second"):
+                (tmp_path / f"{job_id}.finish").touch()
+            await asyncio.gather(*jobs)
+            return held, reserved
+        finally:
+            pool.shutdown()
+    
+    held, reserved = asyncio.run(scenario())
+    
+    assert held
+    assert reserved == (6 * MB, 2 * MB)
+    assert scratch_metric("vidprod_scratch_jobs") == 0
+    assert scratch_metric("vidprod_scratch_reserved_bytes", "disk") == 0
+    assert scratch_metric("vidprod_scratch_refused_total") == refused + 2
@@ -0,0 +1,138 @@
+"""
+Claim order of the job queue: priority weights, aging and fair sharing
+between owners
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pytest
+
+from api.core.config import settings
+from api.services.job_service import JobService
+from shared.database.connection import get_db
+from shared.models.job import JobPriority, JobStatus
+
+
+@pytest.fixture(autouse=True)
+def queue_settings(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_AGING_SECONDS", 300)
+    monkeypatch.setattr(settings, "FAIR_SHARE_WINDOW_SECONDS", 900)
+
+
+async def queue(job_id: str, priority: JobPriority = JobPriority.NORMAL, owner: Optional[str] = None,
+                waited: float = 0, status: JobStatus = JobStatus.PENDING, started: Optional[float] = None):
+    """Add a job that was queued `waited` seconds ago and, if given, started `started` seconds ago"""
+    await JobService().create_job(job_id, f"/uploads/{job_id}.mp4", f"{job_id}.mp4", 1,
+                                  priority=priority, owner=owner)
+    now = datetime.utcnow()
+    async with get_db() as db:
+        await db.execute(
+            "UPDATE jobs SET status = ?, created_at = ?, started_at = ? WHERE id = ?",
+            (
+                status.value,
+                (now - timedelta(seconds=waited)).isoformat(),
+                (now - timedelta(seconds=started)).isoformat() if started is not None else None,
+                job_id
+            )
+        )
+        await db.commit()
+
+
+async def claim_all(job_service: JobService) -> List[str]:
+    """Claim jobs until the queue is empty, returning them in claim order"""
+    claimed = []
+    while (job_id := await job_service.claim_next_job("worker")) is not None:
+        claimed.append(job_id)
+    return claimed
+
+
+def test_higher_priority_is_claimed_first(run_db):
+    async def scenario():
+        await queue("low", JobPriority.LOW, waited=30)
+        await queue("normal", JobPriority.NORMAL, waited=20)
+        await queue("urgent", JobPriority.URGENT, waited=0)
+        await queue("high", JobPriority.HIGH, waited=10)
+        return await claim_all(JobService())
+    
+    assert run_db(scenario()) == ["urgent", "high", "normal", "low"]
+
+
+def test_equal_scores_are_claimed_oldest_first(run_db):
+    async def scenario():
+        await queue("second", waited=60)
+        await queue("first", waited=61)
+        return await claim_all(JobService())
+    
+    assert run_db(scenario()) == ["first", "second"]
+
+
+def test_waiting_low_priority_job_overtakes_fresh_high_priority_job(run_db):
+    async def scenario():
+        # Weight 1 plus one point per 300s waited: 1 + 4 beats a fresh high job's 4
+        await queue("old-low", JobPriority.LOW, waited=1200)
+        await queue("new-high", JobPriority.HIGH)
+        return await claim_all(JobService())
+    
+    assert run_db(scenario()) == ["old-low", "new-high"]
+
+
+def test_owner_with_running_jobs_yields_to_idle_owner(run_db):
+    async def scenario():
+        await queue("busy-running-1", owner="busy", status=JobStatus.PROCESSING, started=60)
+        await queue("busy-running-2", owner="busy", status=JobStatus.PROCESSING, started=60)
+        await queue("busy-next", owner="busy", waited=120)
+        await queue("idle-next", owner="idle", waited=0)
+        return await claim_all(JobService())
+    
+    assert run_db(scenario()) == ["idle-next", "busy-next"]
+
+
+def test_recent_starts_count_against_owner_until_window_passes(run_db):
+    async def scenario():
+        # A finished job inside the window still counts; one older than the window does not
+        await queue("recent-done", owner="recent", status=JobStatus.COMPLETED, started=600)
+        await queue("stale-done", owner="stale", status=JobStatus.COMPLETED, started=1800)
+        await queue("recent-next", owner="recent", waited=10)
+        await queue("stale-next", owner="stale", waited=0)
+        return await claim_all(JobService())
+    
+    assert run_db(scenario()) == ["stale-next", "recent-next"]
+
+
+def test_owners_share_in_proportion_to_weight(run_db):
+    async def scenario():
+        # High priority (4) with one running job scores 4 / 2, level with an idle normal owner (2 / 1)
+        await queue("heavy-running", JobPriority.HIGH, owner="heavy", status=JobStatus.PROCESSING, started=30)
+        await queue("heavy-next", JobPriority.HIGH, owner="heavy", waited=5)
+        await queue("light-next", JobPriority.NORMAL, owner="light", waited=0)
+        return await claim_all(JobService())
+    
+    assert run_db(scenario()) == ["heavy-next", "light-next"]
+
+
+def test_claim_skips_excluded_jobs(run_db):
+    async def scenario():
+        await queue("first", waited=20)
+        await queue("second", waited=10)
+        return await JobService().claim_next_job("worker", exclude=["first"])
+    
+    assert run_db(scenario()) == "second"
+
+
+def test_claim_takes_a_lease_and_counts_the_attempt(run_db):
+    async def scenario():
+        await queue("job")
+        job_service = JobService()
+        claimed = await job_service.claim_next_job("worker")
+        async with get_db() as db:
+            cursor = await db.execute(
+                "SELECT status, worker_id, attempts, lease_expires_at, started_at FROM jobs WHERE id = ?",
+                (claimed,)
+            )
+            return claimed, await cursor.fetchone(), await job_service.claim_next_job("other")
+    
+    claimed, (status, worker_id, attempts, lease_expires_at, started_at), again = run_db(scenario())
+    assert claimed == "job"
+    assert (status, worker_id, attempts) == (JobStatus.PROCESSING.value, "worker", 1)
+    assert lease_expires_at is not None and started_at is not None
+    assert again is None
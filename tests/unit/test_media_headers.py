@@ -0,0 +1,72 @@
+"""
+In-process MP4 and Matroska header parsing against small fixture files
+(regenerate them with fixtures/media/generate.sh)
+"""
+from pathlib import Path
+
+import pytest
+
+from shared.media.headers import MATROSKA_FORMAT_NAME, MP4_FORMAT_NAME, parse_media_header
+
+FIXTURES = Path(__file__).parent / "fixtures" / "media"
+
+
+def parse(name: str):
+    media_info = parse_media_header(str(FIXTURES / name))
+    assert media_info is not None
+    return media_info
+
+
+def test_mp4_streams():
+    media_info = parse("bframes.mp4")
+    
+    assert media_info.format_name == MP4_FORMAT_NAME
+    assert media_info.duration == pytest.approx(2.0)
+    assert (media_info.video_codec, media_info.video_profile) == ("h264", "High")
+    assert (media_info.width, media_info.height) == (64, 64)
+    assert media_info.video_extradata_hash.startswith("SHA256:")
+    assert (media_info.audio_codec, media_info.audio_sample_rate, media_info.audio_channels) == ("aac", 48000, 1)
+
+
+def test_mp4_keyframes_are_presentation_times():
+    # B-frames delay presentation through ctts; the edit list takes the delay back out
+    assert parse("bframes.mp4").keyframes == pytest.approx([0.0, 1.0])
+
+
+def test_mp4_constant_frame_rate():
+    media_info = parse("bframes.mp4")
+    
+    assert media_info.fps == pytest.approx(30.0)
+    assert not media_info.variable_frame_rate
+
+
+def test_mp4_timestamp_rounding_is_not_variable_frame_rate():
+    # Millisecond timestamps give 30fps frames alternating 33 and 34ms durations
+    media_info = parse("jitter.mp4")
+    
+    assert media_info.fps == pytest.approx(30.0)
+    assert not media_info.variable_frame_rate
+
+
+def test_mp4_variable_frame_rate():
+    media_info = parse("vfr.mp4")
+    
+    assert media_info.variable_frame_rate
+    assert media_info.keyframes == pytest.approx([0.0, 1.0])
+
+
+@pytest.mark.parametrize("name", ["cues_at_end.mkv", "cues_in_front.mkv"])
+def test_matroska_streams_and_cue_keyframes(name: str):
+    media_info = parse(name)
+    
+    assert media_info.format_name == MATROSKA_FORMAT_NAME
+    assert media_info.duration == pytest.approx(2.0)
+    assert media_info.video_codec == "h264"
+    assert (media_info.width, media_info.height) == (64, 64)
+    assert media_info.fps == pytest.approx(30.0)
+    assert not media_info.variable_frame_rate
+    assert media_info.video_extradata_hash.startswith("SHA256:")
+    
+    # Cues index the keyframes whether they sit before the clusters or after them
+    assert media_info.keyframes == pytest.approx([0.0, 1.0])
+
@@ -0,0 +1,155 @@
+"""
+Publishing a job's outputs never leaves its output directory missing, and
+never pulls scratch files from under a running upload
+"""
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from api.core.config import settings
+from api.services.job_service import JobService
+from shared.database.connection import get_db
+from shared.models.job import JobSegment, Platform, UploadStatus
+from shared.storage import processed
+from shared.storage.processed import job_output_dir, promote_outputs, read_manifest
+from worker.schedulers.upload_scheduler import UploadScheduler
+
+
+@pytest.fixture
+def processed_path(tmp_path: Path, monkeypatch) -> Path:
+    path = tmp_path / "processed"
+    monkeypatch.setattr(settings, "PROCESSED_PATH", str(path))
+    return path
+
+
+def render(scratch_dir: Path, content: bytes) -> JobSegment:
+    """A freshly rendered segment file in scratch"""
+    scratch_dir.mkdir(parents=True, exist_ok=True)
+    path = scratch_dir / "segment_001.mp4"
+    path.unlink(missing_ok=True)
+    path.write_bytes(content)
+    return JobSegment(id="job-segment", job_id="job", segment_number=1, file_path=str(path))
+
+
+def test_retry_replaces_outputs_without_the_directory_going_missing(tmp_path: Path, processed_path: Path,
+                                                                    monkeypatch):
+    scratch_dir = tmp_path / "scratch"
+    promote_outputs("job", scratch_dir, [render(scratch_dir, b"first attempt")])
+    output_dir = job_output_dir("job")
+    
+    missing = []
+    rename = os.rename
+    
+    def watched_rename(source, target):
+        rename(source, target)
+        if not output_dir.exists():
+            missing.append((source, target))
+    
+    monkeypatch.setattr(processed.os, "rename", watched_rename)
+    
+    segment = render(scratch_dir, b"second attempt")
+    promote_outputs("job", scratch_dir, [segment])
+    
+    if processed._renameat2 is not None:
+        assert missing == []
+    assert Path(segment.file_path).read_bytes() == b"second attempt"
+    assert [entry.path for entry in read_manifest("job").files] == ["segment_001.mp4"]
+    assert sorted(p.name for p in processed_path.iterdir()) == ["job"]
+
+
+def test_first_publish_creates_the_output_directory(tmp_path: Path, processed_path: Path):
+    scratch_dir = tmp_path / "scratch"
+    segment = render(scratch_dir, b"only attempt")
+    promote_outputs("job", scratch_dir, [segment])
+    
+    assert Path(segment.file_path).read_bytes() == b"only attempt"
+    assert sorted(p.name for p in processed_path.iterdir()) == ["job"]
+
+
+class RecordingUploader:
+    def __init__(self):
+        self.paths = []
+    
+    async def upload(self, platform: Platform, file_path: str, job_id: str, segment_number: int) -> str:
+        self.paths.append(file_path)
+        return f"https://example.com/{job_id}/{segment_number}"
+
+
+async def queue_upload(file_path: str, status: UploadStatus = UploadStatus.PENDING):
+    async with get_db() as db:
+        await db.execute(
+            "INSERT INTO jobs (id, status, video_path, video_filename) VALUES ('job', 'processing', '', '')"
+        )
+        await db.execute(
+            "INSERT INTO job_segments (id, job_id, segment_number, file_path) VALUES ('job-segment', 'job', 1, ?)",
+            (file_path,)
+        )
+        await db.execute(
+            "INSERT INTO platform_uploads (id, segment_id, platform, upload_status) "
+            "VALUES ('job-tiktok', 'job-segment', 'tiktok', ?)",
+            (status.value,)
+        )
+        await db.commit()
+
+
+def test_upload_fetched_before_publishing_reads_the_published_file(run_db, monkeypatch):
+    monkeypatch.setattr(settings, "PLATFORM_UPLOAD_ENABLED", True)
+    
+    async def scenario():
+        await queue_upload("/scratch/job/segments/segment_001.mp4")
+        scheduler = UploadScheduler()
+        scheduler.platform_uploader = RecordingUploader()
+        
+        # Published between the scheduler's fetch and the start of the upload
+        await JobService().update_segment_paths([JobSegment(
+            id="job-segment", job_id="job", segment_number=1,
+            file_path="/processed/job/segment_001.mp4"
+        )])
+        await scheduler._upload_segment(
+            "job-tiktok", "job-segment", Platform.TIKTOK, "job",
+            "/scratch/job/segments/segment_001.mp4", 1, None, 0
+        )
+        return scheduler.platform_uploader.paths
+    
+    assert run_db(scenario()) == ["/processed/job/segment_001.mp4"]
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    pytest.importorskip("cv2")
+    pytest.importorskip("mediapipe")
+    from worker.processors import video_processor
+    
+    monkeypatch.setattr(settings, "EYE_GAZE_ENABLED", False)
+    monkeypatch.setattr(video_processor, "UPLOAD_DRAIN_POLL_INTERVAL", 0.01)
+    return video_processor.VideoProcessor(scratch_manager=None)
+
+
+def test_scratch_waits_for_running_uploads(run_db, processor):
+    async def scenario():
+        await queue_upload("/scratch/job/segments/segment_001.mp4", UploadStatus.UPLOADING)
+        waiter = asyncio.create_task(processor._wait_for_uploads("job"))
+        
+        await asyncio.sleep(0.1)
+        still_waiting = not waiter.done()
+        
+        async with get_db() as db:
+            await db.execute("UPDATE platform_uploads SET upload_status = 'completed'")
+            await db.commit()
+        await asyncio.wait_for(waiter, timeout=5)
+        return still_waiting
+    
+    assert run_db(scenario())
+
+
+def test_scratch_wait_gives_up_after_the_timeout(run_db, processor, monkeypatch):
+    from worker.processors import video_processor
+    monkeypatch.setattr(video_processor, "UPLOAD_DRAIN_TIMEOUT", 0.05)
+    
+    async def scenario():
+        await queue_upload("/scratch/job/segments/segment_001.mp4", UploadStatus.UPLOADING)
+        await asyncio.wait_for(processor._wait_for_uploads("job"), timeout=5)
+    
+    run_db(scenario())
@@ -0,0 +1,127 @@
+"""
+Keyframe snapping of segment boundaries, and smart-cut segments whose
+re-encoded head and stream-copied GOPs have different parameter sets
+"""
+import asyncio
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("mediapipe")
+
+from api.core.config import settings
+from shared.media.headers import parse_media_header
+from worker.processors.video_processor import VideoProcessor
+
+FRAME_RATE = 30
+KEYFRAME_INTERVAL = 2  # Seconds
+B_FRAMES = 2
+DURATION = 12
+SEGMENT_DURATION = 5  # Not a multiple of the keyframe interval, so every later segment has a head
+
+requires_ffmpeg = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg is required")
+
+
+@pytest.fixture
+def processor(monkeypatch) -> VideoProcessor:
+    monkeypatch.setattr(settings, "EYE_GAZE_ENABLED", False)
+    return VideoProcessor(scratch_manager=None)
+
+
+def every(interval: float, duration: float) -> List[float]:
+    return [n * interval for n in range(int(duration / interval) + 1)]
+
+
+def test_boundaries_land_on_keyframes(processor: VideoProcessor):
+    assert processor._snap_cut_points(every(2, 30), 30, 10, 1, None) == [10, 20]
+
+
+def test_nearest_keyframe_within_tolerance_wins(processor: VideoProcessor):
+    keyframes = [0, 9.5, 10.8, 19.2, 20.5, 29.0]
+    # 9.5 is nearer 10 than 10.8; the next target is 19.5, nearer 19.2 than 20.5
+    assert processor._snap_cut_points(keyframes, 30, 10, 1, None) == [9.5, 19.2]
+
+
+def test_boundary_without_keyframe_in_tolerance_gives_up(processor: VideoProcessor):
+    assert processor._snap_cut_points([0, 8.0, 12.0, 20.0], 30, 10, 1, None) is None
+
+
+def test_snapping_never_exceeds_platform_limit(processor: VideoProcessor):
+    keyframes = [0, 8.5, 11.0, 19.0, 21.0]
+    cut_points = processor._snap_cut_points(keyframes, 25, 10, 2, 10.5)
+    
+    # 11.0 is nearer the target but would make a 11s segment
+    assert cut_points == [8.5, 19.0]
+    assert all(b - a <= 10.5 for a, b in zip([0, *cut_points], [*cut_points, 25]))
+
+
+def test_short_tail_joins_the_last_segment(processor: VideoProcessor):
+    # 0.5s left over after 20s stays within the tolerance instead of becoming its own segment
+    assert processor._snap_cut_points(every(1, 20.5), 20.5, 10, 1, None) == [10]
+
+
+def frame_hashes(path: Path) -> List[str]:
+    """Per-frame MD5 of the decoded video stream, failing on any decode error"""
+    result = subprocess.run([
+        "ffmpeg", "-v", "error", "-xerror", "-i", str(path),
+        "-map", "0:v:0", "-vsync", "passthrough", "-f", "framemd5", "-"
+    ], check=True, capture_output=True, text=True)
+    assert result.stderr == ""
+    return [line.rsplit(",", 1)[1].strip() for line in result.stdout.splitlines() if not line.startswith("#")]
+
+
+def sample_entry(path: Path) -> bytes:
+    """Codec fourcc of the first track's sample description"""
+    data = path.read_bytes()
+    stsd = data.index(b"stsd")
+    return data[stsd + 16:stsd + 20]  # After version/flags, entry count and entry size
+
+
+@requires_ffmpeg
+def test_smart_cut_segments_decode_to_the_source_frames(processor: VideoProcessor, tmp_path: Path):
+    # CAVLC with one reference frame, so the head's x264 SPS/PPS differ from the source's
+    source = tmp_path / "source.mp4"
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate={FRAME_RATE}",
+        "-f", "lavfi", "-i", "sine=frequency=440",
+        "-t", str(DURATION),
+        "-c:v", "libx264", "-x264-params", "cabac=0:ref=1", "-bf", str(B_FRAMES),
+        "-g", str(FRAME_RATE * KEYFRAME_INTERVAL),
+        "-keyint_min", str(FRAME_RATE * KEYFRAME_INTERVAL),
+        "-sc_threshold", "0",
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest",
+        str(source)
+    ], check=True)
+    media_info = parse_media_header(str(source))
+    
+    output_dir = tmp_path / "segments"
+    output_dir.mkdir()
+    segments = asyncio.run(processor._split_smart_cut(
+        str(source), "job", SEGMENT_DURATION, output_dir, media_info, lambda segment: None
+    ))
+    
+    source_frames = frame_hashes(source)
+    assert len(segments) == 3
+    for segment in segments:
+        first = round(segment.start_time * FRAME_RATE)
+        count = round(segment.duration * FRAME_RATE)
+        keyframe = next(k for k in media_info.keyframes if k >= segment.start_time - 0.001)
+        head = round((keyframe - segment.start_time) * FRAME_RATE)
+        
+        # A copied GOP cut mid-way keeps the reference frames its B-frames need, so
+        # up to B_FRAMES frames from past the end come along
+        frames = frame_hashes(Path(segment.file_path))
+        assert count <= len(frames) <= count + B_FRAMES
+        
+        # Copied GOPs decode bit-exactly, i.e. with their own parameter sets, not the head's
+        assert frames[head:count] == source_frames[first + head:first + count]
+        
+        # FFmpeg honours in-band parameter sets either way; under avc1 other players
+        # may apply the head's SPS/PPS from the avcC to every frame
+        assert sample_entry(Path(segment.file_path)) == b"avc3"
@@ -0,0 +1,82 @@
+"""
+Stream-copy splitting on B-frame input: cuts land on the requested keyframes
+and segment records carry the source times they really start at
+"""
+import asyncio
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("mediapipe")
+if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+    pytest.skip("ffmpeg and ffprobe are required", allow_module_level=True)
+
+from api.core.config import settings
+from shared.models.job import MediaInfo
+from worker.processors.video_processor import VideoProcessor
+
+FRAME_RATE = 30
+KEYFRAME_INTERVAL = 2  # Seconds
+DURATION = 30
+CUT_POINTS = [10.0, 20.0]
+
+
+@pytest.fixture
+def bframe_video(tmp_path: Path) -> Path:
+    """H.264 with two B-frames and a keyframe every KEYFRAME_INTERVAL seconds, as the normalizer writes"""
+    path = tmp_path / "bframes.mp4"
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate={FRAME_RATE}",
+        "-f", "lavfi", "-i", "sine=frequency=440",
+        "-t", str(DURATION),
+        "-c:v", "libx264", "-bf", "2",
+        "-g", str(FRAME_RATE * KEYFRAME_INTERVAL),
+        "-keyint_min", str(FRAME_RATE * KEYFRAME_INTERVAL),
+        "-sc_threshold", "0",
+        "-c:a", "aac", "-shortest",
+        str(path)
+    ], check=True)
+    return path
+
+
+def probed_duration(path: str) -> float:
+    """Video stream duration of a file according to ffprobe"""
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=duration", "-of", "json", path
+    ], check=True, capture_output=True, text=True)
+    return float(json.loads(result.stdout)["streams"][0]["duration"])
+
+
+def test_cuts_land_on_requested_keyframes(bframe_video: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "EYE_GAZE_ENABLED", False)
+    processor = VideoProcessor(scratch_manager=None)
+    
+    async def no_progress(fraction: float):
+        pass
+    monkeypatch.setattr(processor, "_report_progress", no_progress)
+    
+    output_dir = tmp_path / "segments"
+    output_dir.mkdir()
+    media_info = MediaInfo(duration=DURATION, fps=FRAME_RATE, width=320, height=240)
+    
+    segments = asyncio.run(processor._split_stream_copy(
+        str(bframe_video), "job", CUT_POINTS, output_dir, media_info, lambda segment: None
+    ))
+    
+    boundaries = [0.0, *CUT_POINTS, DURATION]
+    frame = 1 / FRAME_RATE
+    
+    assert len(segments) == len(boundaries) - 1
+    for segment, start, end in zip(segments, boundaries, boundaries[1:]):
+        # Records carry the cut points, not the muxer's delay-shifted times
+        assert segment.start_time == pytest.approx(start)
+        assert segment.duration == pytest.approx(end - start)
+        
+        # The files really were cut there, not a keyframe interval later
+        assert probed_duration(segment.file_path) == pytest.approx(end - start, abs=frame * 1.5)
@@ -0,0 +1,64 @@
+"""
+Thumbnail responses revalidate, so a retried job's re-rendered images
+replace the cached ones under the same segment ID
+"""
+import os
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routers import thumbnails
+from shared.models.job import JobSegment
+
+
+@pytest.fixture
+def poster(tmp_path: Path, monkeypatch) -> Path:
+    path = tmp_path / "segment_001_poster.jpg"
+    path.write_bytes(b"first render")
+    
+    async def get_segment(segment_id: str):
+        return JobSegment(id=segment_id, job_id="job", segment_number=1,
+                          file_path=str(tmp_path / "segment_001.mp4"), thumbnail_path=str(path))
+    
+    monkeypatch.setattr(thumbnails.job_service, "get_segment", get_segment)
+    return path
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(thumbnails.router)
+    return TestClient(app)
+
+
+def test_thumbnails_are_not_cached_as_immutable(client: TestClient, poster: Path):
+    response = client.get("/thumbnails/segment/poster")
+    
+    assert response.status_code == 200
+    assert "immutable" not in response.headers["cache-control"]
+    assert response.headers["etag"]
+
+
+def test_unchanged_thumbnail_revalidates(client: TestClient, poster: Path):
+    etag = client.get("/thumbnails/segment/poster").headers["etag"]
+    
+    response = client.get("/thumbnails/segment/poster", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+
+
+def test_rerendered_thumbnail_gets_a_new_etag(client: TestClient, poster: Path):
+    etag = client.get("/thumbnails/segment/poster").headers["etag"]
+    
+    # A retry writes a new file of the same size within the same second
+    rerendered = poster.with_name("rerendered.jpg")
+    rerendered.write_bytes(b"retry render")
+    stat = poster.stat()
+    os.utime(rerendered, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(rerendered, poster)
+    
+    response = client.get("/thumbnails/segment/poster", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.content == b"retry render"
+    assert response.headers["etag"] != etag
@@ -0,0 +1,136 @@
+"""
+Cancelling a job withdraws its queued platform uploads, and the upload
+scheduler never posts a withdrawn upload
+"""
+import asyncio
+
+import pytest
+
+from api.core.config import settings
+from api.services.job_service import JobService
+from shared.database.connection import get_db
+from shared.models.job import Platform, UploadStatus
+from worker.schedulers.upload_scheduler import UploadScheduler
+
+
+class RecordingUploader:
+    """Platform uploader that only records what it was asked to post"""
+    
+    def __init__(self):
+        self.uploads = []
+    
+    async def upload(self, platform: Platform, file_path: str, job_id: str, segment_number: int) -> str:
+        self.uploads.append((platform, file_path))
+        return f"https://example.com/{job_id}/{segment_number}"
+
+
+@pytest.fixture(autouse=True)
+def uploads_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "PLATFORM_UPLOAD_ENABLED", True)
+
+
+async def create_job(job_id: str = "job"):
+    """A processing job with one segment queued for TikTok and YouTube and posted to Instagram"""
+    async with get_db() as db:
+        await db.execute(
+            "INSERT INTO jobs (id, status, video_path, video_filename) VALUES (?, ?, ?, ?)",
+            (job_id, "processing", f"/uploads/{job_id}.mp4", f"{job_id}.mp4")
+        )
+        await db.execute(
+            "INSERT INTO job_segments (id, job_id, segment_number, file_path) VALUES (?, ?, ?, ?)",
+            (f"{job_id}-segment", job_id, 1, f"/scratch/{job_id}/segment_001.mp4")
+        )
+        for platform, status in [
+            ("tiktok", UploadStatus.PENDING),
+            ("youtube", UploadStatus.SCHEDULED),
+            ("instagram", UploadStatus.COMPLETED),
+        ]:
+            await db.execute(
+                "INSERT INTO platform_uploads (id, segment_id, platform, upload_status) VALUES (?, ?, ?, ?)",
+                (f"{job_id}-{platform}", f"{job_id}-segment", platform, status.value)
+            )
+        await db.commit()
+
+
+async def upload_statuses() -> dict:
+    async with get_db() as db:
+        cursor = await db.execute("SELECT id, upload_status FROM platform_uploads")
+        return dict(await cursor.fetchall())
+
+
+def test_cancel_job_withdraws_queued_uploads(run_db):
+    async def scenario():
+        await create_job()
+        assert await JobService().cancel_job("job", "Cancelled by user")
+        return await upload_statuses()
+    
+    assert run_db(scenario()) == {
+        "job-tiktok": UploadStatus.CANCELLED.value,
+        "job-youtube": UploadStatus.CANCELLED.value,
+        "job-instagram": UploadStatus.COMPLETED.value,
+    }
+
+
+def test_concurrent_cancels_have_one_winner(run_db):
+    async def scenario():
+        await create_job()
+        job_service = JobService()
+        
+        # Another job's writes interleave with the cancels on the shared connection
+        return await asyncio.gather(
+            *[job_service.cancel_job("job", "Cancelled by user") for _ in range(5)],
+            create_job("other"),
+            return_exceptions=True
+        )
+    
+    *cancels, created = run_db(scenario())
+    assert [c for c in cancels if c is not True and c is not False] == []
+    assert cancels.count(True) == 1
+    assert created is None
+
+
+def test_cancel_leaves_finished_job_alone(run_db):
+    async def scenario():
+        await create_job()
+        async with get_db() as db:
+            await db.execute("UPDATE jobs SET status = 'completed' WHERE id = 'job'")
+            await db.commit()
+        
+        cancelled = await JobService().cancel_job("job", "Cancelled by user")
+        return cancelled, await upload_statuses()
+    
+    cancelled, statuses = run_db(scenario())
+    assert not cancelled
+    assert statuses["job-tiktok"] == UploadStatus.PENDING.value
+
+
+def test_scheduler_skips_withdrawn_uploads(run_db):
+    async def scenario():
+        await create_job()
+        await JobService().cancel_job("job", "Cancelled by user")
+        
+        scheduler = UploadScheduler()
+        scheduler.platform_uploader = RecordingUploader()
+        await scheduler._process_pending_uploads()
+        return scheduler.platform_uploader.uploads
+    
+    assert run_db(scenario()) == []
+
+
+def test_scheduler_skips_upload_withdrawn_after_it_was_fetched(run_db):
+    async def scenario():
+        await create_job()
+        scheduler = UploadScheduler()
+        scheduler.platform_uploader = RecordingUploader()
+        
+        # Fetched for upload, then the job is cancelled before the upload starts
+        await JobService().cancel_job("job", "Cancelled by user")
+        await scheduler._upload_segment(
+            "job-tiktok", "job-segment", Platform.TIKTOK, "job",
+            "/scratch/job/segment_001.mp4", 1, None, 0
+        )
+        return scheduler.platform_uploader.uploads, await upload_statuses()
+    
+    uploads, statuses = run_db(scenario())
+    assert uploads == []
+    assert statuses["job-tiktok"] == UploadStatus.CANCELLED.value
@@ -0,0 +1,168 @@
+"""
+Admission control sized from each job's probed media
+
+A worker slot says nothing about what a job costs: a long 4K upload needs
+far more memory and CPU than a short 720p clip. Each claimed job's peak
+memory and CPU time are estimated from its stored probe and options, and
+the job is only started if it fits in what running jobs leave of the
+worker's budgets. It is granted a number of cores, which sets the threads
+its FFmpeg encodes (and, in a job process, OpenCV) may use.
+"""
+import math
+import os
+from typing import Dict, NamedTuple, Optional
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+from api.core.config import settings
+from shared.models.job import Job, MediaInfo, PLATFORM_ENCODE_PROFILES
+from worker.execution import time_limit
+from worker.processors.encode_policy import REFERENCE_PIXELS, backlog_step, encode_core_seconds
+
+logger = structlog.get_logger()
+
+MB = 1024 * 1024
+
+# Share of physical memory jobs may use when WORKER_MEMORY_BUDGET_MB is 0
+DEFAULT_MEMORY_FRACTION = 0.8
+
+# Memory every job needs whatever its input: the pipeline, FFprobe and QC sampling
+JOB_BASE_MEMORY = 200 * MB
+
+# Raw yuv420p frames one libx264 encode holds (lookahead, references, frame threads)
+ENCODE_FRAME_BUFFERS = 100
+
+# Face mesh models of a job's eye gaze corrector
+GAZE_MODEL_MEMORY = 300 * MB
+
+# Working set of the gaze warp per frame pixel: coordinate grids, distance and weight maps
+GAZE_BYTES_PER_PIXEL = 96
+
+# CPU time per 1080p frame of face landmarking and warping
+GAZE_CORE_SECONDS_PER_FRAME = 0.05
+
+# Frame rate assumed when the probe has none
+DEFAULT_FPS = 30.0
+
+# Jobs are given enough cores to finish within this share of their time limit
+TARGET_TIME_FRACTION = 0.5
+
+MEMORY_BUDGET = Gauge("vidprod_worker_memory_budget_bytes", "Memory admitted jobs may use")
+MEMORY_RESERVED = Gauge("vidprod_worker_memory_reserved_bytes", "Estimated peak memory of running jobs")
+CORES_BUDGET = Gauge("vidprod_worker_cores", "CPU cores admitted jobs may use")
+CORES_ALLOCATED = Gauge("vidprod_worker_cores_allocated", "CPU cores granted to running jobs")
+ADMISSION_DEFERRED = Counter("vidprod_admission_deferred_total", "Jobs deferred for lack of memory or cores")
+
+
+class JobCost(NamedTuple):
+    """Estimated resource needs of a job"""
+    memory: int                    # Peak resident memory in bytes
+    core_seconds: Optional[float]  # CPU time; None when the input has not been probed
+    cores: int                     # Cores that finish it within its target time
+
+
+def estimate_job_cost(job: Job, backlog: int, max_cores: int) -> JobCost:
+    """Peak memory and CPU time of a job from its probe, platforms and processing options"""
+    media_info = job.media_info
+    gaze = settings.EYE_GAZE_ENABLED and job.processing_options.eye_gaze_correction
+    
+    pixels = _pixels(media_info)
+    
+    # Stages run one after another; only the split overlaps encodes
+    encode_memory = pixels * 3 // 2 * ENCODE_FRAME_BUFFERS * max(1, settings.SEGMENT_ENCODE_CONCURRENCY)
+    gaze_memory = pixels * GAZE_BYTES_PER_PIXEL if gaze else 0
+    memory = JOB_BASE_MEMORY + (GAZE_MODEL_MEMORY if gaze else 0) + max(encode_memory, gaze_memory)
+    
+    # Compilations and failed probes have no media record until the job runs
+    if media_info is None:
+        return JobCost(memory=memory, core_seconds=None, cores=max_cores)
+    
+    core_seconds = _core_seconds(job, media_info, backlog, gaze)
+    limit, _ = time_limit(job)
+    if limit <= 0:
+        cores = 1  # Fails on arrival without doing any work
+    else:
+        cores = math.ceil(core_seconds / (limit * TARGET_TIME_FRACTION))
+    
+    return JobCost(memory=memory, core_seconds=core_seconds, cores=max(1, min(cores, max_cores)))
+
+
+def _core_seconds(job: Job, media_info: MediaInfo, backlog: int, gaze: bool) -> float:
+    """CPU time of the job's encodes at the preset its backlog implies, plus gaze correction"""
+    # The split is one pass over the input, plus one per distinct rendition profile
+    profiles = {PLATFORM_ENCODE_PROFILES[p] for p in job.platforms if p in PLATFORM_ENCODE_PROFILES}
+    core_seconds = encode_core_seconds(media_info, 1 + len(profiles), backlog_step(backlog))
+    
+    if gaze:
+        frames = media_info.duration * (media_info.fps or DEFAULT_FPS)
+        core_seconds += frames * GAZE_CORE_SECONDS_PER_FRAME * (_pixels(media_info) / REFERENCE_PIXELS)
+    
+    return core_seconds
+
+
+def _pixels(media_info: Optional[MediaInfo]) -> int:
+    """Frame area of the probed video, or of 1080p when unknown"""
+    if media_info is not None and media_info.width and media_info.height:
+        return media_info.width * media_info.height
+    return REFERENCE_PIXELS
+
+
+class AdmissionController:
+    """Packs the worker's jobs under its memory and CPU budgets"""
+    
+    def __init__(self):
+        physical_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        self.memory_budget = settings.WORKER_MEMORY_BUDGET_MB * MB or int(
+            physical_memory * DEFAULT_MEMORY_FRACTION
+        )
+        self.cores = settings.WORKER_CPU_CORES or os.cpu_count() or 1
+        self.memory_reserved = 0
+        self.cores_allocated = 0
+        self._grants: Dict[str, JobCost] = {}
+        
+        MEMORY_BUDGET.set(self.memory_budget)
+        CORES_BUDGET.set(self.cores)
+    
+    def admit(self, job_id: str, cost: JobCost) -> Optional[int]:
+        """
+        Reserve a job's memory and return the cores granted to it, or None if
+        running jobs leave too little. A job with nothing else running is always
+        admitted, so one larger than the budgets still runs, alone.
+        """
+        free_cores = self.cores - self.cores_allocated
+        if self._grants and (self.memory_reserved + cost.memory > self.memory_budget or free_cores < 1):
+            ADMISSION_DEFERRED.inc()
+            logger.info("Job not admitted",
+                       job_id=job_id,
+                       memory_mb=cost.memory // MB,
+                       memory_free_mb=(self.memory_budget - self.memory_reserved) // MB,
+                       cores_free=free_cores)
+            return None
+        
+        cores = max(1, min(cost.cores, free_cores))
+        self._grants[job_id] = cost._replace(cores=cores)
+        self.memory_reserved += cost.memory
+        self.cores_allocated += cores
+        self._update_metrics()
+        
+        logger.info("Job admitted",
+                   job_id=job_id,
+                   memory_mb=cost.memory // MB,
+                   core_seconds=round(cost.core_seconds) if cost.core_seconds is not None else None,
+                   cores=cores)
+        return cores
+    
+    def release(self, job_id: str):
+        """Return a job's memory and cores; a no-op for jobs that were never admitted"""
+        grant = self._grants.pop(job_id, None)
+        if grant is None:
+            return
+        
+        self.memory_reserved -= grant.memory
+        self.cores_allocated -= grant.cores
+        self._update_metrics()
+    
+    def _update_metrics(self):
+        MEMORY_RESERVED.set(self.memory_reserved)
+        CORES_ALLOCATED.set(self.cores_allocated)
@@ -0,0 +1,233 @@
+"""
+Job execution on the worker's event loop or in long-lived child processes
+
+In process mode each job runs in a child process that loaded the eye gaze
+models once when it started, so frame processing never competes with the
+parent's event loop for the GIL. The parent keeps claiming, leases,
+webhooks and uploads; children only process videos and report how each
+job ended.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import structlog
+
+from api.core.config import settings
+from api.core.logging import setup_logging
+from api.services.job_service import JobService
+from shared.media.ffmpeg import FFmpegCancelled
+from shared.models.job import Job, JobSegment
+from shared.storage.scratch import SCRATCH_REFUSED, ScratchBudgetExceeded, ScratchManager, ScratchUsage
+from worker.processors.eye_gaze import EyeGazeCorrector, GazeCorrectionCancelled
+from worker.processors.video_processor import VideoProcessor
+
+logger = structlog.get_logger()
+
+OUTCOME_COMPLETED = "completed"
+OUTCOME_CANCELLED = "cancelled"
+OUTCOME_DEFERRED = "deferred"  # Back to the queue until scratch space frees up
+OUTCOME_FAILED = "failed"
+
+
+class JobOutcome(NamedTuple):
+    """How a job's processing ended; exceptions are flattened so results always unpickle"""
+    status: str
+    segments: Optional[List[JobSegment]] = None
+    error: Optional[str] = None
+    scratch_refused: bool = False  # Counted by the parent, whose metrics are the ones served
+
+
+async def watch_job(job_service: JobService, job_id: str, worker_id: str, cancel_event: asyncio.Event):
+    """Set cancel_event once the job is cancelled through the API or its lease is lost"""
+    while not cancel_event.is_set():
+        await asyncio.sleep(settings.CANCEL_POLL_INTERVAL_SECONDS)
+        
+        if not await job_service.holds_lease(job_id, worker_id):
+            logger.info("Job cancellation detected", job_id=job_id)
+            cancel_event.set()
+
+
+def time_limit(job: Job, now: Optional[datetime] = None) -> Tuple[float, str]:
+    """Seconds the job may still run and why: the per-job timeout or the job's deadline"""
+    limit = float(settings.JOB_TIMEOUT_SECONDS)
+    reason = f"Job timed out after {settings.JOB_TIMEOUT_SECONDS}s"
+    
+    if job.deadline_at is not None:
+        cutoff = job.deadline_at + timedelta(seconds=settings.JOB_DEADLINE_GRACE_SECONDS)
+        remaining = (cutoff - (now or datetime.utcnow())).total_seconds()
+        if remaining < limit:
+            limit = remaining
+            reason = f"Job missed its deadline of {job.deadline_at.isoformat()}"
+    
+    return limit, reason
+
+
+async def run_job(job: Job, processor: VideoProcessor, cancel_event: asyncio.Event) -> JobOutcome:
+    """
+    Process a claimed job's video, bounded by the per-job timeout and the job's
+    deadline. Running out of time cancels the pipeline like a cancellation
+    does: FFmpeg is killed, the gaze loop stops and scratch space is freed.
+    """
+    limit, reason = time_limit(job)
+    if limit <= 0:
+        return JobOutcome(OUTCOME_FAILED, error=reason)
+    
+    try:
+        segments = await asyncio.wait_for(processor.process_video(job), timeout=limit)
+    except (FFmpegCancelled, GazeCorrectionCancelled):
+        return JobOutcome(OUTCOME_CANCELLED)
+    except ScratchBudgetExceeded as e:
+        # A job larger than the whole budget would wait forever
+        if processor.scratch_manager.fits(e.requested):
+            return JobOutcome(OUTCOME_DEFERRED, error=str(e), scratch_refused=True)
+        return JobOutcome(OUTCOME_FAILED, error=str(e), scratch_refused=True)
+    except asyncio.TimeoutError:
+        return JobOutcome(OUTCOME_FAILED, error=reason)
+    except Exception as e:
+        if cancel_event.is_set():
+            return JobOutcome(OUTCOME_CANCELLED, error=str(e))
+        return JobOutcome(OUTCOME_FAILED, error=str(e))
+    
+    if cancel_event.is_set():
+        return JobOutcome(OUTCOME_CANCELLED)
+    return JobOutcome(OUTCOME_COMPLETED, segments=segments)
+
+
+class JobPoolBroken(Exception):
+    """A job process died, and the pool terminated every other job process with it"""
+    
+    def __init__(self, job_ids: List[str]):
+        super().__init__(f"Job pool broke with {len(job_ids)} jobs running")
+        self.job_ids = job_ids
+
+
+class JobPool:
+    """Child processes that run jobs; replaced as a whole when one of them dies"""
+    
+    def __init__(self, size: int, scratch_manager: Optional[ScratchManager] = None):
+        self.size = size
+        self.scratch_manager = scratch_manager  # Exports the children's scratch metrics
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._started: Optional[asyncio.Future] = None
+        self._running: Dict[str, ProcessPoolExecutor] = {}
+    
+    async def run(self, job_id: str, worker_id: str, cores: Optional[int] = None) -> JobOutcome:
+        """
+        Run a claimed job in a child process on the cores admission granted it.
+        When a child dies the pool terminates all of them. The first job to
+        notice raises JobPoolBroken naming every job the pool was running, once
+        its processes have exited; the others raise BrokenProcessPool. The next
+        job gets a fresh pool.
+        """
+        executor = self._get_executor()
+        started = self._started
+        self._running[job_id] = executor
+        loop = asyncio.get_event_loop()
+        try:
+            await started
+            outcome = await loop.run_in_executor(executor, _run_in_child, job_id, worker_id, cores)
+            if outcome.scratch_refused:
+                SCRATCH_REFUSED.inc()
+            return outcome
+        except BrokenProcessPool:
+            if self._executor is not executor:
+                raise  # Another job is failing the pool over
+            
+            self._executor = None
+            lost = [j for j, e in self._running.items() if e is executor]
+            
+            # Joins the children; their FFmpeg processes are killed as each one exits
+            await loop.run_in_executor(
+                None, functools.partial(executor.shutdown, wait=True, cancel_futures=True)
+            )
+            raise JobPoolBroken(lost)
+        finally:
+            if self._running.get(job_id) is executor:
+                del self._running[job_id]
+    
+    def shutdown(self):
+        """Stop the child processes once their current jobs are done"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """The live pool, started on first use; jobs wait for self._started before running"""
+        if self._executor is None:
+            # Spawned rather than forked: the parent has running threads and an event loop
+            context = multiprocessing.get_context("spawn")
+            
+            # Fresh slots for each pool, so reservations of a broken pool's dead children stop counting
+            usage = ScratchUsage(self.size, context)
+            if self.scratch_manager is not None:
+                self.scratch_manager.children = usage
+            
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=context,
+                initializer=_init_child,
+                initargs=(self.size, usage)
+            )
+            
+            # Spawn every child before any job runs. The pool starts children on demand, and
+            # one started while its manager thread is already waiting is not watched, so its
+            # death would go unnoticed until another child's job finished.
+            loop = asyncio.get_event_loop()
+            self._started = asyncio.gather(*[
+                loop.run_in_executor(self._executor, os.getpid) for _ in range(self.size)
+            ])
+        return self._executor
+
+
+# State of a job process, set up once by _init_child
+_child_loop: Optional[asyncio.AbstractEventLoop] = None
+_child_scratch: Optional[ScratchManager] = None
+_child_corrector: Optional[EyeGazeCorrector] = None
+
+
+def _init_child(pool_size: int, scratch_usage: ScratchUsage):
+    """Load models and open the event loop a job process keeps for its lifetime"""
+    global _child_loop, _child_scratch, _child_corrector
+    setup_logging()
+    
+    # One loop for every job, so the database connection stays bound to it
+    _child_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_child_loop)
+    _child_scratch = ScratchManager(share=pool_size, usage=scratch_usage)
+    _child_corrector = EyeGazeCorrector() if settings.EYE_GAZE_ENABLED else None
+    
+    logger.info("Job process ready", pid=os.getpid())
+
+
+def _run_in_child(job_id: str, worker_id: str, cores: Optional[int]) -> JobOutcome:
+    """Executor entry point in the child process"""
+    return _child_loop.run_until_complete(_process_in_child(job_id, worker_id, cores))
+
+
+async def _process_in_child(job_id: str, worker_id: str, cores: Optional[int]) -> JobOutcome:
+    """Process one job with the child's warm models, watching its lease from here"""
+    job_service = JobService()
+    cancel_event = asyncio.Event()
+    watcher = asyncio.create_task(watch_job(job_service, job_id, worker_id, cancel_event))
+    
+    try:
+        job = await job_service.get_job(job_id)
+        if not job:
+            return JobOutcome(OUTCOME_FAILED, error="Job not found")
+        
+        # The child runs one job at a time, so OpenCV's process-wide pool can follow the grant
+        if _child_corrector is not None and cores:
+            _child_corrector.limit_threads(cores)
+        
+        processor = VideoProcessor(
+            _child_scratch, cancel_event=cancel_event, eye_gaze_corrector=_child_corrector, cores=cores
+        )
+        return await run_job(job, processor, cancel_event)
+    finally:
+        watcher.cancel()
@@ -3,18 +3,30 @@ Background worker for video processing
 Polls SQLite queue and processes videos asynchronously
 """
 import asyncio
+import functools
 import os
 import signal
+import socket
 import sys
+import uuid
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from typing import Dict, Optional, Set
 
 import structlog
+from prometheus_client import start_http_server
 
 from api.core.config import settings
 from api.core.logging import setup_logging
+from api.core.wakeup import WakeupListener, notify_job_queued
 from shared.database.connection import init_db
 from shared.models.job import JobStatus
+from shared.storage.scratch import ScratchManager
 from api.services.job_service import JobService
+from worker.admission import AdmissionController, estimate_job_cost
+from worker.execution import (
+    OUTCOME_CANCELLED, OUTCOME_COMPLETED, OUTCOME_DEFERRED, JobPool, JobPoolBroken, run_job, watch_job
+)
 from worker.processors.video_processor import VideoProcessor
 from worker.tasks.webhook import WebhookNotifier
 from worker.schedulers.upload_scheduler import UploadScheduler
@@ -26,104 +38,264 @@ logger = structlog.get_logger()
 # Global flag for graceful shutdown
 shutdown_event = asyncio.Event()
 
+# Owner of this process's job leases, unique across hosts and restarts
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
 
-async def process_job(job_id: str):
-    """Process a single job"""
+
+async def renew_lease(job_service: JobService, job_id: str, cancel_event: asyncio.Event):
+    """Heartbeat the job's lease while it runs; stop the job if the lease was lost"""
+    while not cancel_event.is_set():
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        
+        try:
+            renewed = await job_service.renew_lease(job_id, WORKER_ID)
+        except Exception as e:
+            # Retried on the next beat; the lease outlasts a couple of misses
+            logger.error("Lease renewal failed", job_id=job_id, error=str(e))
+            continue
+        
+        if not renewed:
+            # Reaped after a stall, or cancelled: someone else may own the job now
+            logger.warning("Job lease lost", job_id=job_id)
+            cancel_event.set()
+
+
+async def reap_once(job_service: JobService):
+    """Requeue jobs whose worker died without finishing them"""
+    requeued, failed = await job_service.reap_expired_leases(settings.JOB_MAX_ATTEMPTS)
+    if requeued:
+        logger.warning("Requeued jobs with expired leases", job_ids=requeued)
+        notify_job_queued()
+    if failed:
+        logger.error("Failed jobs that exhausted their attempts", job_ids=failed)
+
+
+async def reap_expired_leases(job_service: JobService):
+    """Reap expired leases once per lease period"""
+    while True:
+        try:
+            await reap_once(job_service)
+        except Exception as e:
+            logger.error("Lease reaper error", error=str(e))
+        
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS)
+
+
+async def process_job(job_id: str, scratch_manager: ScratchManager, admission: AdmissionController,
+                      job_pool: Optional[JobPool] = None) -> bool:
+    """Process a job this worker has claimed; False if it went back to the queue to wait for resources"""
     job_service = JobService()
-    video_processor = VideoProcessor()
+    cancel_event = asyncio.Event()
     webhook_notifier = WebhookNotifier()
     
+    heartbeat = asyncio.create_task(renew_lease(job_service, job_id, cancel_event))
+    cancel_watcher = None
+    
     try:
-        # Update job status to processing
-        await job_service.update_job_status(job_id, JobStatus.PROCESSING)
-        logger.info("Processing job started", job_id=job_id)
+        logger.info("Processing job started", job_id=job_id, worker_id=WORKER_ID)
         
         # Get job details
         job = await job_service.get_job(job_id)
         if not job:
             logger.error("Job not found", job_id=job_id)
-            return
+            return True
         
-        # Process video
-        segments = await video_processor.process_video(job)
+        # Started only if running jobs leave the memory and cores it is estimated to need
+        backlog = await job_service.count_jobs(JobStatus.PENDING)
+        cores = admission.admit(job_id, estimate_job_cost(job, backlog, admission.cores))
+        if cores is None:
+            await job_service.release_job(job_id)
+            return False
+        
+        if job_pool is not None:
+            # The child watches for cancellation itself
+            outcome = await job_pool.run(job_id, WORKER_ID, cores)
+        else:
+            cancel_watcher = asyncio.create_task(
+                watch_job(job_service, job_id, WORKER_ID, cancel_event)
+            )
+            video_processor = VideoProcessor(scratch_manager, cancel_event=cancel_event, cores=cores)
+            outcome = await run_job(job, video_processor, cancel_event)
+    
+    except JobPoolBroken as e:
+        # Every job the pool was running is lost with it; their leases expire now, so the
+        # reaper requeues each one or fails it once it has used its attempts
+        logger.error("Job process died", job_id=job_id, lost_jobs=e.job_ids)
+        for lost_job_id in e.job_ids:
+            scratch_manager.discard(lost_job_id)
+            await job_service.withdraw_uploads(lost_job_id)
+            await job_service.expire_lease(lost_job_id, WORKER_ID)
+        await reap_once(job_service)
+        return True
+    
+    except BrokenProcessPool:
+        # Failed over by the job that found the pool broken
+        return True
+    
+    finally:
+        admission.release(job_id)
+        heartbeat.cancel()
+        if cancel_watcher is not None:
+            cancel_watcher.cancel()
+    
+    if outcome.status == OUTCOME_COMPLETED:
+        segments = outcome.segments
         
         # Update job with segments
-        await job_service.update_job_status(
+        if not await job_service.update_job_status(
             job_id,
             JobStatus.COMPLETED,
             progress=100,
             total_segments=len(segments)
-        )
+        ):
+            logger.info("Job cancelled as it completed", job_id=job_id)
+            return True
         
         logger.info("Job processing completed", job_id=job_id, segments=len(segments))
         
         # Send webhook notification if configured
         if job.webhook_url:
             await webhook_notifier.send_completion_webhook(job, segments)
-        
-    except Exception as e:
-        logger.error("Job processing failed", job_id=job_id, error=str(e))
-        await job_service.update_job_status(
+    
+    elif outcome.status == OUTCOME_CANCELLED:
+        # Cancelled through the API or the lease was lost; the status is no longer ours to set
+        logger.info("Job processing cancelled", job_id=job_id, error=outcome.error)
+    
+    elif outcome.status == OUTCOME_DEFERRED:
+        # Space frees up as running jobs finish; a later poll picks the job up again
+        logger.info("Job deferred until scratch space frees up", job_id=job_id, error=outcome.error)
+        await job_service.release_job(job_id)
+        return False
+    
+    else:
+        logger.error("Job processing failed", job_id=job_id, error=outcome.error)
+        if not await job_service.update_job_status(
             job_id,
             JobStatus.FAILED,
-            error=str(e)
-        )
+            error=outcome.error
+        ):
+            return True
         
         # Send failure webhook if configured
         try:
-            job = await job_service.get_job(job_id)
-            if job and job.webhook_url:
-                await webhook_notifier.send_failure_webhook(job, str(e))
+            if job.webhook_url:
+                await webhook_notifier.send_failure_webhook(job, outcome.error)
         except:
             pass
+    
+    return True
+
+
+class HeldBack:
+    """
+    Jobs that went back to the queue to wait for scratch space, memory or cores.
+    Claims skip them until a finished job frees some, nothing is running, or a
+    poll interval passes without a claim.
+    """
+    
+    def __init__(self):
+        self.job_ids: Set[str] = set()
+    
+    def job_finished(self, job_id: str, deferred: bool):
+        """Hold a deferred job back; any other finished job frees resources, so retry them all"""
+        if deferred:
+            self.job_ids.add(job_id)
+        else:
+            self.job_ids.clear()
+    
+    def clear(self):
+        """Let every held back job be claimed again"""
+        self.job_ids.clear()
 
 
 async def worker_loop():
     """Main worker loop"""
     job_service = JobService()
     upload_scheduler = UploadScheduler()
+    scratch_manager = ScratchManager()
+    admission = AdmissionController()
+    
+    # In process mode jobs run in warm child processes; otherwise on this loop
+    job_pool = None
+    if settings.WORKER_EXECUTION_MODE == "process":
+        job_pool = JobPool(max(1, settings.WORKER_CONCURRENCY), scratch_manager)
+    
+    # Nothing is running yet, so any scratch left over is from a crashed worker
+    scratch_manager.sweep()
+    
+    # New jobs wake the loop at once; the poll interval only bounds how long a missed signal delays them
+    wakeup = WakeupListener()
+    wakeup.start()
     
     logger.info("Worker started", 
                 poll_interval=settings.QUEUE_POLL_INTERVAL_SECONDS,
-                concurrency=settings.WORKER_CONCURRENCY)
+                concurrency=settings.WORKER_CONCURRENCY,
+                memory_budget_mb=admission.memory_budget // (1024 * 1024),
+                cores=admission.cores,
+                execution_mode=settings.WORKER_EXECUTION_MODE)
     
     # Start upload scheduler
     scheduler_task = asyncio.create_task(upload_scheduler.start())
+    reaper_task = asyncio.create_task(reap_expired_leases(job_service))
+    
+    # A job starts as soon as any slot is free instead of waiting for a whole batch
+    slots = asyncio.Semaphore(max(1, settings.WORKER_CONCURRENCY))
+    running: Dict[str, asyncio.Task] = {}
+    
+    held_back = HeldBack()
+    
+    def job_done(job_id: str, task: asyncio.Task):
+        running.pop(job_id, None)
+        slots.release()
+        
+        deferred = not task.cancelled() and task.exception() is None and task.result() is False
+        held_back.job_finished(job_id, deferred)
+        
+        # Look at the queue again now that a slot is free
+        wakeup.event.set()
     
     try:
         while not shutdown_event.is_set():
+            await slots.acquire()
+            if shutdown_event.is_set():
+                slots.release()
+                break
+            
             try:
-                # Get pending jobs
-                pending_jobs = await job_service.get_pending_jobs(
-                    limit=settings.WORKER_CONCURRENCY
-                )
-                
-                if pending_jobs:
-                    logger.info("Found pending jobs", count=len(pending_jobs))
-                    
-                    # Process jobs concurrently
-                    tasks = [
-                        asyncio.create_task(process_job(job.id))
-                        for job in pending_jobs
-                    ]
-                    
-                    # Wait for all jobs to complete with timeout
-                    await asyncio.wait_for(
-                        asyncio.gather(*tasks, return_exceptions=True),
-                        timeout=settings.JOB_TIMEOUT_SECONDS
-                    )
-                
-                # Wait before next poll
-                await asyncio.sleep(settings.QUEUE_POLL_INTERVAL_SECONDS)
-                
-            except asyncio.TimeoutError:
-                logger.error("Job processing timeout exceeded")
+                if not running:
+                    held_back.clear()
+                # Claimed atomically, so other worker processes never get the same job
+                job_id = await job_service.claim_next_job(WORKER_ID, exclude=held_back.job_ids)
             except Exception as e:
+                slots.release()
                 logger.error("Worker loop error", error=str(e))
                 await asyncio.sleep(5)  # Brief pause on error
+                continue
+            
+            if job_id is None:
+                slots.release()
                 
+                # Wait for a new job or a free slot, or poll again after the interval
+                if not await wakeup.wait(settings.QUEUE_POLL_INTERVAL_SECONDS):
+                    held_back.clear()
+                continue
+            
+            task = asyncio.create_task(process_job(job_id, scratch_manager, admission, job_pool))
+            running[job_id] = task
+            task.add_done_callback(functools.partial(job_done, job_id))
+            logger.info("Job dispatched", job_id=job_id, running=len(running))
+    
     finally:
+        # Let running jobs finish; each is bounded by its own timeout
+        if running:
+            logger.info("Waiting for running jobs", count=len(running))
+            await asyncio.gather(*running.values(), return_exceptions=True)
+        
         # Cleanup
+        if job_pool is not None:
+            job_pool.shutdown()
+        wakeup.stop()
+        reaper_task.cancel()
         scheduler_task.cancel()
         try:
             await scheduler_task
@@ -149,6 +321,10 @@ async def main():
     await init_db()
     logger.info("Database initialized")
     
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT)
+        logger.info("Metrics endpoint started", port=settings.WORKER_METRICS_PORT)
+    
     # Run worker loop
     await worker_loop()
 
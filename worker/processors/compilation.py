@@ -0,0 +1,199 @@
+"""
+Compilation of existing segments into a new input video
+
+Pieces whose streams already match are joined with the concat demuxer by
+stream copy; only the streams of mismatched pieces are re-encoded. The MP4
+output keeps a single set of H.264 parameter sets, so pieces whose SPS/PPS
+differ count as mismatched too.
+"""
+import asyncio
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+import structlog
+
+from shared.media.ffmpeg import FFmpegSupervisor
+from shared.media.probe import probe_media
+from shared.models.job import JobSegment, MediaInfo
+from worker.processors.encode_policy import x264_profile
+
+logger = structlog.get_logger()
+
+
+class VideoSignature(NamedTuple):
+    """Video stream properties that must be identical for concat stream copy"""
+    codec: Optional[str]
+    profile: Optional[str]
+    pix_fmt: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    fps: Optional[float]
+    extradata: Optional[str]  # Decoder configuration digest; differing SPS/PPS cannot share one header
+
+
+class AudioSignature(NamedTuple):
+    """Audio stream properties that must be identical for concat stream copy"""
+    codec: Optional[str]
+    sample_rate: Optional[int]
+    channels: Optional[int]
+
+
+class CompilationBuilder:
+    """Join segments, in order, into one MP4"""
+    
+    def __init__(self, ffmpeg: FFmpegSupervisor):
+        self.ffmpeg = ffmpeg
+    
+    async def build(self, segments: List[JobSegment], output_path: str,
+                    x264_args: List[str], threads: int):
+        """Write the compilation of `segments` to output_path"""
+        infos = await asyncio.gather(*(probe_media(s.file_path) for s in segments))
+        
+        # Conform to the most common format so the fewest pieces are re-encoded
+        video_target = Counter(self._video_signature(i) for i in infos).most_common(1)[0][0]
+        audio_target = Counter(self._audio_signature(i) for i in infos).most_common(1)[0][0]
+        
+        output = Path(output_path)
+        work_dir = output.with_name(f"{output.stem}_parts")
+        work_dir.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            pieces: List[Path] = []
+            reencoded = set()
+            for number, (segment, info) in enumerate(zip(segments, infos), start=1):
+                video_ok = self._video_signature(info) == video_target
+                audio_ok = self._audio_signature(info) == audio_target
+                if video_ok and audio_ok:
+                    pieces.append(Path(segment.file_path))
+                    continue
+                
+                piece = work_dir / f"part_{number:03d}.mp4"
+                await self._conform(
+                    segment.file_path, info, piece, video_ok, audio_ok,
+                    video_target, audio_target, x264_args, threads
+                )
+                pieces.append(piece)
+                if not video_ok:
+                    reencoded.add(number)
+            
+            if reencoded and len(reencoded) < len(segments):
+                # The encoder's parameter sets rarely match those of the copied pieces;
+                # if they differ, re-encode every piece so all share the encoder's
+                conformed = await asyncio.gather(*(probe_media(str(pieces[n - 1])) for n in reencoded))
+                if {i.video_extradata_hash for i in conformed} != {video_target.extradata}:
+                    for number, (segment, info) in enumerate(zip(segments, infos), start=1):
+                        if number in reencoded:
+                            continue
+                        piece = work_dir / f"part_{number:03d}.mp4"
+                        await self._conform(
+                            segment.file_path, info, piece, False,
+                            self._audio_signature(info) == audio_target,
+                            video_target, audio_target, x264_args, threads
+                        )
+                        pieces[number - 1] = piece
+            
+            logger.info("Building compilation",
+                       output=output_path,
+                       pieces=len(pieces),
+                       conformed=sum(1 for p in pieces if p.parent == work_dir))
+            
+            concat_list = work_dir / "pieces.txt"
+            concat_list.write_text("".join(
+                "file '{}'\n".format(str(p.resolve()).replace("'", "'\\''")) for p in pieces
+            ))
+            
+            await self.ffmpeg.run([
+                "ffmpeg",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", str(concat_list),
+                "-map", "0",
+                "-c", "copy",
+                "-movflags", "+faststart",
+                "-y", output_path
+            ])
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    async def _conform(self, source: str, info: MediaInfo, output: Path,
+                       video_ok: bool, audio_ok: bool,
+                       video_target: VideoSignature, audio_target: AudioSignature,
+                       x264_args: List[str], threads: int):
+        """Re-encode only the streams of one piece that differ from the target format"""
+        cmd = ["ffmpeg", "-i", source]
+        
+        # A piece without audio gets silence so every piece has the same streams
+        silent = audio_target.codec is not None and info.audio_codec is None
+        if silent:
+            layout = "mono" if audio_target.channels == 1 else "stereo"
+            cmd.extend([
+                "-f", "lavfi",
+                "-i", f"anullsrc=r={audio_target.sample_rate or 48000}:cl={layout}",
+            ])
+        
+        cmd.extend(["-map", "0:v:0"])
+        if video_ok:
+            cmd.extend(["-c:v", "copy"])
+        else:
+            filters = []
+            width, height = video_target.width, video_target.height
+            if width and height:
+                # Letterbox into the target frame rather than distorting
+                filters.extend([
+                    f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+                    "setsar=1",
+                ])
+            if video_target.fps:
+                filters.append(f"fps={video_target.fps:.3f}")
+            
+            if filters:
+                cmd.extend(["-vf", ",".join(filters)])
+            cmd.extend([
+                "-c:v", "libx264",
+                *x264_args,
+                "-pix_fmt", video_target.pix_fmt or "yuv420p",
+                "-threads", str(threads),
+            ])
+            if video_target.profile:
+                cmd.extend(["-profile:v", video_target.profile])
+        
+        if audio_target.codec is None:
+            cmd.append("-an")
+        else:
+            cmd.extend(["-map", "1:a:0" if silent else "0:a:0"])
+            if audio_ok:
+                cmd.extend(["-c:a", "copy"])
+            else:
+                cmd.extend([
+                    "-c:a", "aac",
+                    "-ar", str(audio_target.sample_rate or 48000),
+                    "-ac", str(audio_target.channels or 2),
+                ])
+            if silent:
+                cmd.append("-shortest")
+        
+        cmd.extend(["-movflags", "+faststart", "-y", str(output)])
+        await self.ffmpeg.run(cmd)
+    
+    def _video_signature(self, info: MediaInfo) -> VideoSignature:
+        """Comparable video format of a piece"""
+        return VideoSignature(
+            codec=info.video_codec,
+            profile=x264_profile(info.video_profile),
+            pix_fmt=info.pix_fmt,
+            width=info.width,
+            height=info.height,
+            fps=round(info.fps, 2) if info.fps else None,
+            extradata=info.video_extradata_hash
+        )
+    
+    def _audio_signature(self, info: MediaInfo) -> AudioSignature:
+        """Comparable audio format of a piece"""
+        return AudioSignature(
+            codec=info.audio_codec,
+            sample_rate=info.audio_sample_rate,
+            channels=info.audio_channels
+        )
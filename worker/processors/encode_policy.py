@@ -0,0 +1,101 @@
+"""
+Backlog- and deadline-driven libx264 encode policy
+
+An idle worker spends CPU on a slower preset, which compresses the same
+quality into a smaller file; a deep queue or a close deadline trades file
+size and then quality for encode speed.
+"""
+import os
+from datetime import datetime
+from typing import Optional
+
+from api.core.config import settings
+from shared.models.job import EncodePolicy, MediaInfo
+
+# libx264 presets from best compression to fastest:
+# (preset, CRF, rough 1080p encode speed per core in multiples of realtime).
+# Steps up to veryfast keep the default CRF 23, so a slower preset only ever
+# shrinks the output; a lower CRF would buy quality with a bigger file.
+PRESET_LADDER = [
+    ("slow", 23, 0.10),
+    ("medium", 23, 0.20),
+    ("fast", 23, 0.25),
+    ("faster", 23, 0.30),
+    ("veryfast", 23, 0.50),
+    ("superfast", 24, 0.90),
+    ("ultrafast", 25, 1.50),
+]
+
+# Pending jobs per worker at which each ladder step starts
+BACKLOG_THRESHOLDS = [0, 2, 5, 10, 25, 50, 100]
+
+# Share of the time left before a deadline the encodes may take up
+DEADLINE_HEADROOM = 0.5
+
+REFERENCE_PIXELS = 1920 * 1080
+
+
+def select_encode_policy(
+    backlog: int,
+    media_info: MediaInfo,
+    encode_passes: int,
+    deadline_at: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+    cores: Optional[int] = None
+) -> EncodePolicy:
+    """
+    Pick the preset and CRF for a job. The backlog sets the starting step of the
+    ladder; a deadline the estimated encode time would miss on the job's cores
+    moves it further towards the fast end.
+    """
+    step = backlog_step(backlog)
+    cores = cores or os.cpu_count() or 1
+    
+    deadline_seconds = None
+    if deadline_at is not None:
+        deadline_seconds = (deadline_at - (now or datetime.utcnow())).total_seconds()
+        budget = deadline_seconds * DEADLINE_HEADROOM
+        
+        while step < len(PRESET_LADDER) - 1:
+            if encode_core_seconds(media_info, encode_passes, step) / cores <= budget:
+                break
+            step += 1
+    
+    preset, crf, _ = PRESET_LADDER[step]
+    return EncodePolicy(
+        preset=preset,
+        crf=crf,
+        backlog=backlog,
+        deadline_seconds=deadline_seconds,
+        estimated_encode_seconds=encode_core_seconds(media_info, encode_passes, step) / cores
+    )
+
+
+def backlog_step(backlog: int) -> int:
+    """Ladder step a backlog of pending jobs starts at"""
+    per_worker = backlog / max(1, settings.WORKER_CONCURRENCY)
+    return max(i for i, threshold in enumerate(BACKLOG_THRESHOLDS) if per_worker >= threshold)
+
+
+def encode_core_seconds(media_info: MediaInfo, encode_passes: int, step: int) -> float:
+    """CPU time for encoding the whole input encode_passes times at a ladder step"""
+    _, _, speed = PRESET_LADDER[step]
+    
+    pixels = REFERENCE_PIXELS
+    if media_info.width and media_info.height:
+        pixels = media_info.width * media_info.height
+    
+    return media_info.duration * encode_passes * (pixels / REFERENCE_PIXELS) / speed
+
+
+def x264_profile(profile: Optional[str]) -> Optional[str]:
+    """Map an ffprobe H.264 profile name to the matching libx264 profile"""
+    if not profile:
+        return None
+    
+    profile = profile.lower()
+    if "baseline" in profile:
+        return "baseline"
+    if profile in ("main", "high"):
+        return profile
+    return None
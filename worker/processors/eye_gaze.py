@@ -5,13 +5,20 @@ import cv2
 import numpy as np
 import mediapipe as mp
 import asyncio
+import threading
 from typing import Tuple, Optional
 
 import structlog
 
+from shared.models.job import MediaInfo
+
 logger = structlog.get_logger()
 
 
+class GazeCorrectionCancelled(Exception):
+    """The frame loop stopped early because its job was cancelled"""
+
+
 class EyeGazeCorrector:
     """Eye gaze correction using MediaPipe Face Mesh"""
     
@@ -30,20 +37,52 @@ class EyeGazeCorrector:
         self.RIGHT_EYE_INDICES = [362, 263, 387, 388, 389, 390, 391, 393, 373, 374, 380, 381, 382]
         self.IRIS_INDICES = [468, 469, 470, 471, 472]  # If refine_landmarks is True
     
-    async def process_video(self, input_path: str, output_path: str, intensity: float = 0.7):
-        """Process video with eye gaze correction"""
+    def limit_threads(self, threads: int):
+        """Cap OpenCV's thread pool; the setting is process-wide, so only for a process running one job"""
+        cv2.setNumThreads(max(1, threads))
+    
+    async def process_video(self, input_path: str, output_path: str, intensity: float = 0.7,
+                            media_info: Optional[MediaInfo] = None,
+                            cancel_event: Optional[asyncio.Event] = None):
+        """Process video with eye gaze correction, stopping within a frame of cancellation"""
+        # A worker thread cannot be interrupted, so the frame loop checks this flag instead
+        stop = threading.Event()
+        
         # Run processing in thread pool to avoid blocking
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self._process_video_sync, input_path, output_path, intensity)
+        work = loop.run_in_executor(
+            None, self._process_video_sync, input_path, output_path, intensity, media_info, stop
+        )
+        cancelled = asyncio.ensure_future(cancel_event.wait()) if cancel_event is not None else None
+        
+        try:
+            if cancelled is not None:
+                await asyncio.wait({work, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+                if not work.done():
+                    stop.set()
+            await work
+        except asyncio.CancelledError:
+            # The job timed out or its task was cancelled; don't leave the thread decoding
+            stop.set()
+            raise
+        finally:
+            if cancelled is not None:
+                cancelled.cancel()
     
-    def _process_video_sync(self, input_path: str, output_path: str, intensity: float):
+    def _process_video_sync(self, input_path: str, output_path: str, intensity: float,
+                            media_info: Optional[MediaInfo] = None,
+                            stop: Optional[threading.Event] = None):
         """Synchronous video processing"""
         cap = cv2.VideoCapture(input_path)
         
-        # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Get video properties, preferring the probed record over OpenCV's estimates
+        if media_info and media_info.fps and media_info.display_size:
+            fps = media_info.fps
+            width, height = media_info.display_size
+        else:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         # Create video writer
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
@@ -53,6 +92,9 @@ class EyeGazeCorrector:
         
         try:
             while cap.isOpened():
+                if stop is not None and stop.is_set():
+                    raise GazeCorrectionCancelled(f"Eye gaze correction cancelled after {frame_count} frames")
+                
                 ret, frame = cap.read()
                 if not ret:
                     break
@@ -68,7 +110,7 @@ class EyeGazeCorrector:
                     logger.debug("Processing frame", frame=frame_count)
             
             logger.info("Eye gaze correction completed", frames=frame_count)
-            
+        
         finally:
             cap.release()
             out.release()
@@ -0,0 +1,92 @@
+"""
+Ingest normalization
+
+Brings every upload to H.264/AAC in MP4 at a constant frame rate before
+any other stage reads it, doing as little work as the probe allows:
+nothing, a remux, or a transcode of only the streams that need it.
+"""
+from pathlib import Path
+from typing import List, Optional
+
+import structlog
+
+from shared.media.ffmpeg import FFmpegSupervisor
+from shared.models.job import MediaInfo
+
+logger = structlog.get_logger()
+
+# Containers FFmpeg's mov/mp4 demuxer reads; these need no remux
+MP4_FORMATS = {"mov", "mp4", "m4a", "3gp", "3g2", "mj2"}
+
+# Bitrate for audio transcoded to AAC (e.g. Opus from browser recordings)
+NORMALIZED_AUDIO_BITRATE = "192k"
+
+# Frame rate for input whose average rate is unknown
+DEFAULT_FPS = 30.0
+
+
+class IngestNormalizer:
+    """Normalize uploaded videos into a clean, seekable MP4"""
+    
+    def __init__(self, ffmpeg: FFmpegSupervisor):
+        self.ffmpeg = ffmpeg
+    
+    def needs_normalization(self, media_info: MediaInfo) -> bool:
+        """Whether any stream or the container has to change"""
+        return not (
+            self._container_ok(media_info)
+            and self._video_ok(media_info)
+            and self._audio_ok(media_info)
+        )
+    
+    async def normalize(self, video_path: str, media_info: MediaInfo, output_path: Path,
+                        x264_args: List[str], threads: int) -> Optional[str]:
+        """
+        Write a normalized copy of the video to output_path and return its path,
+        or None when the input is already usable as is
+        """
+        if not self.needs_normalization(media_info):
+            return None
+        
+        cmd = ["ffmpeg", "-i", video_path, "-map", "0:v:0", "-map", "0:a:0?"]
+        
+        if self._video_ok(media_info):
+            cmd.extend(["-c:v", "copy"])
+        else:
+            cmd.extend(["-c:v", "libx264", *x264_args, "-pix_fmt", "yuv420p", "-threads", str(threads)])
+            # Resample once to a constant rate so frame counts and seeks line up; browser
+            # recordings often carry no frame rate at all and are VFR in practice
+            if media_info.variable_frame_rate or not media_info.fps:
+                cmd.extend(["-vsync", "cfr", "-r", f"{media_info.fps or DEFAULT_FPS:.3f}"])
+        
+        if self._audio_ok(media_info):
+            cmd.extend(["-c:a", "copy"])
+        else:
+            cmd.extend(["-c:a", "aac", "-b:a", NORMALIZED_AUDIO_BITRATE])
+        
+        cmd.extend(["-movflags", "+faststart", "-y", str(output_path)])
+        
+        logger.info("Normalizing input",
+                   path=video_path,
+                   format_name=media_info.format_name,
+                   video_codec=media_info.video_codec,
+                   audio_codec=media_info.audio_codec,
+                   variable_frame_rate=media_info.variable_frame_rate,
+                   transcode_video=not self._video_ok(media_info),
+                   transcode_audio=not self._audio_ok(media_info))
+        
+        await self.ffmpeg.run(cmd)
+        return str(output_path)
+    
+    def _container_ok(self, media_info: MediaInfo) -> bool:
+        """MP4/MOV input; anything else is at least remuxed"""
+        formats = set((media_info.format_name or "").split(","))
+        return bool(formats & MP4_FORMATS)
+    
+    def _video_ok(self, media_info: MediaInfo) -> bool:
+        """Constant frame rate H.264 can be copied"""
+        return media_info.video_codec == "h264" and not media_info.variable_frame_rate
+    
+    def _audio_ok(self, media_info: MediaInfo) -> bool:
+        """AAC (or no audio) can be copied"""
+        return media_info.audio_codec in (None, "aac")
@@ -0,0 +1,156 @@
+"""
+Sampled-frame quality check
+
+Each output file is compared against the source on a few frames taken at
+source keyframes, so every sample needs at most one GOP of decoding per
+side. SSIM and PSNR are computed on downscaled luma with vectorized NumPy.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from api.core.config import settings
+from shared.media.ffmpeg import FFmpegError, FFmpegSupervisor
+from shared.models.job import JobSegment, MediaInfo, QualityReport, SegmentQuality
+
+logger = structlog.get_logger()
+
+# SSIM window size and stabilising constants for 8-bit luma
+SSIM_WINDOW = 8
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+# Samples stay this far inside a segment, away from its cut points
+SAMPLE_EDGE_SECONDS = 0.5
+
+# PSNR reported for identical frames, keeping the report valid JSON
+PSNR_MAX = 100.0
+
+
+class QualityChecker:
+    """Compare sampled output frames against the source video"""
+    
+    def __init__(self, ffmpeg: FFmpegSupervisor):
+        self.ffmpeg = ffmpeg
+    
+    async def check_segment(self, source_path: str, source_info: MediaInfo,
+                            segment: JobSegment) -> SegmentQuality:
+        """Score one output file (segment or rendition) against the source"""
+        result = SegmentQuality(segment_number=segment.segment_number, platform=segment.platform)
+        size = self._frame_size(source_info)
+        start = segment.start_time or 0.0
+        
+        pairs = []
+        for timestamp in self._sample_times(segment, source_info.keyframes):
+            pair = await self._decode_pair(
+                source_path, timestamp, segment.file_path, timestamp - start, size
+            )
+            if pair is not None:
+                pairs.append(pair)
+        
+        if not pairs:
+            return result
+        
+        frames = np.stack(pairs).astype(np.float64)  # (samples, 2, height, width)
+        reference, output = frames[:, 0], frames[:, 1]
+        
+        result.samples = len(pairs)
+        result.ssim = float(np.mean(ssim(reference, output)))
+        result.psnr = float(np.min(psnr(reference, output)))
+        result.flagged = result.ssim < settings.QC_MIN_SSIM or result.psnr < settings.QC_MIN_PSNR
+        return result
+    
+    def summarize(self, results: List[SegmentQuality]) -> QualityReport:
+        """Roll per-file results up into the job's report"""
+        scored = [r for r in results if r.samples]
+        flagged = sorted({r.segment_number for r in scored if r.flagged})
+        
+        return QualityReport(
+            passed=not flagged,
+            min_ssim=min((r.ssim for r in scored), default=None),
+            min_psnr=min((r.psnr for r in scored), default=None),
+            flagged_segments=flagged,
+            segments=sorted(results, key=lambda r: (r.segment_number, r.platform or ""))
+        )
+    
+    def _sample_times(self, segment: JobSegment, keyframes: List[float]) -> List[float]:
+        """Evenly spread source keyframes inside the segment, or evenly spread times without them"""
+        count = max(1, settings.QC_SAMPLES_PER_SEGMENT)
+        start = segment.start_time or 0.0
+        end = start + (segment.duration or 0.0)
+        
+        inside = [k for k in keyframes if start + SAMPLE_EDGE_SECONDS <= k < end - SAMPLE_EDGE_SECONDS]
+        if len(inside) >= count:
+            step = len(inside) / count
+            return [inside[int(i * step + step / 2)] for i in range(count)]
+        
+        return [start + (i + 0.5) * (end - start) / count for i in range(count)]
+    
+    def _frame_size(self, source_info: MediaInfo) -> Tuple[int, int]:
+        """Comparison frame size keeping the source's display aspect ratio"""
+        width = settings.QC_FRAME_WIDTH
+        display_size = source_info.display_size
+        if not display_size:
+            return width, width * 9 // 16 // 2 * 2
+        
+        source_width, source_height = display_size
+        return width, max(2, round(width * source_height / source_width / 2) * 2)
+    
+    async def _decode_pair(self, source_path: str, source_time: float, output_path: str,
+                           output_time: float, size: Tuple[int, int]) -> Optional[np.ndarray]:
+        """Decode one luma frame from each file at the given times, stacked as (2, height, width)"""
+        width, height = size
+        scale = f"scale={width}:{height},format=gray"
+        
+        try:
+            raw = await self.ffmpeg.run([
+                "ffmpeg",
+                "-ss", f"{source_time:.3f}",
+                "-i", source_path,
+                "-ss", f"{max(0.0, output_time):.3f}",
+                "-i", output_path,
+                "-filter_complex",
+                f"[0:v]{scale}[a];[1:v]{scale}[b];[a][b]vstack=inputs=2[out]",
+                "-map", "[out]",
+                "-frames:v", "1",
+                "-f", "rawvideo",
+                "pipe:1"
+            ])
+        except FFmpegError as e:
+            logger.warning("QC frame decode failed", output=output_path, error=str(e))
+            return None
+        
+        if len(raw) != 2 * width * height:
+            return None
+        
+        return np.frombuffer(raw, dtype=np.uint8).reshape(2, height, width)
+
+
+def ssim(reference: np.ndarray, output: np.ndarray) -> np.ndarray:
+    """Mean SSIM per frame of (frames, height, width) arrays, using box-filtered local statistics"""
+    mu_x = _box_mean(reference)
+    mu_y = _box_mean(output)
+    var_x = _box_mean(reference * reference) - mu_x * mu_x
+    var_y = _box_mean(output * output) - mu_y * mu_y
+    covariance = _box_mean(reference * output) - mu_x * mu_y
+    
+    ssim_map = ((2 * mu_x * mu_y + SSIM_C1) * (2 * covariance + SSIM_C2)) / (
+        (mu_x * mu_x + mu_y * mu_y + SSIM_C1) * (var_x + var_y + SSIM_C2)
+    )
+    return ssim_map.mean(axis=(1, 2))
+
+
+def psnr(reference: np.ndarray, output: np.ndarray) -> np.ndarray:
+    """PSNR in dB per frame of (frames, height, width) arrays, capped at PSNR_MAX"""
+    mse = np.mean((reference - output) ** 2, axis=(1, 2))
+    with np.errstate(divide="ignore"):
+        return np.minimum(10 * np.log10(255.0 ** 2 / mse), PSNR_MAX)
+
+
+def _box_mean(frames: np.ndarray) -> np.ndarray:
+    """Mean over every SSIM_WINDOW x SSIM_WINDOW window of each frame, via summed-area tables"""
+    k = SSIM_WINDOW
+    table = np.pad(frames, ((0, 0), (1, 0), (1, 0))).cumsum(axis=1).cumsum(axis=2)
+    sums = table[:, k:, k:] - table[:, :-k, k:] - table[:, k:, :-k] + table[:, :-k, :-k]
+    return sums / (k * k)
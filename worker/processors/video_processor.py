@@ -1,208 +1,1087 @@
 """
 Video processing pipeline with eye gaze correction and splitting
 """
+import csv
 import os
+import shutil
 import uuid
 import asyncio
-import subprocess
+import time
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
 
-import cv2
 import numpy as np
 import structlog
 
 from api.core.config import settings
-from shared.models.job import Job, JobSegment
+from shared.models.job import (
+    EncodePolicy, EncodeProfile, Job, JobSegment, JobStage, JobStageName, JobStatus, MediaInfo,
+    Platform, SegmentQuality, SplitMode, StageStatus, PLATFORM_ENCODE_PROFILES,
+    JOB_STAGES, PLATFORM_MAX_DURATION
+)
 from shared.database.connection import get_db
-from worker.processors.eye_gaze import EyeGazeCorrector
+from shared.media.ffmpeg import FFmpegSupervisor, ProgressCallback
+from shared.media.probe import probe_media
+from shared.storage.artifacts import discard_artifacts, keep_artifact
+from shared.storage.processed import promote_outputs
+from shared.storage.scratch import JobScratch, ScratchManager
+from api.services.job_service import JobService
+from worker.processors.compilation import CompilationBuilder
+from worker.processors.encode_policy import select_encode_policy, x264_profile
+from worker.processors.eye_gaze import EyeGazeCorrector, GazeCorrectionCancelled
+from worker.processors.normalizer import IngestNormalizer
+from worker.processors.quality import QualityChecker
+from worker.schedulers.upload_scheduler import UploadScheduler
 
 logger = structlog.get_logger()
 
+# Tolerance when comparing keyframe timestamps against cut points
+KEYFRAME_EPSILON = 0.001
+
+# Frame rate assumed when the probe has none
+DEFAULT_FRAME_RATE = 30.0
+
+# Preview image sizes; the sprite holds up to 25 keyframes of a segment
+THUMBNAIL_WIDTH = 480
+SPRITE_TILE_WIDTH = 160
+SPRITE_GRID = "5x5"
+
+# Job progress (percent) reached at the end of each pipeline stage
+PROGRESS_NORMALIZE = 10
+PROGRESS_EYE_GAZE = 40
+PROGRESS_SPLIT = 75
+PROGRESS_FINALIZE = 99
+
+# Target HLS fragment length; stream copy can only cut on existing keyframes
+HLS_FRAGMENT_SECONDS = 2
+
+# Progress reached at the end of the stages that run alone; the split tracks its own
+STAGE_PROGRESS = {
+    JobStageName.NORMALIZE: PROGRESS_NORMALIZE,
+    JobStageName.EYE_GAZE: PROGRESS_EYE_GAZE,
+}
+
+# Stages an earlier attempt's run can stand in for. The probe is read back from the
+# job and also reserves the attempt's scratch, so it always runs; the stages after
+# gaze correction work in scratch, which every attempt starts without
+RESUMABLE_STAGES = {
+    JobStageName.COMPILE,
+    JobStageName.NORMALIZE,
+    JobStageName.EYE_GAZE,
+}
+
+# Minimum seconds between progress writes while a stage is running
+PROGRESS_WRITE_INTERVAL = 2.0
+
+# How often the single-pass segment muxer's list is checked for finished segments
+SEGMENT_LIST_POLL_INTERVAL = 1.0
+
+# Publishing waits this long, polling at the interval, for uploads reading scratch files
+UPLOAD_DRAIN_TIMEOUT = 300.0
+UPLOAD_DRAIN_POLL_INTERVAL = 1.0
+
+# Headroom on scratch estimates; a re-encode at the chosen CRF can outgrow the upload
+SCRATCH_MARGIN = 1.25
+
+T = TypeVar("T")
+
+# Called with each segment as soon as its file is complete
+SegmentCallback = Callable[[JobSegment], None]
+
 
 class VideoProcessor:
     """Main video processing class"""
     
-    def __init__(self):
-        self.eye_gaze_corrector = EyeGazeCorrector() if settings.EYE_GAZE_ENABLED else None
+    def __init__(self, scratch_manager: ScratchManager, cancel_event: Optional[asyncio.Event] = None,
+                 eye_gaze_corrector: Optional[EyeGazeCorrector] = None, cores: Optional[int] = None):
+        # A long-lived job process passes in its already loaded corrector
+        if eye_gaze_corrector is None and settings.EYE_GAZE_ENABLED:
+            eye_gaze_corrector = EyeGazeCorrector()
+        self.eye_gaze_corrector = eye_gaze_corrector
+        self.cancel_event = cancel_event
+        self.cores = cores  # Granted by admission control; all of the machine's when unset
+        self.job_service = JobService()
+        self.upload_scheduler = UploadScheduler()
+        self.ffmpeg = FFmpegSupervisor(cancel_event=cancel_event)
+        self.normalizer = IngestNormalizer(self.ffmpeg)
+        self.compilation_builder = CompilationBuilder(self.ffmpeg)
+        self.quality_checker = QualityChecker(self.ffmpeg)
+        self.scratch_manager = scratch_manager
+        self.scratch: Optional[JobScratch] = None
+        self.encode_policy = EncodePolicy(preset="medium", crf=23)  # libx264 defaults
+        
+        self._job_id: Optional[str] = None
+        self._stage: Tuple[int, int] = (0, 0)
+        self._progress = 0
+        self._progress_written_at = 0.0
+        self._quality_results: List[SegmentQuality] = []
+        
+        # Pipeline state handed from stage to stage
+        self._video_path: Optional[str] = None
+        self._media_info: Optional[MediaInfo] = None
+        self._source_info: Optional[MediaInfo] = None  # The upload's own probe, for QC
+        self._published: List[JobSegment] = []
+        self._posted: Dict[Tuple[int, Optional[Platform]], Tuple[str, Set[Platform]]] = {}
+        
+        # Shared by every FFmpeg encode of the job so overlapping stages stay within the pool
+        self._encode_slots = asyncio.Semaphore(max(1, settings.SEGMENT_ENCODE_CONCURRENCY))
     
     async def process_video(self, job: Job) -> List[JobSegment]:
-        """Process video with eye gaze correction and splitting"""
+        """
+        Run the job's stages in order and return its published segments. Stages an
+        earlier attempt completed are resumed from their kept artifacts.
+        """
+        self._job_id = job.id
+        self._video_path = job.video_path
+        published = False
+        
         try:
-            # Step 1: Apply eye gaze correction if enabled
-            corrected_path = job.video_path
-            if self.eye_gaze_corrector and job.processing_options.eye_gaze_correction:
-                logger.info("Applying eye gaze correction", job_id=job.id)
-                corrected_path = await self._apply_eye_gaze_correction(
-                    job.video_path,
-                    job.processing_options.eye_gaze_intensity
-                )
-            
-            # Step 2: Split video into segments
-            logger.info("Splitting video into segments", job_id=job.id)
-            segments = await self._split_video(
-                corrected_path,
-                job.id,
-                job.processing_options.segment_duration
-            )
-            
-            # Step 3: Save segments to database
-            await self._save_segments(job.id, segments)
-            
-            # Clean up temporary corrected file if created
-            if corrected_path != job.video_path and os.path.exists(corrected_path):
-                os.unlink(corrected_path)
-            
-            return segments
+            previous = {stage.stage: stage for stage in await self.job_service.get_job_stages(job.id)}
+            await self._run_stages(job, previous)
+            published = True
             
+            # Published, so no later attempt will resume from the intermediates
+            discard_artifacts(job.id)
+            return self._published
+        
         except Exception as e:
             logger.error("Video processing failed", job_id=job.id, error=str(e))
             raise
+        
+        finally:
+            try:
+                # Queued uploads would read segment files that are about to be deleted
+                if not published:
+                    await self.job_service.withdraw_uploads(job.id)
+            finally:
+                # Drops the intermediates not kept as artifacts and any unpublished segments
+                if self.scratch is not None:
+                    self.scratch.release()
     
-    async def _apply_eye_gaze_correction(self, video_path: str, intensity: float) -> str:
-        """Apply eye gaze correction to video"""
-        output_path = video_path.replace(".mp4", "_corrected.mp4")
+    async def _run_stages(self, job: Job, previous: Dict[JobStageName, JobStage]):
+        """Run the stages one after another; the first failure ends the attempt"""
+        runners: Dict[JobStageName, Callable[[Job], Awaitable[Optional[str]]]] = {
+            JobStageName.COMPILE: self._build_compilation,
+            JobStageName.PROBE: self._probe,
+            JobStageName.NORMALIZE: self._normalize,
+            JobStageName.EYE_GAZE: self._apply_eye_gaze_correction,
+            JobStageName.SPLIT: self._split_and_finalize,
+            JobStageName.QUALITY: self._record_quality,
+            JobStageName.PUBLISH: self._publish_outputs,
+        }
+        for stage in JOB_STAGES:
+            await self._run_stage(job, stage, runners[stage], previous.get(stage))
+    
+    async def _run_stage(self, job: Job, stage: JobStageName,
+                         runner: Callable[[Job], Awaitable[Optional[str]]],
+                         previous: Optional[JobStage]):
+        """Run one stage and record its outcome, or resume it from an earlier attempt"""
+        if stage in STAGE_PROGRESS:
+            self._begin_stage(STAGE_PROGRESS[stage])
+        
+        if self._resumable(stage, previous):
+            logger.info("Stage resumed from an earlier attempt",
+                       job_id=job.id, stage=stage.value, artifact=previous.artifact)
+            if previous.artifact and stage != JobStageName.COMPILE:
+                await self._adopt_video(previous.artifact)
+        
+        elif not self._stage_applies(job, stage):
+            await self.job_service.finish_stage(job.id, stage, StageStatus.SKIPPED)
+        
+        else:
+            await self.job_service.start_stage(job.id, stage)
+            try:
+                artifact = await runner(job)
+            except BaseException as e:
+                await self.job_service.finish_stage(
+                    job.id, stage, StageStatus.FAILED, error=str(e) or type(e).__name__
+                )
+                raise
+            await self.job_service.finish_stage(job.id, stage, StageStatus.COMPLETED, artifact)
+        
+        if stage in STAGE_PROGRESS:
+            await self._report_progress(1.0)
+    
+    def _resumable(self, stage: JobStageName, previous: Optional[JobStage]) -> bool:
+        """Whether an earlier attempt's run of the stage can stand in for this one"""
+        if stage not in RESUMABLE_STAGES or previous is None:
+            return False
+        if previous.status not in (StageStatus.COMPLETED, StageStatus.SKIPPED):
+            return False
+        
+        # Artifacts unused for too long are removed by the cleanup task
+        return previous.artifact is None or os.path.exists(previous.artifact)
+    
+    def _stage_applies(self, job: Job, stage: JobStageName) -> bool:
+        """Whether the job's options call for the stage at all"""
+        if stage == JobStageName.COMPILE:
+            return job.processing_options.compilation is not None
+        if stage == JobStageName.EYE_GAZE:
+            return bool(self.eye_gaze_corrector and job.processing_options.eye_gaze_correction)
+        if stage == JobStageName.QUALITY:
+            return settings.QC_ENABLED
+        return True
+    
+    async def _probe(self, job: Job) -> None:
+        """Load the input's media record, then choose the encode policy and reserve scratch"""
+        self._media_info = self._source_info = await self._get_media_info(job)
+        self.encode_policy = await self._select_encode_policy(job, self._media_info)
+        
+        # Refused here, before any intermediate is written, when the budget is spent
+        self.scratch = self.scratch_manager.reserve(job.id, self._scratch_estimate(job, self._media_info))
+    
+    async def _normalize(self, job: Job) -> Optional[str]:
+        """Normalize the input to H.264/AAC MP4 at a constant frame rate, keeping the result"""
+        normalized_path = await self.normalizer.normalize(
+            self._video_path, self._media_info, self._intermediate_path(self._video_path, "normalized"),
+            self.encode_policy.x264_args(), self._encode_threads()
+        )
+        if not normalized_path:
+            return None
+        
+        return await self._keep_video(job, normalized_path)
+    
+    async def _split_and_finalize(self, job: Job) -> None:
+        """
+        Split the video into segments. Each finished segment is rendered, saved
+        and handed to the upload scheduler while the split continues
+        """
+        # Segments already saved by an earlier attempt of this job are replaced, except
+        # those it posted, whose records the new outputs take over
+        await self.job_service.delete_job_segments(job.id)
+        self._posted = await self.job_service.get_posted_segments(job.id)
+        
+        self._begin_stage(PROGRESS_SPLIT)
+        logger.info("Splitting video into segments", job_id=job.id)
+        
+        profiles = self._rendition_profiles(job)
+        finalizing: List[asyncio.Task] = []
+        
+        def on_segment(segment: JobSegment):
+            finalizing.append(asyncio.create_task(
+                self._finalize_segment(job, segment, profiles, self._source_info)
+            ))
+        
+        try:
+            await self._split_video(self._video_path, job, self._media_info, on_segment)
+            
+            # Wait for the renditions, previews and uploads still in flight
+            self._begin_stage(PROGRESS_FINALIZE)
+            await self._wait_finalized(finalizing)
+        
+        except BaseException:
+            for task in finalizing:
+                task.cancel()
+            await asyncio.gather(*finalizing, return_exceptions=True)
+            raise
+    
+    async def _keep_video(self, job: Job, path: str) -> str:
+        """Keep a stage's output video for later attempts and continue from it"""
+        loop = asyncio.get_event_loop()
+        kept = await loop.run_in_executor(None, keep_artifact, job.id, Path(path))
+        await self._adopt_video(str(kept))
+        return str(kept)
+    
+    async def _adopt_video(self, path: str):
+        """Continue the pipeline from a new full-length video, which the earlier probe no longer describes"""
+        self._video_path = path
+        self._media_info = await probe_media(path)
+    
+    def _begin_stage(self, end_progress: int):
+        """Start a pipeline stage whose progress runs from the current value to end_progress"""
+        self._stage = (self._progress, end_progress)
+    
+    async def _report_progress(self, fraction: float):
+        """Map the running stage's completed fraction onto job progress, throttling writes"""
+        start, end = self._stage
+        progress = int(start + (end - start) * fraction)
+        if progress <= self._progress:
+            return
+        
+        self._progress = progress
+        now = time.monotonic()
+        if fraction < 1.0 and now - self._progress_written_at < PROGRESS_WRITE_INTERVAL:
+            return
+        
+        self._progress_written_at = now
+        await self.job_service.update_job_progress(self._job_id, progress)
+    
+    async def _get_media_info(self, job: Job) -> MediaInfo:
+        """Stored ingest probe of the job's video, probing now for jobs created without one"""
+        if job.media_info is not None:
+            return job.media_info
+        
+        media_info = await probe_media(job.video_path)
+        await self.job_service.update_media_info(job.id, media_info)
+        return media_info
+    
+    async def _select_encode_policy(self, job: Job, media_info: MediaInfo) -> EncodePolicy:
+        """Choose and record the x264 preset/CRF for this job from the backlog and its deadline"""
+        backlog = await self.job_service.count_jobs(JobStatus.PENDING)
+        
+        # The split is one pass over the input, plus one per distinct rendition profile
+        passes = 1 + len(self._rendition_profiles(job))
+        policy = select_encode_policy(backlog, media_info, passes, job.deadline_at, cores=self.cores)
+        await self.job_service.update_encode_policy(job.id, policy)
+        
+        logger.info("Encode policy selected",
+                   job_id=job.id,
+                   preset=policy.preset,
+                   crf=policy.crf,
+                   backlog=backlog,
+                   deadline_seconds=policy.deadline_seconds)
+        return policy
+    
+    async def _build_compilation(self, job: Job) -> str:
+        """Join the compilation's source segments into the job's input video and return its path"""
+        segments = []
+        for segment_id in job.processing_options.compilation.segment_ids:
+            segment = await self.job_service.get_segment(segment_id)
+            if not segment:
+                raise ValueError(f"Compilation segment not found: {segment_id}")
+            segments.append(segment)
+        
+        logger.info("Building compilation input", job_id=job.id, segments=len(segments))
+        await self.compilation_builder.build(
+            segments, job.video_path, self.encode_policy.x264_args(), self._encode_threads()
+        )
+        return job.video_path
+    
+    async def _apply_eye_gaze_correction(self, job: Job) -> Optional[str]:
+        """Apply eye gaze correction to video, keeping the corrected file"""
+        logger.info("Applying eye gaze correction", job_id=job.id)
+        output_path = str(self._intermediate_path(self._video_path, "corrected"))
         
         try:
             # Process video with eye gaze correction
             await self.eye_gaze_corrector.process_video(
-                video_path,
+                self._video_path,
                 output_path,
-                intensity
+                job.processing_options.eye_gaze_intensity,
+                self._media_info,
+                cancel_event=self.cancel_event
             )
-            
-            return output_path
-            
+        
+        except GazeCorrectionCancelled:
+            raise
+        
         except Exception as e:
             logger.error("Eye gaze correction failed", error=str(e))
-            # Return original video if correction fails
-            return video_path
+            # Continue with the uncorrected video if correction fails
+            return None
+        
+        return await self._keep_video(job, output_path)
     
-    async def _split_video(self, video_path: str, job_id: str, segment_duration: int) -> List[JobSegment]:
-        """Split video into segments using FFmpeg"""
-        segments = []
+    async def _split_video(self, video_path: str, job: Job, media_info: MediaInfo,
+                           on_segment: SegmentCallback) -> List[JobSegment]:
+        """Split video into segments, stream-copying whole GOPs when the input allows it"""
+        options = job.processing_options
+        max_duration = self._max_segment_duration(job.platforms)
         
-        # Get video duration
-        duration = await self._get_video_duration(video_path)
-        if duration == 0:
-            raise ValueError("Could not determine video duration")
+        # Every split mode cuts at multiples of segment_duration, so none may exceed the platforms
+        segment_duration = options.segment_duration
+        if max_duration is not None and segment_duration > max_duration:
+            segment_duration = int(max_duration)
         
-        # Calculate number of segments
-        num_segments = int(duration / segment_duration) + (1 if duration % segment_duration > 0 else 0)
+        if media_info.duration == 0:
+            raise ValueError("Could not determine video duration")
         
         # Create output directory
-        output_dir = Path(settings.TEMP_STORAGE_PATH) / f"segments_{job_id}"
+        output_dir = self._segment_dir()
         output_dir.mkdir(exist_ok=True)
         
-        # Split video using FFmpeg
-        for i in range(num_segments):
-            start_time = i * segment_duration
-            segment_id = str(uuid.uuid4())
-            output_file = output_dir / f"segment_{i+1:03d}.mp4"
+        if options.split_mode != SplitMode.ENCODE:
+            if self._can_stream_copy(media_info):
+                # Cuts that all land on keyframes need no encoding at all
+                if options.boundary_tolerance > 0:
+                    cut_points = self._snap_cut_points(
+                        media_info.keyframes,
+                        media_info.duration,
+                        segment_duration,
+                        options.boundary_tolerance,
+                        max_duration
+                    )
+                    if cut_points is not None:
+                        logger.info("Splitting on keyframes with stream copy",
+                                   job_id=job.id, cut_points=len(cut_points))
+                        return await self._split_stream_copy(
+                            video_path, job.id, cut_points, output_dir, media_info, on_segment
+                        )
+                    
+                    logger.info("No keyframe within tolerance of every boundary, smart-cutting",
+                               job_id=job.id,
+                               tolerance=options.boundary_tolerance)
+                
+                return await self._split_smart_cut(
+                    video_path, job.id, segment_duration, output_dir, media_info, on_segment
+                )
             
-            # FFmpeg command for splitting
-            cmd = [
-                "ffmpeg",
-                "-i", video_path,
-                "-ss", str(start_time),
-                "-t", str(segment_duration),
+            if options.split_mode == SplitMode.SMART_CUT:
+                logger.warning("Input not eligible for smart-cut, re-encoding",
+                             job_id=job.id,
+                             video_codec=media_info.video_codec,
+                             audio_codec=media_info.audio_codec)
+        
+        return await self._split_encode(
+            video_path, job.id, segment_duration, output_dir, media_info.duration, on_segment
+        )
+    
+    async def _split_encode(self, video_path: str, job_id: str, segment_duration: int,
+                            output_dir: Path, duration: float,
+                            on_segment: SegmentCallback) -> List[JobSegment]:
+        """Re-encode the input into segments, in parallel when the encode pool allows it"""
+        if settings.SEGMENT_ENCODE_CONCURRENCY > 1:
+            if duration > segment_duration:
+                return await self._split_encode_parallel(
+                    video_path, job_id, segment_duration, output_dir, duration, on_segment
+                )
+        
+        # One decode of the whole input; keyframes are forced on every boundary
+        # so the muxer can cut exactly at multiples of segment_duration
+        async with self._encode_slots:
+            return await self._run_segment_muxer(video_path, job_id, output_dir, duration, on_segment, [
                 "-c:v", "libx264",  # Use H.264 codec
+                *self.encode_policy.x264_args(),
                 "-c:a", "aac",      # Use AAC audio
-                "-movflags", "+faststart",  # Optimize for streaming
-                "-y",  # Overwrite output
-                str(output_file)
-            ]
+                "-threads", str(self._encode_threads()),
+                "-force_key_frames", f"expr:gte(t,n_forced*{segment_duration})",
+                "-segment_time", str(segment_duration),
+            ])
+    
+    async def _split_encode_parallel(self, video_path: str, job_id: str, segment_duration: int,
+                                     output_dir: Path, duration: float,
+                                     on_segment: SegmentCallback) -> List[JobSegment]:
+        """Encode each segment in its own FFmpeg process across the bounded encode pool"""
+        async def encode(number: int, start_time: float, end_time: float) -> JobSegment:
+            output_file = output_dir / f"segment_{number:03d}.mp4"
             
-            # Run FFmpeg asynchronously
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            # Input seeking jumps to the preceding keyframe, so each process only
+            # decodes its own segment rather than everything before it
+            await self._run_ffmpeg([
+                "ffmpeg",
+                "-ss", str(start_time),
+                "-i", video_path,
+                "-t", str(end_time - start_time),
+                "-c:v", "libx264",
+                *self.encode_policy.x264_args(),
+                "-c:a", "aac",
+                "-threads", str(self._encode_threads()),
+                "-movflags", "+faststart",
+                "-y", str(output_file)
+            ])
             
-            stdout, stderr = await process.communicate()
+            logger.info("Segment created",
+                       job_id=job_id,
+                       segment_number=number,
+                       duration=end_time - start_time)
             
-            if process.returncode != 0:
-                logger.error("FFmpeg split failed", 
-                           segment=i+1, 
-                           error=stderr.decode())
-                continue
+            segment = self._segment_record(job_id, number, output_file, start_time, end_time)
+            on_segment(segment)
+            return segment
+        
+        return await self._run_bounded([
+            encode(number, start_time, end_time)
+            for number, (start_time, end_time)
+            in enumerate(self._segment_ranges(duration, segment_duration), start=1)
+        ])
+    
+    async def _split_stream_copy(self, video_path: str, job_id: str, cut_points: List[float],
+                                 output_dir: Path, media_info: MediaInfo,
+                                 on_segment: SegmentCallback) -> List[JobSegment]:
+        """Split video on keyframe cut points without re-encoding anything"""
+        if cut_points:
+            # With B-frames the muxer sees keyframe timestamps shifted by the reorder delay
+            # and skips a keyframe sitting exactly on a cut, so ask for each cut half a
+            # frame early; the next keyframe is still the one at the cut point
+            half_frame = 0.5 / (media_info.fps or DEFAULT_FRAME_RATE)
+            split_args = ["-segment_times", ",".join(f"{t - half_frame:.6f}" for t in cut_points)]
+        else:
+            # Short enough for a single segment
+            split_args = ["-segment_time", "86400"]
+        
+        # The muxer's list reports times shifted by the same delay; the cuts are known exactly
+        boundaries = [0.0, *cut_points, media_info.duration]
+        
+        return await self._run_segment_muxer(
+            video_path, job_id, output_dir, media_info.duration, on_segment,
+            ["-c", "copy", *split_args],
+            boundaries=boundaries
+        )
+    
+    async def _run_segment_muxer(self, video_path: str, job_id: str, output_dir: Path,
+                                 duration: float, on_segment: SegmentCallback,
+                                 codec_args: List[str],
+                                 boundaries: Optional[List[float]] = None) -> List[JobSegment]:
+        """
+        Run FFmpeg's segment muxer over the input and return the segments it wrote,
+        handing each to on_segment as soon as the muxer lists it as finished.
+        Segment times come from boundaries when given, else from the muxer's list.
+        """
+        segment_list = output_dir / "segments.csv"
+        segment_list.unlink(missing_ok=True)  # Never report a previous attempt's segments
+        
+        cmd = [
+            "ffmpeg",
+            "-i", video_path,
+            *codec_args,
+            "-f", "segment",
+            "-segment_start_number", "1",
+            "-segment_list", str(segment_list),
+            "-segment_list_type", "csv",
+            "-segment_format_options", "movflags=+faststart",  # Optimize for streaming
+            "-reset_timestamps", "1",
+            "-y",  # Overwrite output
+            str(output_dir / "segment_%03d.mp4")
+        ]
+        
+        segments: List[JobSegment] = []
+        
+        def collect():
+            for segment in self._read_segment_list(segment_list, job_id, len(segments), boundaries):
+                segments.append(segment)
+                on_segment(segment)
+        
+        # The muxer appends a list entry only after the segment file is closed
+        muxer = asyncio.create_task(
+            self._run_ffmpeg(cmd, progress=self._report_progress, duration=duration)
+        )
+        try:
+            while not muxer.done():
+                await asyncio.wait({muxer}, timeout=SEGMENT_LIST_POLL_INTERVAL)
+                collect()
+            await muxer
+        
+        except BaseException:
+            muxer.cancel()
+            await asyncio.gather(muxer, return_exceptions=True)
+            raise
+        
+        collect()
+        if not segments:
+            raise ValueError("FFmpeg produced no segments")
+        
+        return segments
+    
+    def _snap_cut_points(self, keyframes: List[float], duration: float, segment_duration: int,
+                         tolerance: float, max_duration: Optional[float]) -> Optional[List[float]]:
+        """
+        Move every segment boundary to the nearest keyframe within the tolerance,
+        never producing a segment longer than max_duration. Returns None when some
+        boundary has no usable keyframe.
+        """
+        limit = max_duration if max_duration is not None else float("inf")
+        segment_duration = min(segment_duration, limit)  # Aim at boundaries the window can reach
+        cut_points = []
+        previous = 0.0
+        
+        # The tail may stretch up to the tolerance instead of becoming a tiny extra segment
+        while duration - previous > min(segment_duration + tolerance, limit):
+            target = previous + segment_duration
+            window_end = min(target + tolerance, previous + limit)
+            candidates = [
+                k for k in keyframes
+                if target - tolerance <= k <= window_end and k > previous + KEYFRAME_EPSILON
+            ]
+            if not candidates:
+                return None
             
-            # Get segment info
-            segment_duration_actual = min(segment_duration, duration - start_time)
-            segment_size = output_file.stat().st_size
+            previous = min(candidates, key=lambda k: abs(k - target))
+            cut_points.append(previous)
+        
+        return cut_points
+    
+    def _max_segment_duration(self, platforms: List[Platform]) -> Optional[float]:
+        """Longest segment every target platform accepts"""
+        limits = [PLATFORM_MAX_DURATION[p] for p in platforms if p in PLATFORM_MAX_DURATION]
+        return min(limits) if limits else None
+    
+    def _rendition_profiles(self, job: Job) -> Dict[EncodeProfile, List[Platform]]:
+        """Distinct encode profiles of the job's platforms, each with the platforms it serves"""
+        profiles: Dict[EncodeProfile, List[Platform]] = {}
+        for platform in job.platforms:
+            profile = PLATFORM_ENCODE_PROFILES.get(platform)
+            if profile is not None:
+                profiles.setdefault(profile, []).append(platform)
+        return profiles
+    
+    async def _finalize_segment(self, job: Job, segment: JobSegment,
+                                profiles: Dict[EncodeProfile, List[Platform]],
+                                source_info: MediaInfo):
+        """Render, preview, save, schedule uploads for and quality-check one finished segment"""
+        renditions = []
+        if profiles:
+            async with self._encode_slots:
+                renditions = await self._render_segment(segment, profiles)
+        
+        if job.processing_options.generate_thumbnails:
+            async with self._encode_slots:
+                await self._generate_thumbnails(segment)
+        
+        # Remux only, so it does not take an encode slot
+        if job.processing_options.hls_preview:
+            await self._package_hls(segment)
+        
+        # An output an earlier attempt already posted keeps its record and is not posted again
+        outputs = [segment] + renditions
+        posted: Set[Platform] = set()
+        for output in outputs:
+            previous = self._posted.get((output.segment_number, output.platform))
+            if previous is not None:
+                output.id, platforms = previous
+                posted |= platforms
+        
+        await self._save_segments(job.id, outputs)
+        
+        # Platforms with a rendition get the rendition; the rest get the segment itself
+        rendered = {platform for platforms in profiles.values() for platform in platforms}
+        await self.upload_scheduler.schedule_job_uploads(
+            job.id,
+            [p for p in job.platforms if p not in rendered and p not in posted],
+            [output for output in outputs if output.platform not in posted]
+        )
+        
+        # Sampled against the untouched upload, after the uploads are already queued
+        if settings.QC_ENABLED:
+            for output in outputs:
+                self._quality_results.append(await self.quality_checker.check_segment(
+                    job.video_path, source_info, output
+                ))
+    
+    async def _record_quality(self, job: Job):
+        """Store the job's QC report and log any segments that regressed"""
+        report = self.quality_checker.summarize(self._quality_results)
+        await self.job_service.update_quality_report(job.id, report)
+        
+        if not report.passed:
+            logger.warning("Quality check flagged segments",
+                         job_id=job.id,
+                         segments=report.flagged_segments,
+                         min_ssim=report.min_ssim,
+                         min_psnr=report.min_psnr)
+    
+    async def _publish_outputs(self, job: Job) -> None:
+        """Promote the job's files into the processed store and drop its scratch directory"""
+        scratch_dir = self._segment_dir()
+        segments = await self.job_service.get_job_segments(job.id)
+        
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, promote_outputs, job.id, scratch_dir, segments)
+        await self.job_service.update_segment_paths(segments)
+        
+        # The published files are links to the same data. Uploads starting from now on
+        # read the published paths, but running ones may still read the scratch copies.
+        await self._wait_for_uploads(job.id)
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        
+        self._published = [s for s in segments if s.platform is None]
+    
+    async def _wait_for_uploads(self, job_id: str):
+        """Wait until none of the job's uploads is in progress, or UPLOAD_DRAIN_TIMEOUT passes"""
+        deadline = time.monotonic() + UPLOAD_DRAIN_TIMEOUT
+        while active := await self.job_service.count_active_uploads(job_id):
+            if time.monotonic() >= deadline:
+                # Any that fail are retried from the published files
+                logger.warning("Uploads still running, removing scratch anyway",
+                             job_id=job_id,
+                             uploads=active)
+                return
+            await asyncio.sleep(UPLOAD_DRAIN_POLL_INTERVAL)
+    
+    def _segment_dir(self) -> Path:
+        """Scratch directory the job's segments and previews are written to"""
+        return self.scratch.disk_dir / "segments"
+    
+    def _intermediate_path(self, video_path: str, suffix: str) -> Path:
+        """Scratch location for a full-length intermediate derived from video_path"""
+        source = Path(video_path)
+        return self.scratch.path(f"{source.stem}_{suffix}.mp4", os.path.getsize(video_path))
+    
+    def _scratch_estimate(self, job: Job, media_info: MediaInfo) -> int:
+        """Peak scratch use of a job: a copy of the input per full-length output, plus renditions"""
+        options = job.processing_options
+        copies = 1  # The segments
+        if self.normalizer.needs_normalization(media_info):
+            copies += 1
+        if self.eye_gaze_corrector and options.eye_gaze_correction:
+            copies += 1
+        if options.hls_preview:
+            copies += 1
+        
+        # Renditions are bitrate-capped, so their size follows from the duration
+        rendition_bytes = sum(
+            (profile.video_bitrate_kbps + profile.audio_bitrate_kbps) * 125 * (media_info.duration or 0)
+            for profile in self._rendition_profiles(job)
+        )
+        
+        return int((os.path.getsize(job.video_path) * copies + rendition_bytes) * SCRATCH_MARGIN)
+    
+    async def _wait_finalized(self, tasks: List[asyncio.Task]):
+        """Wait for every segment's finalization, reporting progress as each one completes"""
+        for done, finished in enumerate(asyncio.as_completed(tasks), start=1):
+            await finished
+            await self._report_progress(done / len(tasks))
+    
+    async def _render_segment(self, segment: JobSegment,
+                              profiles: Dict[EncodeProfile, List[Platform]]) -> List[JobSegment]:
+        """Produce all renditions of one segment from a single decode using split outputs"""
+        source = Path(segment.file_path)
+        outputs = [
+            (profile, platforms, source.with_name(f"{source.stem}_{profile.name}.mp4"))
+            for profile, platforms in profiles.items()
+        ]
+        
+        labels = [f"[v{i}]" for i in range(len(outputs))]
+        filters = [f"[0:v]split={len(outputs)}{''.join(labels)}"]
+        for i, (profile, _, _) in enumerate(outputs):
+            long_side = profile.max_long_side
+            filters.append(
+                f"[v{i}]scale=w='if(gte(iw,ih),min(iw,{long_side}),-2)'"
+                f":h='if(gte(iw,ih),-2,min(ih,{long_side}))'[out{i}]"
+            )
+        
+        cmd = ["ffmpeg", "-i", str(source), "-filter_complex", ";".join(filters)]
+        for i, (profile, _, output_file) in enumerate(outputs):
+            cmd.extend([
+                "-map", f"[out{i}]",
+                "-map", "0:a?",
+                "-c:v", "libx264",
+                *self.encode_policy.x264_args(),
+                "-maxrate", f"{profile.video_bitrate_kbps}k",
+                "-bufsize", f"{profile.video_bitrate_kbps * 2}k",
+                "-c:a", "aac",
+                "-b:a", f"{profile.audio_bitrate_kbps}k",
+                "-threads", str(self._encode_threads()),
+                "-movflags", "+faststart",
+                "-y", str(output_file)
+            ])
+        
+        await self._run_ffmpeg(cmd)
+        
+        renditions = []
+        for profile, platforms, output_file in outputs:
+            size = output_file.stat().st_size
+            for platform in platforms:
+                renditions.append(JobSegment(
+                    id=str(uuid.uuid4()),
+                    job_id=segment.job_id,
+                    segment_number=segment.segment_number,
+                    file_path=str(output_file),
+                    start_time=segment.start_time,
+                    duration=segment.duration,
+                    size=size,
+                    platform=platform
+                ))
+        
+        return renditions
+    
+    async def _generate_thumbnails(self, segment: JobSegment):
+        """Write a poster and a storyboard sprite for a segment, decoding keyframes only"""
+        source = Path(segment.file_path)
+        poster = source.with_name(f"{source.stem}_poster.jpg")
+        sprite = source.with_name(f"{source.stem}_sprite.jpg")
+        
+        try:
+            await self._run_ffmpeg([
+                "ffmpeg",
+                "-skip_frame", "nokey",
+                "-i", str(source),
+                "-filter_complex",
+                f"[0:v]split=2[p][s];"
+                f"[p]scale={THUMBNAIL_WIDTH}:-2[poster];"
+                f"[s]scale={SPRITE_TILE_WIDTH}:-2,tile={SPRITE_GRID}[sprite]",
+                "-map", "[poster]", "-vsync", "vfr", "-frames:v", "1", "-q:v", "3", "-y", str(poster),
+                "-map", "[sprite]", "-vsync", "vfr", "-frames:v", "1", "-q:v", "5", "-y", str(sprite)
+            ])
+        except RuntimeError as e:
+            # Previews are optional; a failure here must not fail the job
+            logger.warning("Thumbnail generation failed",
+                         job_id=segment.job_id,
+                         segment_number=segment.segment_number,
+                         error=str(e))
+            return
+        
+        segment.thumbnail_path = str(poster)
+        segment.sprite_path = str(sprite)
+    
+    async def _package_hls(self, segment: JobSegment):
+        """
+        Remux a segment into fragmented MP4 with a VOD HLS playlist. All fragments
+        live in one file addressed by byte ranges, so players fetch only what they play.
+        """
+        source = Path(segment.file_path)
+        hls_dir = source.parent / "hls" / source.stem
+        hls_dir.mkdir(parents=True, exist_ok=True)
+        playlist = hls_dir / "index.m3u8"
+        
+        try:
+            await self._run_ffmpeg([
+                "ffmpeg",
+                "-i", str(source),
+                "-map", "0",
+                "-c", "copy",
+                "-f", "hls",
+                "-hls_time", str(HLS_FRAGMENT_SECONDS),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_type", "fmp4",
+                "-hls_flags", "single_file+independent_segments",
+                "-y", str(playlist)
+            ])
+        except RuntimeError as e:
+            # Previews are optional; a failure here must not fail the job
+            logger.warning("HLS packaging failed",
+                         job_id=segment.job_id,
+                         segment_number=segment.segment_number,
+                         error=str(e))
+            shutil.rmtree(hls_dir, ignore_errors=True)
+            return
+        
+        segment.hls_path = str(playlist)
+    
+    def _segment_ranges(self, duration: float, segment_duration: int) -> List[Tuple[float, float]]:
+        """Fixed-length (start, end) ranges covering the whole video"""
+        num_segments = int(duration / segment_duration) + (1 if duration % segment_duration > 0 else 0)
+        return [
+            (i * segment_duration, min((i + 1) * segment_duration, duration))
+            for i in range(num_segments)
+        ]
+    
+    def _segment_record(self, job_id: str, number: int, output_file: Path,
+                        start_time: float, end_time: float) -> JobSegment:
+        """Create the database record for a finished segment file"""
+        return JobSegment(
+            id=str(uuid.uuid4()),
+            job_id=job_id,
+            segment_number=number,
+            file_path=str(output_file),
+            start_time=start_time,
+            duration=end_time - start_time,
+            size=output_file.stat().st_size
+        )
+    
+    async def _run_bounded(self, coros: List[Awaitable[T]]) -> List[T]:
+        """
+        Run coroutines in the job's encode slots (at most SEGMENT_ENCODE_CONCURRENCY at
+        once) and return their results in submission order. The first failure cancels the rest.
+        Completed coroutines count towards the running stage's progress.
+        """
+        done = 0
+        
+        async def bounded(coro: Awaitable[T]) -> T:
+            nonlocal done
+            async with self._encode_slots:
+                result = await coro
+            done += 1
+            await self._report_progress(done / len(coros))
+            return result
+        
+        tasks = [asyncio.create_task(bounded(coro)) for coro in coros]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    def _encode_threads(self) -> int:
+        """Threads per FFmpeg encode so concurrent encodes share the job's cores instead of oversubscribing"""
+        if settings.FFMPEG_THREADS > 0:
+            return settings.FFMPEG_THREADS
+        
+        concurrency = max(1, settings.SEGMENT_ENCODE_CONCURRENCY)
+        return max(1, (self.cores or os.cpu_count() or 1) // concurrency)
+    
+    def _can_stream_copy(self, media_info: MediaInfo) -> bool:
+        """Copying GOPs and audio into MP4 segments needs H.264 video and AAC (or no) audio"""
+        if media_info.video_codec != "h264" or not media_info.keyframes:
+            return False
+        
+        return media_info.audio_codec in (None, "aac")
+    
+    async def _split_smart_cut(self, video_path: str, job_id: str, segment_duration: int,
+                               output_dir: Path, media_info: MediaInfo,
+                               on_segment: SegmentCallback) -> List[JobSegment]:
+        """
+        Frame-accurate split that only re-encodes the partial GOP at the start of each
+        segment; every GOP that starts inside a segment is stream-copied
+        """
+        parts_dir = output_dir / "parts"
+        parts_dir.mkdir(exist_ok=True)
+        
+        async def cut(number: int, start_time: float, end_time: float) -> JobSegment:
+            output_file = output_dir / f"segment_{number:03d}.mp4"
+            segment_parts_dir = parts_dir / f"{number:03d}"
+            segment_parts_dir.mkdir(exist_ok=True)
             
-            # Create segment record
-            segment = JobSegment(
-                id=segment_id,
-                job_id=job_id,
-                segment_number=i + 1,
-                file_path=str(output_file),
-                duration=segment_duration_actual,
-                size=segment_size
+            # First keyframe inside the segment; everything before it must be re-encoded
+            cut_keyframe = next(
+                (k for k in media_info.keyframes if start_time - KEYFRAME_EPSILON <= k < end_time),
+                None
             )
             
-            segments.append(segment)
-            logger.info("Segment created", 
+            await self._smart_cut_segment(
+                video_path, start_time, end_time, cut_keyframe,
+                segment_parts_dir, output_file, media_info
+            )
+            
+            logger.info("Segment created",
                        job_id=job_id,
-                       segment_number=i+1,
-                       duration=segment_duration_actual)
+                       segment_number=number,
+                       duration=end_time - start_time,
+                       copied_from=cut_keyframe)
+            
+            segment = self._segment_record(job_id, number, output_file, start_time, end_time)
+            on_segment(segment)
+            return segment
         
-        return segments
+        try:
+            return await self._run_bounded([
+                cut(number, start_time, end_time)
+                for number, (start_time, end_time)
+                in enumerate(self._segment_ranges(media_info.duration, segment_duration), start=1)
+            ])
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
     
-    async def _get_video_duration(self, video_path: str) -> float:
-        """Get video duration using FFprobe"""
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            video_path
-        ]
+    async def _smart_cut_segment(self, video_path: str, start_time: float, end_time: float,
+                                 cut_keyframe: Optional[float], parts_dir: Path,
+                                 output_file: Path, media_info: MediaInfo):
+        """Build one segment from a re-encoded head, stream-copied GOPs and copied audio"""
+        # MPEG-TS parts carry SPS/PPS in-band, so the re-encoded head and the
+        # copied GOPs can be joined even though their parameter sets differ.
+        # The segment is written as avc3, whose samples may carry parameter sets
+        # that replace the header's; under avc1 players would decode the copied
+        # GOPs with the head's SPS/PPS from the avcC.
+        parts = []
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+        head_end = end_time if cut_keyframe is None else cut_keyframe
+        if head_end - start_time > KEYFRAME_EPSILON:
+            head = parts_dir / "head.ts"
+            cmd = [
+                "ffmpeg",
+                "-ss", str(start_time),
+                "-i", video_path,
+                "-t", str(head_end - start_time),
+                "-map", "0:v:0",
+                "-an",
+                "-c:v", "libx264",
+                *self.encode_policy.x264_args(),
+                "-pix_fmt", media_info.pix_fmt or "yuv420p",
+                "-threads", str(self._encode_threads()),
+            ]
+            profile = x264_profile(media_info.video_profile)
+            if profile:
+                cmd.extend(["-profile:v", profile])
+            cmd.extend(["-f", "mpegts", "-y", str(head)])
+            
+            await self._run_ffmpeg(cmd)
+            parts.append(head)
         
-        stdout, stderr = await process.communicate()
+        if cut_keyframe is not None:
+            body = parts_dir / "body.ts"
+            await self._run_ffmpeg([
+                "ffmpeg",
+                "-ss", str(cut_keyframe),
+                "-i", video_path,
+                "-t", str(end_time - cut_keyframe),
+                "-map", "0:v:0",
+                "-an",
+                "-c:v", "copy",
+                "-bsf:v", "h264_mp4toannexb",
+                "-f", "mpegts",
+                "-y", str(body)
+            ])
+            parts.append(body)
         
-        if process.returncode == 0:
-            try:
-                return float(stdout.decode().strip())
-            except ValueError:
-                pass
+        concat_list = parts_dir / "parts.txt"
+        concat_list.write_text("".join(f"file '{part.name}'\n" for part in parts))
         
-        # Fallback: Try with OpenCV
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-        cap.release()
+        # Join the video parts and pass the audio through untouched
+        await self._run_ffmpeg([
+            "ffmpeg",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", str(concat_list),
+            "-ss", str(start_time),
+            "-i", video_path,
+            "-t", str(end_time - start_time),
+            "-map", "0:v:0",
+            "-map", "1:a:0?",
+            "-c", "copy",
+            "-tag:v", "avc3",
+            "-movflags", "+faststart",
+            "-y", str(output_file)
+        ])
+    
+    def _read_segment_list(self, segment_list: Path, job_id: str, skip: int = 0,
+                           boundaries: Optional[List[float]] = None) -> List[JobSegment]:
+        """
+        Build segment records from the segment muxer's CSV list, skipping the first
+        `skip` entries. The list may still be growing, so a partial last line is ignored.
+        Segment n spans boundaries[n - 1] to boundaries[n] when boundaries are given.
+        """
+        try:
+            lines = segment_list.read_text().split("\n")[:-1]
+        except FileNotFoundError:
+            return []
         
-        if fps > 0 and frame_count > 0:
-            return frame_count / fps
+        segments = []
+        for number, row in enumerate(csv.reader(lines), start=1):
+            if number <= skip or len(row) < 3:
+                continue
+            
+            filename, start_time, end_time = row[0], float(row[1]), float(row[2])
+            if boundaries is not None and number < len(boundaries):
+                start_time, end_time = boundaries[number - 1], boundaries[number]
+            segment = self._segment_record(
+                job_id, number, segment_list.parent / filename, start_time, end_time
+            )
+            
+            segments.append(segment)
+            logger.info("Segment created",
+                       job_id=job_id,
+                       segment_number=number,
+                       duration=segment.duration)
         
-        return 0
+        return segments
+    
+    async def _run_ffmpeg(self, cmd: List[str], progress: Optional[ProgressCallback] = None,
+                          duration: Optional[float] = None) -> bytes:
+        """Run an FFmpeg/FFprobe command under the job's supervisor and return its stdout"""
+        return await self.ffmpeg.run(cmd, progress=progress, duration=duration)
     
     async def _save_segments(self, job_id: str, segments: List[JobSegment]):
-        """Save segments to database"""
+        """Save segments to database, updating the records of segments posted by an earlier attempt"""
         async with get_db() as db:
             for segment in segments:
                 await db.execute(
                     """
                     INSERT INTO job_segments (
                         id, job_id, segment_number, file_path,
-                        duration, size, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                        start_time, duration, size, platform,
+                        thumbnail_path, sprite_path, hls_path, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        file_path = excluded.file_path,
+                        start_time = excluded.start_time,
+                        duration = excluded.duration,
+                        size = excluded.size,
+                        thumbnail_path = excluded.thumbnail_path,
+                        sprite_path = excluded.sprite_path,
+                        hls_path = excluded.hls_path
                     """,
                     (
                         segment.id,
                         segment.job_id,
                         segment.segment_number,
                         segment.file_path,
+                        segment.start_time,
                         segment.duration,
                         segment.size,
+                        segment.platform.value if segment.platform else None,
+                        segment.thumbnail_path,
+                        segment.sprite_path,
+                        segment.hls_path,
                         segment.created_at.isoformat()
                     )
                 )
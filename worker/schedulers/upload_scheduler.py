@@ -2,6 +2,7 @@
 Upload scheduler for social media platforms
 """
 import asyncio
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -91,8 +92,16 @@ class UploadScheduler:
                             retry_count: int):
         """Upload a single segment to a platform"""
         try:
-            # Update status to uploading
-            await self._update_upload_status(upload_id, UploadStatus.UPLOADING)
+            # Update status to uploading, unless the upload was withdrawn since it was fetched
+            if not await self._update_upload_status(upload_id, UploadStatus.UPLOADING):
+                logger.info("Withdrawn upload skipped",
+                           platform=platform.value,
+                           job_id=job_id,
+                           segment=segment_number)
+                return
+            
+            # The job may have published its files since this upload was fetched
+            file_path = await self._segment_file_path(segment_id) or file_path
             
             # Perform the upload
             upload_url = await self.platform_uploader.upload(
@@ -119,7 +128,7 @@ class UploadScheduler:
                     job_id, webhook_url, platform.value,
                     segment_number, upload_url
                 )
-            
+        
         except Exception as e:
             error_msg = str(e)
             logger.error("Upload failed",
@@ -141,11 +150,18 @@ class UploadScheduler:
                 increment_retry=True
             )
     
+    async def _segment_file_path(self, segment_id: str) -> Optional[str]:
+        """Current location of a segment's file"""
+        async with get_db() as db:
+            cursor = await db.execute("SELECT file_path FROM job_segments WHERE id = ?", (segment_id,))
+            row = await cursor.fetchone()
+        return row[0] if row else None
+    
     async def _update_upload_status(self, upload_id: str, status: UploadStatus,
                                   upload_url: str = None, error: str = None,
                                   scheduled_at: datetime = None,
-                                  increment_retry: bool = False):
-        """Update platform upload status"""
+                                  increment_retry: bool = False) -> bool:
+        """Update platform upload status; False if the upload was withdrawn"""
         async with get_db() as db:
             updates = ["upload_status = ?"]
             params = [status.value]
@@ -176,39 +192,42 @@ class UploadScheduler:
             if increment_retry:
                 updates.append("retry_count = retry_count + 1")
             
-            params.append(upload_id)
+            params.extend([upload_id, UploadStatus.CANCELLED.value])
             
-            await db.execute(
+            cursor = await db.execute(
                 f"""
                 UPDATE platform_uploads
                 SET {', '.join(updates)}
-                WHERE id = ?
+                WHERE id = ? AND upload_status != ?
                 """,
                 params
             )
             
             await db.commit()
+        
+        return cursor.rowcount > 0
     
     async def schedule_job_uploads(self, job_id: str, platforms: list, segments: list):
-        """Schedule uploads for a completed job"""
+        """Schedule uploads for finished segments or platform renditions of a job"""
         async with get_db() as db:
             for segment in segments:
-                for platform in platforms:
-                    import uuid
+                # A platform rendition is only uploaded to its own platform
+                targets = [segment.platform] if segment.platform else platforms
+                
+                for platform in targets:
                     upload_id = str(uuid.uuid4())
                     
                     await db.execute(
                         """
                         INSERT INTO platform_uploads (
-                            id, segment_id, platform, upload_status, created_at
-                        ) VALUES (?, ?, ?, ?, ?)
+                            id, segment_id, platform, upload_status
+                        ) VALUES (?, ?, ?, ?)
                         """,
                         (
                             upload_id,
                             segment.id,
                             platform.value,
-                            UploadStatus.PENDING.value,
-                            datetime.utcnow().isoformat()
+                            UploadStatus.PENDING.value
                         )
                     )
             